@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import path, reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
@@ -13,8 +16,24 @@ from .forms import (
     UserChangeAdminForm,
     UserCreationAdminForm
 )
-from .models import Contract, ContractRole, Contractor, Subsidiary, User
+from .models import (
+    Contract,
+    ContractRole,
+    Contractor,
+    ExportJob,
+    Subsidiary,
+    User
+)
+from .organizations import (
+    get_user_organization,
+    organization_label,
+    organization_value,
+    resolve_organizations,
+    search_organizations
+)
+from .search import search_users
 from .utils import export_to_csv
+from .visibility import defer_visibility_refresh
 
 
 @admin.register(Subsidiary)
@@ -39,6 +58,17 @@ class ContractorAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+class UserChangeList(ChangeList):
+    """
+    User changelist resolving the organizations of a whole page at once,
+    so the organization column does not query once per row.
+    """
+
+    def get_results(self, request):
+        super().get_results(request)
+        resolve_organizations(self.result_list)
+
+
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     """
@@ -52,6 +82,7 @@ class UserAdmin(BaseUserAdmin):
                     'last_name', 'organization_info', 'job_title']
     list_filter = ('is_active', OrganizationTypeFilter)
     ordering = ('username',)
+    organization_autocomplete_limit = 20
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
@@ -74,40 +105,55 @@ class UserAdmin(BaseUserAdmin):
     def get_readonly_fields(self, request, obj=None):
         return 'last_login', 'date_joined'
 
+    def get_urls(self):
+        return [
+            path('organization-autocomplete/',
+                 self.admin_site.admin_view(
+                     self.organization_autocomplete_view),
+                 name='TestTask_user_organization_autocomplete'),
+        ] + super().get_urls()
+
+    def organization_autocomplete_view(self, request):
+        """ Returns organizations whose name starts with ?term= in the
+        select2 format used by the admin's autocomplete widgets. """
+        if not (self.has_add_permission(request) or
+                self.has_change_permission(request)):
+            raise PermissionDenied
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        limit = self.organization_autocomplete_limit
+        organizations = search_organizations(
+            request.GET.get('term', ''), (page - 1) * limit, limit + 1)
+        return JsonResponse({
+            'results': [
+                {'id': organization_value(organization),
+                 'text': organization_label(organization)}
+                for organization in organizations[:limit]
+            ],
+            'pagination': {'more': len(organizations) > limit},
+        })
+
+    def get_changelist(self, request, **kwargs):
+        return UserChangeList
+
     def get_search_fields(self, request):
         return ['dummy_field']
 
     def get_search_results(self, request, queryset, search_term):
-        base_query = Q()
-        if search_term:
-            base_query |= Q(username__icontains=search_term) | \
-                Q(first_name__icontains=search_term) | \
-                Q(last_name__icontains=search_term) | \
-                Q(email__icontains=search_term) | \
-                Q(job_title__icontains=search_term)
-            content_types = ContentType.objects.get_for_models(
-                Subsidiary, Contractor).values()
-            ct_subsidiary = next(
-                (ct for ct in content_types if ct.model == 'subsidiary'), None)
-            ct_contractor = next(
-                (ct for ct in content_types if ct.model == 'contractor'), None)
-            org_query = Q(content_type=ct_subsidiary, object_id__in=Subsidiary.
-                          objects.filter(name__icontains=search_term).
-                          values_list('id', flat=True)) | \
-                Q(content_type=ct_contractor, object_id__in=Contractor.objects.
-                  filter(name__icontains=search_term).
-                  values_list('id', flat=True))
-            if org_query:
-                base_query |= org_query
-        queryset = queryset.filter(base_query).distinct()
-        return queryset, True
+        """ Matches every word of the search term against the users'
+        search text, which includes the organization name, so no join or
+        distinct is needed. """
+        return search_users(queryset, search_term), False
 
     def organization_info(self, obj):
         """ Returns a formatted string of the organization's type and name
         for display in the admin interface. """
-        if obj.organization:
-            return "{}: {}".format(obj.organization._meta.model_name.
-                                   capitalize(), obj.organization.name)
+        organization = get_user_organization(obj)
+        if organization:
+            return "{}: {}".format(organization._meta.model_name.
+                                   capitalize(), organization.name)
         return _("None")
 
 
@@ -123,6 +169,7 @@ class ContractAdmin(admin.ModelAdmin):
     list_display = ('title', 'organization_do', 'organization_po',
                     'start_date', 'end_date', 'status', 'contract_details')
     list_filter = ('status', 'start_date', 'end_date')
+    list_select_related = ('organization_do', 'organization_po')
     search_fields = ('title',)
     actions = [export_to_csv]
     inlines = [ContractRoleInline]
@@ -156,6 +203,25 @@ class ContractAdmin(admin.ModelAdmin):
         )
     contract_details.short_description = "Contract Details"
 
+    def changeform_view(self, request, object_id=None, form_url='',
+                        extra_context=None):
+        """
+        Refreshes the visibility index once for the contract and all the
+        roles added or removed by the change, instead of once per role.
+        """
+        with transaction.atomic(), defer_visibility_refresh():
+            return super().changeform_view(request, object_id, form_url,
+                                           extra_context)
+
+    def save_related(self, request, form, formsets, change):
+        """
+        Saves the role inline, then removes the roles of users outside the
+        contract's organizations.
+        """
+        super().save_related(request, form, formsets, change)
+        if change:
+            form.handle_contract_roles(form.instance)
+
     class Media:
         js = ('js/admin_updates.js',)
 
@@ -168,5 +234,95 @@ class ContractRoleAdmin(admin.ModelAdmin):
     """
     list_display = ('contract', 'user', 'role')
     list_filter = ('role',)
+    list_select_related = ('user', 'contract__organization_do',
+                           'contract__organization_po')
     search_fields = ('contract__title', 'contract__organization_do__name',
                      'contract__organization_po__name', 'user__username')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """
+    Admin interface to follow contract CSV exports.
+    Jobs are created by the export action of the contract admin and are
+    read-only; the change page polls the status view until the file
+    is ready to download.
+    """
+    list_display = ('__str__', 'created_by', 'created_at', 'status',
+                    'progress_display', 'download_link')
+    list_filter = ('status',)
+    list_select_related = ('created_by',)
+    readonly_fields = ('created_by', 'created_at', 'finished_at', 'status',
+                       'progress_display', 'total_rows', 'processed_rows',
+                       'shard_count', 'contract_ids', 'filters',
+                       'download_link', 'error')
+    fields = readonly_fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/status/',
+                 self.admin_site.admin_view(self.status_view),
+                 name='TestTask_exportjob_status'),
+            path('<int:pk>/download/',
+                 self.admin_site.admin_view(self.download_view),
+                 name='TestTask_exportjob_download'),
+        ] + super().get_urls()
+
+    def get_job(self, request, pk):
+        job = self.get_object(request, str(pk))
+        if job is None or not self.has_view_permission(request, job):
+            raise Http404
+        return job
+
+    def status_view(self, request, pk):
+        """ Returns the progress of an export job as JSON for polling. """
+        job = self.get_job(request, pk)
+        return JsonResponse({
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'progress': job.progress,
+            'processed_rows': job.processed_rows,
+            'total_rows': job.total_rows,
+            'download_url': (reverse('admin:TestTask_exportjob_download',
+                                     args=[job.pk]) if job.file else None),
+            'error': job.error,
+        })
+
+    def download_view(self, request, pk):
+        """ Streams the CSV file of a finished export job. """
+        job = self.get_job(request, pk)
+        if not job.file:
+            raise Http404
+        return FileResponse(job.file.open('rb'), as_attachment=True,
+                            filename=job.file.name.split('/')[-1])
+
+    def progress_display(self, obj):
+        """ Renders the progress of the job with a hook for polling. """
+        return format_html(
+            '<span class="export-job-progress" data-status="{}" '
+            'data-status-url="{}">{}% ({} / {})</span>',
+            obj.status,
+            reverse('admin:TestTask_exportjob_status', args=[obj.pk]),
+            obj.progress, obj.processed_rows, obj.total_rows
+        )
+    progress_display.short_description = "Progress"
+
+    def download_link(self, obj):
+        """ Renders a download link once the export file is ready. """
+        if not obj.file:
+            return "-"
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('admin:TestTask_exportjob_download', args=[obj.pk]),
+            obj.file.name.split('/')[-1]
+        )
+    download_link.short_description = "File"
+
+    class Media:
+        js = ('js/export_job_progress.js',)
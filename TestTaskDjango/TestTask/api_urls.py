@@ -5,9 +5,11 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView
 )
 
+from .async_views import AsyncContractDetailView, AsyncContractListView
 from .views import (
     ContractListView,
     ContractDetailView,
+    ContractManageUsersBulkView,
     ContractManageUsersView
 )
 
@@ -17,6 +19,13 @@ urlpatterns = [
          name='contract-detail'),
     path('contracts/<int:pk>/manage-users/',
          ContractManageUsersView.as_view(), name='contract-manage-users'),
+    path('contracts/<int:pk>/manage-users/bulk/',
+         ContractManageUsersBulkView.as_view(),
+         name='contract-manage-users-bulk'),
+    path('async/contracts/', AsyncContractListView.as_view(),
+         name='async-contract-list'),
+    path('async/contracts/<int:pk>/', AsyncContractDetailView.as_view(),
+         name='async-contract-detail'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
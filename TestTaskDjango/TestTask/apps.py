@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class TesttaskConfig(AppConfig):
@@ -6,4 +7,5 @@ class TesttaskConfig(AppConfig):
     name = 'TestTask'
 
     def ready(self):
-        from . import signals
+        from . import checks, database, metrics, signals
+        post_migrate.connect(signals.restore_user_search_index, sender=self)
@@ -0,0 +1,172 @@
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    PermissionDenied
+)
+from rest_framework.request import Request
+
+from .authentication import CachedJWTAuthentication
+from .metrics import timed_serialization
+from .mixins import (
+    ContractPermissionMixin,
+    ContractResponseCacheMixin,
+    ReplicaReadMixin
+)
+from .models import Contract
+from .pagination import KeysetPagination
+from .responses import custom_exception_handler, envelope
+from .serializers import ContractSerializer, ContractValuesSerializer
+
+
+class AsyncContractView(ReplicaReadMixin, ContractResponseCacheMixin,
+                        ContractPermissionMixin, View, ABC):
+    """
+    Base class of the async read-only contract views. They answer like
+    their APIView counterparts, with the same envelope, errors, response
+    cache and replica reads, but every step awaits: the JWT principal and
+    the response cache are read with the async cache API and the
+    contracts with the async ORM, so a request waiting on I/O does not
+    hold a worker thread under an ASGI server.
+
+    DRF's APIView has no async support, so the request is authenticated
+    with CachedJWTAuthentication.aauthenticate and errors are rendered
+    with the API's exception handler here; the response cache is that of
+    ContractResponseCacheMixin. Subclasses implement get_data.
+    """
+    http_method_names = ['get', 'head', 'options']
+    authentication_class = CachedJWTAuthentication
+
+    async def get(self, request, *args, **kwargs):
+        self.request = Request(request)
+        try:
+            return await self.get_response(*args, **kwargs)
+        except (APIException, Http404) as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self):
+        """
+        Authenticates the request with the JWT of its Authorization header.
+
+        Raises:
+        - NotAuthenticated: If the request carries no token.
+        """
+        result = await self.authentication_class().aauthenticate(
+            self.request)
+        if result is None:
+            raise NotAuthenticated()
+        self.request.user, self.request.auth = result
+
+    async def get_response(self, *args, **kwargs):
+        """
+        Answers from the response cache when it is enabled and holds the
+        response, and from get_data, run inside replica_reads(), otherwise.
+        """
+        await self.authenticate()
+        timeout = settings.CONTRACT_RESPONSE_CACHE_TIMEOUT
+        if not timeout:
+            with self.replica_reads():
+                data = await self.get_data(*args, **kwargs)
+            return self.render(data)
+
+        key, etag = await self.aget_response_cache()
+        if self.is_not_modified(etag):
+            response = HttpResponseNotModified()
+        else:
+            data = await cache.aget(key)
+            if data is None:
+                with self.replica_reads():
+                    data = await self.get_data(*args, **kwargs)
+                if self.served_from_replica:
+                    return self.render(data)
+                await cache.aset(key, data, timeout)
+            response = self.render(data)
+        self.patch_response_cache(response, etag)
+        return response
+
+    @abstractmethod
+    async def get_data(self, *args, **kwargs):
+        """
+        Returns the response data of a request the response cache cannot
+        answer. Called after authentication, with the URL arguments.
+        """
+
+    def render(self, data):
+        """
+        Returns the JSON response of the data, timed as serialization.
+        """
+        with timed_serialization():
+            return JsonResponse(data)
+
+    def get_fields(self):
+        return ContractSerializer.parse_fields(
+            self.request.query_params.get('fields'))
+
+    def handle_exception(self, exc):
+        """
+        Renders an exception like the API's exception handler does.
+        """
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            exc.auth_header = self.authentication_class(
+            ).authenticate_header(self.request)
+        error = custom_exception_handler(
+            exc, {'view': self, 'request': self.request})
+        response = JsonResponse(error.data, status=error.status_code)
+        for header, value in error.items():
+            if header.lower() != 'content-type':
+                response[header] = value
+        return response
+
+
+class AsyncContractListView(AsyncContractView):
+    """
+    Async variant of ContractListView, with the same visibility rules,
+    keyset pagination and ?fields= selection.
+    """
+    pagination_class = KeysetPagination
+
+    async def get_data(self):
+        user = self.request.user
+        if await self.acheck_general_director_permissions(user):
+            contracts = Contract.objects.all()
+        else:
+            contracts = Contract.objects.filter(visibility__user=user)
+
+        serializer = ContractValuesSerializer(self.get_fields())
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(
+            contracts.values(*serializer.values), self.request, view=self)
+        with timed_serialization():
+            data = await serializer.aserialize(page)
+        return envelope(data, paginator.get_pagination())
+
+
+class AsyncContractDetailView(AsyncContractView):
+    """
+    Async variant of ContractDetailView. The contract row is loaded
+    together with the caller's access flag, then the participants with
+    one more query, as ContractValuesSerializer does for the list.
+    """
+
+    async def get_data(self, pk):
+        serializer = ContractValuesSerializer(self.get_fields())
+        try:
+            row = await self.get_contract_queryset().values(
+                *serializer.values, 'user_can_view').aget(pk=pk)
+        except Contract.DoesNotExist:
+            raise Http404(_("Contract does not exist"))
+        if not (row['user_can_view'] or
+                await self.acheck_general_director_permissions(
+                    self.request.user)):
+            raise PermissionDenied()
+        with timed_serialization():
+            data, = await serializer.aserialize([row])
+        return envelope(data)
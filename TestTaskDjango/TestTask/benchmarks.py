@@ -0,0 +1,361 @@
+import json
+import statistics
+import time
+from random import Random
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .api_urls import urlpatterns
+from .models import Contract, ContractRole, Contractor, Subsidiary, User
+from .permissions import (
+    IsContractGeneralDirectorOrGeneralDirector,
+    IsGeneralDirectorOrRelatedUser
+)
+from .serializers import ContractSerializer, ContractValuesSerializer
+from .signals import update_user_contract_roles
+from .views import ContractDetailView, ContractManageUsersView
+from .visibility import refresh_contract_visibility
+
+# Password of every generated user.
+BENCHMARK_PASSWORD = 'benchmark'
+
+
+def get_letters(index):
+    """
+    Returns a letters-only label for an index (A, B, ..., Z, BA, ...), as
+    organization and person names may not contain digits.
+    """
+    letters = ''
+    while True:
+        index, remainder = divmod(index, 26)
+        letters = chr(65 + remainder) + letters
+        if not index:
+            return letters
+
+
+def get_host():
+    """
+    Returns a host name the project accepts requests for.
+    """
+    return next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                 if host != '*'), 'localhost')
+
+
+def generate_data(organizations=10, users=100, contracts=100, roles=5,
+                  seed=0):
+    """
+    Creates a synthetic data set of the given size with bulk writes. The
+    same arguments always produce the same data.
+
+    Half of the organizations are subsidiaries, the first of them the
+    system owner, and the rest contractors. Users are spread over the
+    organizations in turn with random job titles; the first one is a GD
+    of the system owner. Each contract joins a random subsidiary and
+    contractor and gets up to roles participants from their members. The
+    contract visibility index is rebuilt at the end.
+
+    Parameters:
+    - organizations (int): Number of organizations, at least 2.
+    - users (int): Number of users, at least 1.
+    - contracts (int): Number of contracts.
+    - roles (int): Maximum number of roles per contract.
+    - seed (int): Seed of the random choices.
+
+    Returns:
+    - SimpleNamespace: The director, subsidiaries, contractors, users and
+    contracts created.
+    """
+    random = Random(seed)
+    subsidiary_count = max(1, organizations // 2)
+    subsidiaries = [
+        Subsidiary.objects.create(
+            name=f'Benchmark Subsidiary {get_letters(index)}',
+            is_system_owner=index == 0)
+        for index in range(subsidiary_count)
+    ]
+    contractors = [
+        Contractor.objects.create(
+            name=f'Benchmark Contractor {get_letters(index)}',
+            licensed=random.random() < 0.5)
+        for index in range(max(1, organizations - subsidiary_count))
+    ]
+
+    password = make_password(BENCHMARK_PASSWORD)
+    job_titles = [choice[0] for choice in User.JOB_TITLE_CHOICES]
+    organization_list = subsidiaries + contractors
+    members = {organization: [] for organization in organization_list}
+    created_users = []
+    for index in range(max(1, users)):
+        organization = organization_list[index % len(organization_list)]
+        user = User(
+            username=f'benchmark{index}', first_name='Benchmark',
+            last_name=get_letters(index), email=f'benchmark{index}@test.com',
+            job_title='GD' if index == 0 else random.choice(job_titles),
+            password=password, organization=organization,
+            organization_name=organization.name)
+        # bulk_create skips User.save, which builds the search text.
+        user.search_text = user.get_search_text()
+        created_users.append(user)
+        members[organization].append(user)
+    User.objects.bulk_create(created_users)
+
+    role_names = [choice[0] for choice in ContractRole.ROLE_CHOICES]
+    created_contracts = []
+    participants = []
+    for index in range(contracts):
+        subsidiary = random.choice(subsidiaries)
+        contractor = random.choice(contractors)
+        created_contracts.append(Contract(
+            title=f'Benchmark Contract {index}',
+            organization_do=subsidiary, organization_po=contractor))
+        candidates = members[subsidiary] + members[contractor]
+        participants.append(random.sample(
+            candidates, min(roles, len(candidates))))
+    Contract.objects.bulk_create(created_contracts)
+    ContractRole.objects.bulk_create([
+        ContractRole(contract=contract, user=user,
+                     role=random.choice(role_names))
+        for contract, users in zip(created_contracts, participants)
+        for user in users
+    ])
+    # bulk_create skips the ContractRole receivers.
+    refresh_contract_visibility()
+
+    return SimpleNamespace(
+        director=created_users[0], subsidiaries=subsidiaries,
+        contractors=contractors, users=created_users,
+        contracts=created_contracts)
+
+
+def summarize(timings):
+    """
+    Returns the minimum, mean, percentiles and maximum of at least two
+    timings, in milliseconds.
+    """
+    quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'min': min(timings) * 1000,
+        'mean': statistics.fmean(timings) * 1000,
+        'p50': quantiles[49] * 1000,
+        'p95': quantiles[94] * 1000,
+        'p99': quantiles[98] * 1000,
+        'max': max(timings) * 1000,
+    }
+
+
+def measure(func, rounds=20):
+    """
+    Calls func once to warm up, then rounds more times.
+
+    Returns:
+    - dict: The summary of the timed calls and the number of queries of
+    the last one.
+    """
+    func()
+    timings = []
+    for _ in range(rounds):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    return {**summarize(timings), 'queries': len(queries)}
+
+
+def get_participant_role(data):
+    """
+    Returns a role of a user who is not a GD, falling back to any role.
+    """
+    roles = ContractRole.objects.filter(
+        contract__in=data.contracts).select_related('user', 'contract')
+    return (roles.exclude(user__job_title='GD').order_by('pk').first() or
+            roles.order_by('pk').first())
+
+
+def check_permission(permission, view_class, user, pk):
+    """
+    Runs a permission class for a user against a fresh view, so the
+    contract is loaded again on every call.
+    """
+    request = Request(APIRequestFactory().get('/'))
+    request.user = user
+    view = view_class(request=request, kwargs={'pk': pk})
+    return permission().has_permission(request, view)
+
+
+def get_microbenchmarks(data, page_size=50):
+    """
+    Returns (name, function) pairs of the microbenchmarks: serializing a
+    page of contracts, the contract permission classes and the
+    update_user_contract_roles receiver.
+    """
+    contract_ids = [contract.pk for contract in data.contracts[:page_size]]
+    contracts = Contract.objects.filter(pk__in=contract_ids).order_by('pk')
+    values_serializer = ContractValuesSerializer()
+    role = get_participant_role(data)
+    director = User.objects.get(pk=data.director.pk)
+
+    unchanged = User.objects.get(pk=role.user_id)
+    moved = User.objects.get(pk=role.user_id)
+    moved.organization = next(
+        organization for organization in
+        data.subsidiaries + data.contractors
+        if organization.pk != moved.object_id)
+
+    return [
+        (f'ContractSerializer ({len(contract_ids)} contracts)',
+         lambda: ContractSerializer(
+             ContractSerializer.setup_eager_loading(contracts),
+             many=True).data),
+        (f'ContractValuesSerializer ({len(contract_ids)} contracts)',
+         lambda: values_serializer.serialize(
+             contracts.values(*values_serializer.values))),
+        ('IsGeneralDirectorOrRelatedUser (general director)',
+         lambda: check_permission(
+             IsGeneralDirectorOrRelatedUser, ContractDetailView,
+             director, role.contract_id)),
+        ('IsGeneralDirectorOrRelatedUser (participant)',
+         lambda: check_permission(
+             IsGeneralDirectorOrRelatedUser, ContractDetailView,
+             role.user, role.contract_id)),
+        ('IsContractGeneralDirectorOrGeneralDirector (participant)',
+         lambda: check_permission(
+             IsContractGeneralDirectorOrGeneralDirector,
+             ContractManageUsersView, role.user, role.contract_id)),
+        ('update_user_contract_roles (unchanged)',
+         lambda: update_user_contract_roles(User, unchanged)),
+        ('update_user_contract_roles (organization changed)',
+         lambda: update_user_contract_roles(User, moved)),
+    ]
+
+
+class EndpointCase:
+    """
+    A request sent repeatedly by the endpoint benchmark. payload, setup
+    and teardown are called with the index of each request; setup and
+    teardown run outside the timed request and restore the data a
+    writing request changes.
+    """
+
+    def __init__(self, name, method, path, payload=None, setup=None,
+                 teardown=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.payload = payload or (lambda index: None)
+        self.setup = setup or (lambda index: None)
+        self.teardown = teardown or (lambda index: None)
+
+
+def get_endpoint_cases(data):
+    """
+    Returns the EndpointCase of every URL name and method in api_urls,
+    sent by the director of the system owner.
+
+    Raises:
+    - LookupError: If an API URL has no case.
+    """
+    role = get_participant_role(data)
+    contract = role.contract
+    member = role.user
+    members = list(User.objects.filter(
+        pk__in=ContractRole.objects.filter(
+            contract=contract).values('user_id')
+    ).order_by('pk').values_list('username', flat=True)[:20])
+    pk = {'pk': contract.pk}
+
+    def remove_assistants(index):
+        ContractRole.objects.filter(contract=contract, role='AS').delete()
+
+    def add_assistant(index):
+        remove_assistants(index)
+        ContractRole.objects.create(
+            contract=contract, user=member, role='AS')
+
+    cases = [
+        EndpointCase('contract-list', 'GET', reverse('contract-list')),
+        EndpointCase('contract-detail', 'GET',
+                     reverse('contract-detail', kwargs=pk)),
+        EndpointCase('contract-manage-users', 'GET',
+                     reverse('contract-manage-users', kwargs=pk)),
+        EndpointCase('contract-manage-users', 'POST',
+                     reverse('contract-manage-users', kwargs=pk),
+                     payload=lambda index: {'username': member.username,
+                                            'role': 'AS'},
+                     setup=remove_assistants, teardown=remove_assistants),
+        EndpointCase('contract-manage-users', 'DELETE',
+                     reverse('contract-manage-users', kwargs=pk),
+                     payload=lambda index: {'username': member.username,
+                                            'role': 'AS'},
+                     setup=add_assistant),
+        EndpointCase('contract-manage-users-bulk', 'POST',
+                     reverse('contract-manage-users-bulk', kwargs=pk),
+                     payload=lambda index: {'operations': [
+                         {'action': 'add', 'username': username,
+                          'role': 'AS'} for username in members]},
+                     setup=remove_assistants, teardown=remove_assistants),
+        EndpointCase('async-contract-list', 'GET',
+                     reverse('async-contract-list')),
+        EndpointCase('async-contract-detail', 'GET',
+                     reverse('async-contract-detail', kwargs=pk)),
+        EndpointCase('token_obtain_pair', 'POST', reverse('token_obtain_pair'),
+                     payload=lambda index: {
+                         'username': data.director.username,
+                         'password': BENCHMARK_PASSWORD}),
+        EndpointCase('token_refresh', 'POST', reverse('token_refresh'),
+                     payload=lambda index: {'refresh': str(
+                         RefreshToken.for_user(data.director))}),
+    ]
+    missing = {pattern.name for pattern in urlpatterns} - {
+        case.name for case in cases}
+    if missing:
+        raise LookupError(
+            'No benchmark case for {}.'.format(', '.join(sorted(missing))))
+    return cases
+
+
+def run_endpoint(case, requests, token):
+    """
+    Sends a case's request once to warm up, then requests more times in
+    sequence through the full middleware stack.
+
+    Returns:
+    - dict: The summary of the timed requests, their throughput and the
+    median number of queries per request.
+
+    Raises:
+    - AssertionError: If a request fails.
+    """
+    client = Client(HTTP_HOST=get_host(),
+                    HTTP_AUTHORIZATION=f'Bearer {token}')
+    timings = []
+    query_counts = []
+    for index in range(requests + 1):
+        case.setup(index)
+        payload = case.payload(index)
+        body = '' if payload is None else json.dumps(payload)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.generic(case.method, case.path, body,
+                                      content_type='application/json')
+            elapsed = time.perf_counter() - started
+        case.teardown(index)
+        if response.status_code >= 400:
+            raise AssertionError(
+                f'{case.method} {case.path} answered '
+                f'{response.status_code}: {response.content[:200]!r}')
+        if index:
+            timings.append(elapsed)
+            query_counts.append(len(queries))
+    return {**summarize(timings),
+            'requests_per_second': len(timings) / sum(timings),
+            'queries': statistics.median(query_counts)}
@@ -0,0 +1,51 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+
+CONTRACTS_VERSION_KEY = 'contracts:version'
+
+
+def get_contracts_version():
+    """
+    Returns the version of the contract data served by the API, which
+    changes whenever a contract, role, organization or user changes.
+    A version is created on first use.
+    """
+    version = cache.get(CONTRACTS_VERSION_KEY)
+    if version is None:
+        cache.add(CONTRACTS_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CONTRACTS_VERSION_KEY)
+    return version
+
+
+async def aget_contracts_version():
+    """
+    Async variant of get_contracts_version.
+    """
+    version = await cache.aget(CONTRACTS_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CONTRACTS_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(CONTRACTS_VERSION_KEY)
+    return version
+
+
+def contract_response_cache(version, user_id, url):
+    """
+    Returns the cache key and the ETag of a contract response for a user
+    and URL at a contract data version.
+    """
+    digest = hashlib.md5(
+        f'{version}:{user_id}:{url}'.encode()).hexdigest()
+    return f'contract-response:{digest}', quote_etag(digest)
+
+
+def touch_contracts():
+    """
+    Moves the contract data to a new version once the current transaction
+    commits, so cached contract responses and their ETags go stale.
+    """
+    transaction.on_commit(lambda: cache.set(
+        CONTRACTS_VERSION_KEY, time.time_ns(), None))
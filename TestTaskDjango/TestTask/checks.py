@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Cache backends whose entries live in the memory of each worker process.
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Caches whose entries decide what a user may see or do. Their
+# invalidation only reaches other workers through a shared cache.
+SHARED_CACHE_TIMEOUTS = (
+    'CONTRACT_RESPONSE_CACHE_TIMEOUT',
+    'ORGANIZATION_CACHE_TIMEOUT',
+    'PRINCIPAL_CACHE_TIMEOUT',
+)
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Rejects the caches of SHARED_CACHE_TIMEOUTS when backed by a
+    per-process cache. A write would only invalidate the entries of the
+    worker handling it, and the others would keep authorizing requests
+    with what they cached before: contract responses and 304 answers to
+    old ETags, which skip the permission checks, principal snapshots
+    with an old job title, or organizations with an old is_system_owner.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [
+        Error(
+            f'{name} needs a cache shared by all workers.',
+            hint=f'Set CACHE_URL, or set {name} to 0.',
+            id='TestTask.E001',
+        )
+        for name in SHARED_CACHE_TIMEOUTS if getattr(settings, name)
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.admin import SimpleListFilter
 from django.contrib.contenttypes.models import ContentType
 
+from .models import Contractor, Subsidiary
+
 
 class OrganizationTypeFilter(SimpleListFilter):
     """
@@ -19,12 +21,10 @@ class OrganizationTypeFilter(SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
-        if not hasattr(self, 'content_types'):
-            self.content_types = {
-                'subsidiary': ContentType.objects.get(model='subsidiary'),
-                'contractor': ContentType.objects.get(model='contractor')
-            }
-        if self.value() in self.content_types:
-            return queryset.filter(content_type=self.
-                                   content_types[self.value()])
+        content_types = {
+            model._meta.model_name: content_type for model, content_type in
+            ContentType.objects.get_for_models(Subsidiary, Contractor).items()
+        }
+        if self.value() in content_types:
+            return queryset.filter(content_type=content_types[self.value()])
         return queryset
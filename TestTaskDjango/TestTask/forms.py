@@ -1,5 +1,4 @@
 import re
-from itertools import chain
 
 from django import forms
 from django.contrib import admin
@@ -7,11 +6,19 @@ from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
 from django.forms import ValidationError
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from .models import Contract, ContractRole, Contractor, Subsidiary, User
+from .models import Contract, ContractRole, User
+from .organizations import (
+    get_user_organization,
+    organization_label,
+    organization_value,
+    parse_organization_value
+)
 from .validatiors import FirstNameValidator, LastNameValidator
+from .visibility import defer_visibility_refresh
 
 
 class ContractRoleInline(admin.TabularInline):
@@ -23,12 +30,86 @@ class ContractRoleInline(admin.TabularInline):
     extra = 1
 
 
+class OrganizationAutocompleteWidget(forms.Select):
+    """
+    Select holding only the chosen organization, filled on demand from
+    the organization autocomplete endpoint of the user admin by the
+    admin's select2 integration.
+    """
+    url_name = 'admin:TestTask_user_organization_autocomplete'
+
+    class Media:
+        js = (
+            'admin/js/vendor/jquery/jquery.min.js',
+            'admin/js/vendor/select2/select2.full.min.js',
+            'admin/js/jquery.init.js',
+            'admin/js/autocomplete.js',
+        )
+        css = {
+            'screen': (
+                'admin/css/vendor/select2/select2.min.css',
+                'admin/css/autocomplete.css',
+            ),
+        }
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs.update({
+            'class': f"{attrs.get('class', '')} admin-autocomplete".strip(),
+            'data-ajax--cache': 'true',
+            'data-ajax--delay': 250,
+            'data-ajax--type': 'GET',
+            'data-ajax--url': reverse(self.url_name),
+            'data-app-label': 'TestTask',
+            'data-model-name': 'user',
+            'data-field-name': 'organization_choice',
+            'data-theme': 'admin-autocomplete',
+            'data-allow-clear': 'true',
+            'data-placeholder': '',
+        })
+        return attrs
+
+
+class OrganizationChoiceField(forms.CharField):
+    """
+    Field for a 'subsidiary_<id>' or 'contractor_<id>' organization value,
+    checked with a single lookup of the referenced organization.
+    """
+    widget = OrganizationAutocompleteWidget
+    default_error_messages = {
+        'invalid_choice': _('Select a valid organization.'),
+    }
+
+    def set_organization(self, organization):
+        """
+        Offers the organization as the only option of the widget.
+        """
+        self.widget.choices = [('', '---------')]
+        if organization is not None:
+            self.widget.choices.append(
+                (organization_value(organization),
+                 organization_label(organization)))
+
+    def clean(self, value):
+        value = super().clean(value)
+        if value in self.empty_values:
+            return value
+        parsed = parse_organization_value(value)
+        organization = parsed and parsed[0].objects.filter(
+            pk=parsed[1]).first()
+        if organization is None:
+            raise ValidationError(self.error_messages['invalid_choice'],
+                                  code='invalid_choice')
+        self.set_organization(organization)
+        return value
+
+
 class BaseUserForm(forms.ModelForm):
     """
     Base form for user creation and editing. This form adds custom fields
     for selecting organizations and setting job titles.
     """
-    organization_choice = forms.ChoiceField(
+    organization_choice = OrganizationChoiceField(
         label=_('Organization'),
         help_text="Changing organization will cause all associated contracts\
             to be removed."
@@ -51,37 +132,21 @@ class BaseUserForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['organization_choice'].choices = [
-            ('', '---------')] + self.get_organization_choices()
-        if self.instance.pk and self.instance.organization:
-            self.fields['organization_choice'].initial = (
-                f"{self.instance.content_type.model}_{self.instance.object_id}"
-            )
-
-    def get_organization_choices(self):
-        """
-        Retrieves a combined list of all subsidiaries and contractors
-        to populate the organization_choice field.
-        """
-        organizations = chain(Subsidiary.objects.all(),
-                              Contractor.objects.all())
-        return [
-            (
-                f'{org._meta.model_name}_{org.pk}',
-                f'{org._meta.verbose_name.title()}: {org.name}'
-            )
-            for org in organizations]
+        field = self.fields['organization_choice']
+        organization = (get_user_organization(self.instance)
+                        if self.instance.pk else None)
+        field.set_organization(organization)
+        if organization is not None:
+            field.initial = organization_value(organization)
 
     def save(self, commit=True):
         instance = super().save(commit=False)
         org_choice = self.cleaned_data['organization_choice']
         if org_choice:
-            model_name, id = org_choice.split('_')
-            model_class = (Subsidiary if model_name == 'subsidiary'
-                           else Contractor)
+            model_class, id = parse_organization_value(org_choice)
             instance.content_type = ContentType.objects.get_for_model(
                 model_class)
-            instance.object_id = int(id)
+            instance.object_id = id
         else:
             instance.content_type = None
             instance.object_id = None
@@ -163,10 +228,11 @@ class ContractChangeForm(BaseContractForm):
         """
         Ensures that contract roles are updated based
         on the current organizations participating in the contract.
+        The visibility index is refreshed once for all deleted roles.
         """
         try:
             if contract.organization_do_id and contract.organization_po_id:
-                with transaction.atomic():
+                with transaction.atomic(), defer_visibility_refresh():
                     valid_companies = {
                         contract.organization_do_id,
                         contract.organization_po_id
@@ -0,0 +1,384 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+
+from .models import (
+    Contract,
+    ContractRole,
+    Contractor,
+    Organization,
+    Subsidiary,
+    User
+)
+from .organizations import touch_organization_users
+from .validatiors import (
+    FirstNameValidator,
+    LastNameValidator,
+    OrganizationNameValidator
+)
+from .visibility import refresh_contract_visibility
+
+ORGANIZATION_TYPES = {'subsidiary': Subsidiary, 'contractor': Contractor}
+
+# The flag column each organization type stores next to its parent link.
+ORGANIZATION_FLAGS = {Subsidiary: 'is_system_owner', Contractor: 'licensed'}
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+
+def read_records(stream, format):
+    """
+    Yields (line number, record dict) pairs from a CSV stream with a
+    header row or from a JSON Lines stream, one record at a time.
+    """
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def iter_batches(records, batch_size):
+    """
+    Groups an iterable of records into lists of at most batch_size items.
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def get_value(record, key):
+    value = record.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def get_flag(record, key):
+    value = record.get(key)
+    if isinstance(value, bool):
+        return value
+    return get_value(record, key).lower() in TRUE_VALUES
+
+
+def validate(validator, value):
+    """
+    Returns the message of the validation error raised for value, if any.
+    """
+    try:
+        validator(value)
+    except ValidationError as error:
+        return ' '.join(str(message) for message in error.messages)
+    return None
+
+
+class Importer(ABC):
+    """
+    Base class of the bulk importers. Subclasses validate a batch of
+    records with a constant number of queries and write the valid ones
+    in bulk.
+
+    Each call to import_batch returns the number of imported records and
+    a list of (line number, reason) rejects.
+    """
+
+    def import_batch(self, batch):
+        rejects = []
+        valid = []
+        for line_number, record in batch:
+            if record is None:
+                rejects.append((line_number, 'Malformed record.'))
+            else:
+                valid.append((line_number, record))
+        imported, batch_rejects = self.import_records(valid)
+        return imported, sorted(rejects + batch_rejects)
+
+    @abstractmethod
+    def import_records(self, records):
+        """
+        Validates and writes well-formed records.
+
+        Parameters:
+        - records (list): (line number, record dict) pairs.
+
+        Returns:
+        - tuple: The number of imported records and a list of
+          (line number, reason) rejects.
+        """
+
+
+class OrganizationImporter(Importer):
+    """
+    Imports organizations from records with type (subsidiary or
+    contractor), name and the optional is_system_owner or licensed flag.
+    Organizations whose name already exists for their type are rejected.
+
+    Subsidiary and Contractor use multi-table inheritance, which
+    bulk_create does not support, so the parent Organization rows are
+    bulk created first and the child rows are then inserted with one
+    statement per type, using the primary keys of their parents. The
+    Organization receivers do not run; they have nothing to do for new
+    organizations.
+    """
+
+    def import_records(self, records):
+        rejects = []
+        pending = []
+        names = defaultdict(set)
+        for line_number, record in records:
+            model = ORGANIZATION_TYPES.get(get_value(record, 'type').lower())
+            name = get_value(record, 'name')
+            error = (
+                'Unknown organization type.' if model is None else
+                'Name is required.' if not name else
+                validate(OrganizationNameValidator, name)
+            )
+            if error:
+                rejects.append((line_number, error))
+                continue
+            pending.append((line_number, model, name, record))
+            names[model].add(name)
+
+        existing = {
+            (model, name) for model, model_names in names.items()
+            for name in model.objects.filter(
+                name__in=model_names).values_list('name', flat=True)
+        }
+
+        organizations = []
+        for line_number, model, name, record in pending:
+            if (model, name) in existing:
+                rejects.append((line_number, 'Organization already exists.'))
+                continue
+            existing.add((model, name))
+            organizations.append(
+                (model, name, get_flag(record, ORGANIZATION_FLAGS[model])))
+
+        with transaction.atomic():
+            parents = Organization.objects.bulk_create(
+                [Organization(name=name) for _, name, _ in organizations])
+            children = defaultdict(list)
+            for parent, (model, _, flag) in zip(parents, organizations):
+                children[model].append((parent.pk, flag))
+            for model, rows in children.items():
+                self.insert_children(model, rows)
+        return len(organizations), rejects
+
+    def insert_children(self, model, rows):
+        """
+        Inserts the child rows of an organization type.
+
+        Parameters:
+        - model (Model class): Subsidiary or Contractor.
+        - rows (list): (parent primary key, flag value) pairs.
+        """
+        connection = connections[router.db_for_write(model)]
+        quote = connection.ops.quote_name
+        flag = model._meta.get_field(ORGANIZATION_FLAGS[model])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {quote(model._meta.db_table)} '
+                f'({quote(model._meta.pk.column)}, {quote(flag.column)}) '
+                f'VALUES (%s, %s)', rows)
+
+
+class UserImporter(Importer):
+    """
+    Imports users from records with username, email, first_name,
+    last_name, job_title, organization_type, organization (its name) and
+    password. The password must already be hashed in Django's encoded
+    format, so no hashing happens on import; users without one get an
+    unusable password. Organizations are resolved by name with one query
+    per organization type and batch.
+    """
+
+    def import_records(self, records):
+        rejects = []
+        pending = []
+        usernames = set()
+        organization_names = defaultdict(set)
+        job_titles = {choice[0] for choice in User.JOB_TITLE_CHOICES}
+
+        for line_number, record in records:
+            username = get_value(record, 'username')
+            first_name = get_value(record, 'first_name')
+            last_name = get_value(record, 'last_name')
+            job_title = get_value(record, 'job_title').upper()
+            password = get_value(record, 'password')
+            model = ORGANIZATION_TYPES.get(
+                get_value(record, 'organization_type').lower())
+            organization = get_value(record, 'organization')
+
+            error = (
+                'Username is required.' if not username else
+                validate(User.username_validator, username) or
+                validate(FirstNameValidator, first_name) or
+                validate(LastNameValidator, last_name) or
+                ('Invalid job title.'
+                 if job_title not in job_titles else None) or
+                ('Unknown organization type.'
+                 if organization and model is None else None) or
+                ('Duplicate username in input.'
+                 if username in usernames else None)
+            )
+            if not error and password:
+                try:
+                    identify_hasher(password)
+                except ValueError:
+                    error = 'Password must be an encoded password hash.'
+            if error:
+                rejects.append((line_number, error))
+                continue
+
+            usernames.add(username)
+            if organization:
+                organization_names[model].add(organization)
+            pending.append((line_number, User(
+                username=username, email=get_value(record, 'email'),
+                first_name=first_name, last_name=last_name,
+                job_title=job_title,
+                password=password or make_password(None)
+            ), model if organization else None, organization))
+
+        existing = set(User.objects.filter(
+            username__in=usernames).values_list('username', flat=True))
+        organizations = {}
+        for model, model_names in organization_names.items():
+            matches = defaultdict(list)
+            for pk, name in model.objects.filter(
+                    name__in=model_names).values_list('pk', 'name'):
+                matches[name].append(pk)
+            content_type = ContentType.objects.get_for_model(model)
+            for name, pks in matches.items():
+                organizations[(model, name)] = (
+                    (content_type.pk, pks[0]) if len(pks) == 1 else None)
+
+        users = []
+        for line_number, user, model, organization in pending:
+            if user.username in existing:
+                rejects.append((line_number, 'Username already exists.'))
+                continue
+            if model is not None:
+                key = (model, organization)
+                if key not in organizations:
+                    rejects.append((line_number, 'Unknown organization.'))
+                    continue
+                if organizations[key] is None:
+                    rejects.append((line_number, 'Ambiguous organization.'))
+                    continue
+                user.content_type_id, user.object_id = organizations[key]
+                user.organization_name = organization
+            # bulk_create skips User.save, which builds the search text.
+            user.search_text = user.get_search_text()
+            users.append(user)
+
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            # bulk_create skips the User receivers.
+            refresh_contract_visibility(user_ids=[
+                user.pk for user in users if user.job_title == 'GD'])
+            touch_organization_users(user.object_id for user in users)
+        return len(users), rejects
+
+
+class ContractRoleImporter(Importer):
+    """
+    Imports contract roles from records with contract (its id), username
+    and role. The user must belong to one of the contract's organizations.
+    Roles a user already holds, in the database or earlier in the input,
+    are rejected; a role inserted concurrently is skipped by the
+    unique_contract_role constraint.
+    """
+
+    def import_records(self, records):
+        rejects = []
+        pending = []
+        roles = {choice[0] for choice in ContractRole.ROLE_CHOICES}
+        for line_number, record in records:
+            contract_id = get_value(record, 'contract')
+            role = get_value(record, 'role').upper()
+            error = (
+                'Invalid contract id.' if not contract_id.isdigit() else
+                'Username is required.'
+                if not get_value(record, 'username') else
+                'Invalid role.' if role not in roles else None
+            )
+            if error:
+                rejects.append((line_number, error))
+                continue
+            pending.append((line_number, int(contract_id),
+                            get_value(record, 'username'), role))
+
+        users = {
+            username: (pk, (content_type_id, object_id))
+            for username, pk, content_type_id, object_id in
+            User.objects.filter(
+                username__in={username for _, _, username, _ in pending}
+            ).values_list('username', 'pk', 'content_type_id', 'object_id')
+        }
+        content_types = ContentType.objects.get_for_models(
+            Subsidiary, Contractor)
+        contracts = {
+            pk: {(content_types[Subsidiary].pk, organization_do_id),
+                 (content_types[Contractor].pk, organization_po_id)}
+            for pk, organization_do_id, organization_po_id in
+            Contract.objects.filter(
+                pk__in={contract_id for _, contract_id, _, _ in pending}
+            ).values_list('pk', 'organization_do_id', 'organization_po_id')
+        }
+        existing = set(ContractRole.objects.filter(
+            contract_id__in=contracts,
+            user_id__in={pk for pk, _ in users.values()}
+        ).values_list('contract_id', 'user_id', 'role'))
+
+        contract_roles = []
+        for line_number, contract_id, username, role in pending:
+            if contract_id not in contracts:
+                rejects.append((line_number, 'Unknown contract.'))
+                continue
+            if username not in users:
+                rejects.append((line_number, 'Unknown user.'))
+                continue
+            user_id, organization = users[username]
+            key = (contract_id, user_id, role)
+            if organization not in contracts[contract_id]:
+                rejects.append((line_number, 'User is not a member of the '
+                                'contract organizations.'))
+            elif key in existing:
+                rejects.append((line_number, 'Role already assigned.'))
+            else:
+                existing.add(key)
+                contract_roles.append(ContractRole(
+                    contract_id=contract_id, user_id=user_id, role=role))
+
+        with transaction.atomic():
+            ContractRole.objects.bulk_create(
+                contract_roles, ignore_conflicts=True)
+            # bulk_create skips the ContractRole receivers.
+            refresh_contract_visibility(
+                user_ids={role.user_id for role in contract_roles},
+                contract_ids={role.contract_id for role in contract_roles})
+        return len(contract_roles), rejects
+
+
+IMPORTERS = {
+    'organizations': OrganizationImporter,
+    'users': UserImporter,
+    'roles': ContractRoleImporter,
+}
@@ -0,0 +1,134 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from TestTask.benchmarks import (
+    generate_data,
+    get_endpoint_cases,
+    get_microbenchmarks,
+    measure,
+    run_endpoint
+)
+
+
+class Command(BaseCommand):
+    """
+    Runs the benchmark suite on a synthetic data set of configurable size:
+    microbenchmarks of the contract serializers, the permission classes
+    and the update_user_contract_roles receiver, and an end-to-end run of
+    every endpoint in api_urls reporting latency percentiles, throughput
+    and queries per request. Everything runs in-process, so no server or
+    other service is needed. The response cache is disabled unless
+    --cache is given.
+
+    The data is created in a transaction that is rolled back afterwards,
+    so the command leaves the database unchanged. --json writes the
+    results to a file for comparing runs.
+    """
+    help = 'Benchmark the API on synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organizations', type=int, default=20,
+            help='Number of organizations to create.')
+        parser.add_argument(
+            '--users', type=int, default=500,
+            help='Number of users to create.')
+        parser.add_argument(
+            '--contracts', type=int, default=500,
+            help='Number of contracts to create.')
+        parser.add_argument(
+            '--roles', type=int, default=5,
+            help='Maximum number of roles per contract.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed of the synthetic data.')
+        parser.add_argument(
+            '--suite', choices=('micro', 'endpoints', 'all'), default='all',
+            help='Benchmarks to run.')
+        parser.add_argument(
+            '--rounds', type=int, default=20,
+            help='Number of timed calls per microbenchmark.')
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Number of timed requests per endpoint.')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='URL name of an endpoint to run; repeat for several. '
+                 'All endpoints run by default.')
+        parser.add_argument(
+            '--cache', action='store_true',
+            help='Serve repeated requests from the response cache.')
+        parser.add_argument(
+            '--json', help='File to write the results to.')
+
+    def handle(self, *args, **options):
+        for name in ('organizations', 'rounds', 'requests'):
+            if options[name] < 2:
+                raise CommandError(f'--{name} must be at least 2.')
+        for name in ('users', 'contracts', 'roles'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be a positive integer.')
+
+        # The requests run in this process, so --cache works with the
+        # per-process cache used when no CACHE_URL is set.
+        timeout = ((settings.CONTRACT_RESPONSE_CACHE_TIMEOUT or 300)
+                   if options['cache'] else 0)
+        results = {}
+        with transaction.atomic(), override_settings(
+                CONTRACT_RESPONSE_CACHE_TIMEOUT=timeout):
+            started = time.perf_counter()
+            data = generate_data(
+                options['organizations'], options['users'],
+                options['contracts'], options['roles'], options['seed'])
+            self.stdout.write(
+                f'Generated {options["organizations"]} organizations, '
+                f'{options["users"]} users and {options["contracts"]} '
+                f'contracts in {time.perf_counter() - started:.1f} s')
+
+            if options['suite'] in ('micro', 'all'):
+                results['micro'] = {}
+                for name, func in get_microbenchmarks(data):
+                    result = measure(func, options['rounds'])
+                    results['micro'][name] = result
+                    self.report(name, result)
+
+            if options['suite'] in ('endpoints', 'all'):
+                results['endpoints'] = {}
+                cases = get_endpoint_cases(data)
+                if options['endpoints']:
+                    unknown = set(options['endpoints']) - {
+                        case.name for case in cases}
+                    if unknown:
+                        raise CommandError('Unknown endpoints: {}.'.format(
+                            ', '.join(sorted(unknown))))
+                    cases = [case for case in cases
+                             if case.name in options['endpoints']]
+                token = str(RefreshToken.for_user(data.director).access_token)
+                for case in cases:
+                    name = f'{case.method} {case.name}'
+                    result = run_endpoint(case, options['requests'], token)
+                    results['endpoints'][name] = result
+                    self.report(name, result)
+            transaction.set_rollback(True)
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as output:
+                json.dump({'options': {
+                    name: options[name] for name in (
+                        'organizations', 'users', 'contracts', 'roles',
+                        'seed', 'rounds', 'requests', 'cache')
+                }, 'results': results}, output, indent=2)
+
+    def report(self, name, result):
+        line = (f'{name}: p50 {result["p50"]:.2f} ms, '
+                f'p95 {result["p95"]:.2f} ms, p99 {result["p99"]:.2f} ms')
+        if 'requests_per_second' in result:
+            line += f', {result["requests_per_second"]:.0f} requests/s'
+        self.stdout.write(f'{line}, {result["queries"]:g} queries')
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from TestTask.benchmarks import generate_data
+from TestTask.models import Contract
+from TestTask.serializers import ContractSerializer, ContractValuesSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compares the per-contract cost of serializing a contract list with
+    ContractSerializer and with the ContractValuesSerializer fast path.
+    The synthetic contracts are created in a transaction that is rolled
+    back afterwards, so the command leaves the database unchanged.
+    """
+    help = 'Benchmark the contract list serializers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--contracts', type=int, default=500,
+            help='Number of contracts to serialize.')
+        parser.add_argument(
+            '--participants', type=int, default=5,
+            help='Number of participants per contract.')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of timed runs; the fastest one is reported.')
+
+    def handle(self, *args, **options):
+        for name in ('contracts', 'participants', 'repeat'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be a positive integer.')
+
+        with transaction.atomic():
+            data = generate_data(
+                organizations=2, users=options['participants'],
+                contracts=options['contracts'],
+                roles=options['participants'])
+            contracts = Contract.objects.filter(
+                pk__in=[contract.pk for contract in data.contracts]
+            ).order_by('pk')
+            self.report('ContractSerializer', options,
+                        lambda: ContractSerializer(
+                            ContractSerializer.setup_eager_loading(contracts),
+                            many=True).data)
+            serializer = ContractValuesSerializer()
+            self.report('ContractValuesSerializer', options,
+                        lambda: serializer.serialize(
+                            contracts.values(*serializer.values)))
+            transaction.set_rollback(True)
+
+    def report(self, name, options, serialize):
+        serialize()
+        timings = []
+        for _ in range(options['repeat']):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                serialize()
+                timings.append(time.perf_counter() - started)
+        per_contract = min(timings) / options['contracts'] * 1e6
+        self.stdout.write(
+            f'{name}: {per_contract:.1f} us per contract, '
+            f'{len(queries)} queries')
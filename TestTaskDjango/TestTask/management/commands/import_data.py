@@ -0,0 +1,88 @@
+import csv
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from TestTask.importers import IMPORTERS, iter_batches, read_records
+
+
+class Command(BaseCommand):
+    """
+    Streams organizations, users or contract roles from a CSV or JSON
+    Lines file into the database in validated batches and reports the
+    throughput and the rejected records.
+    """
+    help = 'Bulk import organizations, users or contract roles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kind', choices=sorted(IMPORTERS),
+            help='Type of the records in the file.')
+        parser.add_argument(
+            'path', help="Input file, or '-' to read standard input.")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Input format. Defaults to the file extension.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of records validated and written per batch.')
+        parser.add_argument(
+            '--rejects',
+            help='Write rejected records as CSV (line, reason) to this file.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer.')
+        path = options['path']
+        format = options['format']
+        if format is None:
+            extension = os.path.splitext(path)[1].lower().lstrip('.')
+            if extension not in ('csv', 'jsonl'):
+                raise CommandError(
+                    'Cannot infer the format from the file name, '
+                    'pass --format.')
+            format = extension
+
+        importer = IMPORTERS[options['kind']]()
+        imported = rejected = 0
+        rejects = []
+        started = time.monotonic()
+        try:
+            stream = (sys.stdin if path == '-' else
+                      open(path, newline='', encoding='utf-8'))
+        except OSError as error:
+            raise CommandError(f'Cannot open {path}: {error}')
+
+        with stream:
+            for batch in iter_batches(read_records(stream, format),
+                                      batch_size):
+                batch_imported, batch_rejects = importer.import_batch(batch)
+                imported += batch_imported
+                rejected += len(batch_rejects)
+                rejects.extend(batch_rejects)
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'{imported} imported, {rejected} rejected...')
+
+        elapsed = time.monotonic() - started
+        if options['rejects']:
+            with open(options['rejects'], 'w', newline='',
+                      encoding='utf-8') as output:
+                writer = csv.writer(output)
+                writer.writerow(['line', 'reason'])
+                writer.writerows(rejects)
+        else:
+            for line_number, reason in rejects[:20]:
+                self.stderr.write(f'Line {line_number}: {reason}')
+            if len(rejects) > 20:
+                self.stderr.write(
+                    f'... {len(rejects) - 20} more, use --rejects to '
+                    f'save them all.')
+
+        rate = (imported + rejected) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} {options["kind"]}, rejected {rejected} '
+            f'in {elapsed:.2f}s ({rate:.0f} records/s).'))
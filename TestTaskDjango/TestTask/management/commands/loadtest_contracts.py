@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from TestTask.benchmarks import generate_data, get_host, summarize
+
+
+class Command(BaseCommand):
+    """
+    Compares the sync and async contract endpoints under concurrent load.
+    Requests are passed to the project's ASGI application in-process, the
+    way an ASGI server passes them, by a number of concurrent clients,
+    and the throughput and latency percentiles of each endpoint are
+    reported. The response cache is disabled unless --cache is given.
+
+    The synthetic contracts are created in a transaction that is rolled
+    back afterwards, so the command leaves the database unchanged.
+    """
+    help = 'Load test the sync and async contract endpoints.'
+
+    endpoints = (
+        ('list', 'contract-list', 'async-contract-list'),
+        ('detail', 'contract-detail', 'async-contract-detail'),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--contracts', type=int, default=200,
+            help='Number of contracts to create.')
+        parser.add_argument(
+            '--participants', type=int, default=5,
+            help='Number of participants per contract.')
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Number of requests per endpoint.')
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Number of concurrent clients.')
+        parser.add_argument(
+            '--cache', action='store_true',
+            help='Serve repeated requests from the response cache.')
+
+    def handle(self, *args, **options):
+        for name in ('contracts', 'participants', 'concurrency'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be a positive integer.')
+        if options['requests'] < 2:
+            raise CommandError('--requests must be at least 2.')
+
+        application = get_asgi_application()
+        # The requests run in this process, so --cache works with the
+        # per-process cache used when no CACHE_URL is set.
+        timeout = ((settings.CONTRACT_RESPONSE_CACHE_TIMEOUT or 300)
+                   if options['cache'] else 0)
+        # The requests share this thread's connection, and with it the
+        # transaction holding the synthetic data; don't let the request
+        # signals close it.
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with transaction.atomic(), override_settings(
+                    CONTRACT_RESPONSE_CACHE_TIMEOUT=timeout):
+                data = generate_data(
+                    organizations=2, users=options['participants'],
+                    contracts=options['contracts'],
+                    roles=options['participants'])
+                contract = data.contracts[0]
+                token = str(
+                    RefreshToken.for_user(data.director).access_token)
+                for label, sync_name, async_name in self.endpoints:
+                    kwargs = {'pk': contract.pk} if label == 'detail' else {}
+                    for name in (sync_name, async_name):
+                        timings, elapsed = async_to_sync(self.run)(
+                            application, reverse(name, kwargs=kwargs),
+                            token, options)
+                        self.report(name, timings, elapsed)
+                transaction.set_rollback(True)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+    async def run(self, application, path, token, options):
+        """
+        Sends options['requests'] GET requests for path from
+        options['concurrency'] concurrent clients.
+
+        Returns:
+        - tuple: The latency of each request and the total elapsed time,
+        in seconds.
+        """
+        remaining = iter(range(options['requests']))
+        timings = []
+
+        async def client():
+            for _ in remaining:
+                started = time.perf_counter()
+                status = await self.request(application, path, token)
+                timings.append(time.perf_counter() - started)
+                if status != 200:
+                    raise CommandError(f'{path} answered {status}.')
+
+        await self.request(application, path, token)
+        started = time.perf_counter()
+        await asyncio.gather(*(client()
+                               for _ in range(options['concurrency'])))
+        return timings, time.perf_counter() - started
+
+    async def request(self, application, path, token):
+        """
+        Sends a GET request through the ASGI application and returns the
+        response status.
+        """
+        host = get_host()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'root_path': '', 'server': (host, 80),
+            'client': ('127.0.0.1', 0),
+            'headers': [(b'host', host.encode()),
+                        (b'authorization', f'Bearer {token}'.encode())],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await application(scope, receive, send)
+        return messages[0]['status']
+
+    def report(self, name, timings, elapsed):
+        result = summarize(timings)
+        self.stdout.write(
+            f'{name}: {len(timings) / elapsed:.0f} requests/s, '
+            f'p50 {result["p50"]:.1f} ms, p95 {result["p95"]:.1f} ms, '
+            f'p99 {result["p99"]:.1f} ms')
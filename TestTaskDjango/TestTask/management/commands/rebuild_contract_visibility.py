@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from TestTask.visibility import (
+    rebuild_contract_visibility,
+    verify_contract_visibility
+)
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the contract visibility index or, with --verify, reports how
+    far it has drifted from the roles and organizations it is derived from.
+    """
+    help = 'Rebuild or verify the per-user contract visibility index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare the index with the rules and report drift.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of contracts processed per batch.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer.')
+
+        if options['verify']:
+            missing, stale = verify_contract_visibility(batch_size)
+            if missing or stale:
+                raise CommandError(
+                    f'Visibility index is out of date: {missing} missing '
+                    f'and {stale} stale rows.')
+            self.stdout.write(self.style.SUCCESS(
+                'Visibility index is up to date.'))
+            return
+
+        processed = rebuild_contract_visibility(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt visibility index for {processed} contracts.'))
@@ -0,0 +1,265 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_metrics', default=None)
+
+# Upper bounds, in seconds, of the request duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestMetrics:
+    """
+    Queries, database time and serializer time of the current request.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding each query and its duration to the
+    metrics of the current request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    Adds record_query to every new database connection. Connections are
+    created in the thread that runs the queries, so queries made by the
+    async ORM are recorded too.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Adds the time spent inside the block to the serializer time of the
+    current request, less the time its queries took.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started, db_time = time.perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        metrics.serializer_time += (time.perf_counter() - started -
+                                    (metrics.db_time - db_time))
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSON renderer counting the rendering of every DRF response as
+    serializer time.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed_serialization():
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+
+def escape_label(value):
+    return str(value).replace('\\', r'\\').replace(
+        '"', r'\"').replace('\n', r'\n')
+
+
+class MetricsRegistry:
+    """
+    Totals of the recorded requests per view and method, rendered in the
+    Prometheus text format. Totals live in the memory of each worker
+    process and start over when it restarts.
+    """
+    COUNTERS = (
+        ('http_request_db_queries_total', 'queries',
+         'Database queries run by requests.'),
+        ('http_request_db_seconds_total', 'db_time',
+         'Time requests spent in database queries.'),
+        ('http_request_serializer_seconds_total', 'serializer_time',
+         'Time requests spent serializing and rendering data.'),
+        ('http_response_size_bytes_total', 'size',
+         'Size of the response bodies.'),
+        ('http_request_query_budget_exceeded_total', 'over_budget',
+         'Requests that ran more queries than their budget.'),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+            self.statuses = {}
+
+    def record(self, view, method, status, duration, size, metrics,
+               over_budget):
+        with self.lock:
+            series = self.series.setdefault((view, method), {
+                'queries': 0, 'db_time': 0.0, 'serializer_time': 0.0,
+                'size': 0, 'over_budget': 0, 'duration': 0.0,
+                'count': 0, 'buckets': [0] * len(DURATION_BUCKETS),
+            })
+            series['queries'] += metrics.queries
+            series['db_time'] += metrics.db_time
+            series['serializer_time'] += metrics.serializer_time
+            series['size'] += size
+            series['over_budget'] += over_budget
+            series['duration'] += duration
+            series['count'] += 1
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    series['buckets'][index] += 1
+            key = (view, method, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def render(self):
+        """
+        Returns the totals in the Prometheus text exposition format.
+        """
+        with self.lock:
+            series = sorted(self.series.items())
+            statuses = sorted(self.statuses.items())
+
+        def labels(view, method, **extra):
+            pairs = [('view', view), ('method', method), *extra.items()]
+            return '{' + ','.join(f'{name}="{escape_label(value)}"'
+                                  for name, value in pairs) + '}'
+
+        lines = [
+            '# HELP http_requests_total Requests by view, method and '
+            'status.',
+            '# TYPE http_requests_total counter',
+        ]
+        lines += [f'http_requests_total{labels(view, method, status=status)}'
+                  f' {count}'
+                  for (view, method, status), count in statuses]
+
+        name = 'http_request_duration_seconds'
+        lines += [f'# HELP {name} Request duration.',
+                  f'# TYPE {name} histogram']
+        for (view, method), values in series:
+            for bound, count in zip(DURATION_BUCKETS, values['buckets']):
+                lines.append(
+                    f'{name}_bucket{labels(view, method, le=bound)} {count}')
+            lines += [
+                f'{name}_bucket{labels(view, method, le="+Inf")} '
+                f'{values["count"]}',
+                f'{name}_sum{labels(view, method)} {values["duration"]}',
+                f'{name}_count{labels(view, method)} {values["count"]}',
+            ]
+
+        for name, field, description in self.COUNTERS:
+            lines += [f'# HELP {name} {description}',
+                      f'# TYPE {name} counter']
+            lines += [f'{name}{labels(view, method)} {values[field]}'
+                      for (view, method), values in series]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def get_query_budget(view):
+    """
+    Returns the number of queries a request to the view may run before a
+    warning is logged, or 0 for no budget.
+    """
+    return settings.QUERY_BUDGETS.get(view, settings.DEFAULT_QUERY_BUDGET)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the query count, database time, serializer time, duration and
+    response size of every request. They are added to the registry served
+    by the metrics view, and, when SERVER_TIMING is on, sent back in a
+    Server-Timing header. Requests running more queries than the budget
+    of their URL name, see get_query_budget, log a warning.
+
+    Works in both sync and async stacks; place it first in MIDDLEWARE so
+    it covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process_response(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process_response(request, response, metrics)
+
+    def process_response(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+
+        budget = get_query_budget(view)
+        over_budget = bool(budget) and metrics.queries > budget
+        if over_budget:
+            logger.warning(
+                '%s %s ran %d queries, over its budget of %d.',
+                request.method, request.path, metrics.queries, budget,
+                extra={'view': view, 'queries': metrics.queries})
+
+        registry.record(view, request.method, response.status_code,
+                        duration, size, metrics, over_budget)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={metrics.db_time * 1000:.2f};'
+                f'desc="{metrics.queries} queries"',
+                f'serializer;dur={metrics.serializer_time * 1000:.2f}',
+                f'total;dur={duration * 1000:.2f}',
+            ))
+        return response
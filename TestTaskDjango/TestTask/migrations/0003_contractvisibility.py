@@ -0,0 +1,61 @@
+# Generated by Django 4.2.11 on 2026-10-17 21:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_contract_visibility(apps, schema_editor):
+    """
+    Fills the index from the existing roles and General Directors.
+    """
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Contract = apps.get_model('TestTask', 'Contract')
+    ContractRole = apps.get_model('TestTask', 'ContractRole')
+    ContractVisibility = apps.get_model('TestTask', 'ContractVisibility')
+    User = apps.get_model('TestTask', 'User')
+
+    pairs = set(ContractRole.objects.values_list('user_id', 'contract_id'))
+    for model, field in (('subsidiary', 'organization_do_id'),
+                         ('contractor', 'organization_po_id')):
+        content_type = ContentType.objects.filter(
+            app_label='TestTask', model=model).first()
+        if content_type is None:
+            continue
+        directors = User.objects.filter(
+            job_title='GD', content_type=content_type,
+            object_id__isnull=False).values_list('pk', 'object_id')
+        for user_id, org_id in directors:
+            pairs.update(
+                (user_id, contract_id) for contract_id in
+                Contract.objects.filter(**{field: org_id})
+                .values_list('pk', flat=True))
+    ContractVisibility.objects.bulk_create(
+        [ContractVisibility(user_id=user_id, contract_id=contract_id)
+         for user_id, contract_id in pairs],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TestTask', '0002_alter_organization_name_alter_user_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='TestTask.contract')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visible_contracts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='contractvisibility',
+            constraint=models.UniqueConstraint(fields=('user', 'contract'), name='unique_contract_visibility'),
+        ),
+        migrations.RunPython(populate_contract_visibility,
+                             migrations.RunPython.noop),
+    ]
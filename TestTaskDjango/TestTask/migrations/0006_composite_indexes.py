@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-17 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TestTask', '0005_user_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['status', 'start_date', 'end_date'], name='contract_status_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['content_type', 'object_id'], name='user_organization_idx'),
+        ),
+    ]
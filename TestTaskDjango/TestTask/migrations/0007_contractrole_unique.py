@@ -0,0 +1,35 @@
+# Generated by Django 4.2.11 on 2026-10-17 22:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_roles(apps, schema_editor):
+    """
+    Keeps the oldest of any duplicated (contract, user, role) rows so the
+    unique constraint can be added.
+    """
+    ContractRole = apps.get_model('TestTask', 'ContractRole')
+    duplicates = ContractRole.objects.values(
+        'contract_id', 'user_id', 'role'
+    ).annotate(keep=Min('pk'), total=Count('pk')).filter(total__gt=1)
+    for row in duplicates:
+        ContractRole.objects.filter(
+            contract_id=row['contract_id'], user_id=row['user_id'],
+            role=row['role']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TestTask', '0006_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_roles,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='contractrole',
+            constraint=models.UniqueConstraint(fields=('contract', 'user', 'role'), name='unique_contract_role'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-17 22:07
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TestTask', '0007_contractrole_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='organization',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='organization_name_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 4.2.11 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+SEARCH_TEXT_FIELDS = ('username', 'first_name', 'last_name', 'email',
+                      'job_title')
+
+
+def fill_search_text(apps, schema_editor):
+    """
+    Copies organization names onto users and builds their search text,
+    as User.get_search_text does.
+    """
+    User = apps.get_model('TestTask', 'User')
+    Organization = apps.get_model('TestTask', 'Organization')
+    names = dict(Organization.objects.values_list('pk', 'name'))
+    users = []
+    for user in User.objects.only(
+            'object_id', *SEARCH_TEXT_FIELDS).iterator(chunk_size=1000):
+        user.organization_name = names.get(user.object_id, '')
+        values = [getattr(user, name) for name in SEARCH_TEXT_FIELDS]
+        values.append(user.organization_name)
+        user.search_text = ' '.join(value for value in values if value).lower()
+        users.append(user)
+        if len(users) == 1000:
+            User.objects.bulk_update(
+                users, ['organization_name', 'search_text'])
+            users = []
+    User.objects.bulk_update(users, ['organization_name', 'search_text'])
+
+
+class RunSQLOn(migrations.RunSQL):
+    """
+    RunSQL that only runs on databases of the given vendor.
+    """
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        return name, [self.vendor, *args], kwargs
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state)
+
+
+# An FTS5 trigram table over User.search_text, kept in sync by triggers.
+SQLITE_SEARCH_INDEX = [
+    'CREATE VIRTUAL TABLE "TestTask_user_search" '
+    "USING fts5(search_text, content='TestTask_user', content_rowid='id', "
+    "tokenize='trigram')",
+    'CREATE TRIGGER "TestTask_user_search_insert" '
+    'AFTER INSERT ON "TestTask_user" BEGIN '
+    'INSERT INTO "TestTask_user_search" (rowid, search_text) '
+    'VALUES (new.id, new.search_text); END',
+    'CREATE TRIGGER "TestTask_user_search_delete" '
+    'AFTER DELETE ON "TestTask_user" BEGIN '
+    'INSERT INTO "TestTask_user_search" '
+    '("TestTask_user_search", rowid, search_text) '
+    "VALUES ('delete', old.id, old.search_text); END",
+    'CREATE TRIGGER "TestTask_user_search_update" '
+    'AFTER UPDATE OF search_text ON "TestTask_user" BEGIN '
+    'INSERT INTO "TestTask_user_search" '
+    '("TestTask_user_search", rowid, search_text) '
+    "VALUES ('delete', old.id, old.search_text); "
+    'INSERT INTO "TestTask_user_search" (rowid, search_text) '
+    'VALUES (new.id, new.search_text); END',
+    'INSERT INTO "TestTask_user_search" ("TestTask_user_search") '
+    "VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SEARCH_INDEX = [
+    'DROP TRIGGER IF EXISTS "TestTask_user_search_insert"',
+    'DROP TRIGGER IF EXISTS "TestTask_user_search_delete"',
+    'DROP TRIGGER IF EXISTS "TestTask_user_search_update"',
+    'DROP TABLE IF EXISTS "TestTask_user_search"',
+]
+
+# A trigram index answering LIKE on User.search_text.
+POSTGRESQL_SEARCH_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX user_search_text_trgm_idx '
+    'ON "TestTask_user" USING gin (search_text gin_trgm_ops)',
+]
+
+POSTGRESQL_DROP_SEARCH_INDEX = [
+    'DROP INDEX IF EXISTS user_search_text_trgm_idx',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TestTask', '0008_organization_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='organization_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        RunSQLOn('sqlite', SQLITE_SEARCH_INDEX, SQLITE_DROP_SEARCH_INDEX),
+        RunSQLOn('postgresql', POSTGRESQL_SEARCH_INDEX,
+                 POSTGRESQL_DROP_SEARCH_INDEX),
+    ]
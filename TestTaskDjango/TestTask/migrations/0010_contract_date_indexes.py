@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-17 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TestTask', '0009_user_search_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['start_date', 'end_date'], name='contract_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['end_date'], name='contract_end_date_idx'),
+        ),
+    ]
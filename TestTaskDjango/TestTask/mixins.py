@@ -1,7 +1,153 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django.http import Http404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.utils.translation import gettext_lazy as _
 
-from .models import Contract
+from rest_framework import status
+from rest_framework.response import Response
+
+from .caching import (
+    aget_contracts_version,
+    contract_response_cache,
+    get_contracts_version
+)
+from .database import read_from_replica
+from .models import (
+    Contract,
+    ContractRole,
+    ContractVisibility,
+    Contractor,
+    Subsidiary
+)
+from .organizations import aget_user_organization, get_user_organization
+
+
+class ReplicaReadMixin:
+    """
+    A mixin for read-only views whose handlers load the contract data
+    inside replica_reads(), sending those queries to the read replicas,
+    see ReplicaRouter. Authentication and the permission checks keep
+    using the default database.
+
+    A replica may lag behind a write whose version bump has already been
+    seen, so ContractResponseCacheMixin neither caches a response read
+    from a replica nor gives it an ETag.
+    """
+    served_from_replica = False
+
+    @contextmanager
+    def replica_reads(self):
+        """
+        Sends the reads made inside the block to the replicas and, when
+        any are configured, marks the response as served from them.
+        """
+        with read_from_replica():
+            if settings.DATABASE_REPLICAS:
+                self.served_from_replica = True
+            yield
+
+
+class ContractResponseCacheMixin:
+    """
+    A mixin for read-only contract views that caches their GET responses
+    per user and URL under the current contract data version. Responses
+    carry an ETag derived from the same key, and a request whose
+    If-None-Match still matches is answered with 304 Not Modified.
+    The permission checks are skipped when a cached response or a
+    matching ETag exists, since they were passed for the same user at the
+    same version and only depend on data the version covers.
+
+    Responses read from a replica, see ReplicaReadMixin, are passed
+    through uncached and without an ETag.
+
+    The version must be shared by every worker, or a write would only
+    invalidate the responses of the worker handling it. Caching and ETags
+    are therefore off while CONTRACT_RESPONSE_CACHE_TIMEOUT is 0, its
+    default without CACHE_URL, and the TestTask.E001 check rejects a
+    timeout with a per-process cache.
+
+    The async views share the key, ETag and header handling through
+    aget_response_cache, is_not_modified and patch_response_cache.
+    """
+
+    def get_response_cache(self):
+        """
+        Returns the cache key and the ETag of the current request.
+        """
+        if not hasattr(self, '_response_cache'):
+            self._response_cache = contract_response_cache(
+                get_contracts_version(), self.request.user.pk,
+                self.request.build_absolute_uri())
+        return self._response_cache
+
+    async def aget_response_cache(self):
+        """
+        Async variant of get_response_cache.
+        """
+        if not hasattr(self, '_response_cache'):
+            self._response_cache = contract_response_cache(
+                await aget_contracts_version(), self.request.user.pk,
+                self.request.build_absolute_uri())
+        return self._response_cache
+
+    def is_not_modified(self, etag):
+        """
+        Returns whether the request's If-None-Match matches the ETag.
+        """
+        return etag in parse_etags(
+            self.request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+    def patch_response_cache(self, response, etag):
+        """
+        Adds the ETag to a response and makes clients revalidate it.
+        """
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+
+    def get_cached_response(self):
+        """
+        Returns a 304 response when the client's copy is current, the
+        cached response if there is one, or None.
+        """
+        if not hasattr(self, '_cached_response'):
+            self._cached_response = None
+            request = self.request
+            if (request.method == 'GET' and request.user.is_authenticated
+                    and settings.CONTRACT_RESPONSE_CACHE_TIMEOUT):
+                key, etag = self.get_response_cache()
+                if self.is_not_modified(etag):
+                    self._cached_response = Response(
+                        status=status.HTTP_304_NOT_MODIFIED)
+                else:
+                    data = cache.get(key)
+                    if data is not None:
+                        self._cached_response = Response(data)
+        return self._cached_response
+
+    def check_permissions(self, request):
+        if self.get_cached_response() is None:
+            super().check_permissions(request)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        timeout = settings.CONTRACT_RESPONSE_CACHE_TIMEOUT
+        if getattr(self, 'served_from_replica', False):
+            return response
+        if timeout and request.method == 'GET' and response.status_code in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            key, etag = self.get_response_cache()
+            if (response.status_code == status.HTTP_200_OK and
+                    getattr(self, '_cached_response', None) is None):
+                cache.set(key, response.data, timeout)
+            self.patch_response_cache(response, etag)
+        return response
 
 
 class ContractPermissionMixin:
@@ -9,6 +155,9 @@ class ContractPermissionMixin:
     A mixin class that provides permission checks and utility methods for
     handling contracts. Specifically, it helps in determining if a user has
     general director permissions for a specific contract.
+    The contract of the current request is loaded once, together with the
+    caller's access flags, and shared by the permission classes and the
+    handlers.
     """
 
     def check_general_director_permissions(self, user):
@@ -16,17 +165,61 @@ class ContractPermissionMixin:
         Check if the user is a GD with the right to view
         or manage the contract.
         """
+        if user.job_title != 'GD':
+            return False
+        organization = get_user_organization(user)
         return (
-            user.job_title == 'GD' and
-            hasattr(user.organization, 'is_system_owner') and
-            user.organization.is_system_owner
+            hasattr(organization, 'is_system_owner') and
+            organization.is_system_owner
+        )
+
+    async def acheck_general_director_permissions(self, user):
+        """
+        Async variant of check_general_director_permissions.
+        """
+        if user.job_title != 'GD':
+            return False
+        await aget_user_organization(user)
+        return self.check_general_director_permissions(user)
+
+    def is_contract_member(self, user, contract):
+        """
+        Check if the user belongs to one of the contract's organizations,
+        comparing ids instead of resolving the user's organization.
+        """
+        content_types = ContentType.objects.get_for_models(
+            Subsidiary, Contractor)
+        return (
+            (user.content_type_id == content_types[Subsidiary].pk and
+             user.object_id == contract.organization_do_id) or
+            (user.content_type_id == content_types[Contractor].pk and
+             user.object_id == contract.organization_po_id)
+        )
+
+    def get_contract_queryset(self):
+        """
+        Queryset the request's contract is loaded from, annotated with
+        whether the caller is a GD of the contract and whether it is
+        visible to them.
+        """
+        user = self.request.user
+        return Contract.objects.annotate(
+            user_is_contract_director=Exists(ContractRole.objects.filter(
+                contract=OuterRef('pk'), user=user, role='GD')),
+            user_can_view=Exists(ContractVisibility.objects.filter(
+                contract=OuterRef('pk'), user=user))
         )
 
     def get_contract(self, pk):
         """
-        Retrieve contract with error handling.
+        Retrieve contract with error handling. The contract is fetched
+        once per request and reused on later calls.
         """
-        try:
-            return Contract.objects.get(pk=pk)
-        except Contract.DoesNotExist:
-            raise Http404(_("Contract does not exist"))
+        if not hasattr(self, '_contracts'):
+            self._contracts = {}
+        if pk not in self._contracts:
+            try:
+                self._contracts[pk] = self.get_contract_queryset().get(pk=pk)
+            except Contract.DoesNotExist:
+                raise Http404(_("Contract does not exist"))
+        return self._contracts[pk]
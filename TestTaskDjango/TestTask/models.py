@@ -3,7 +3,8 @@ import re
 from django.contrib.auth.models import AbstractUser
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.functions import Upper
 from django.forms import ValidationError
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -26,6 +27,9 @@ class Organization(models.Model):
         verbose_name = _("Organization")
         verbose_name_plural = _("Organizations")
         ordering = ['name']
+        indexes = [
+            models.Index(Upper('name'), name='organization_name_upper_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -73,6 +77,87 @@ class User(AbstractUser):
     object_id = models.PositiveIntegerField(null=True, blank=True)
     organization = GenericForeignKey('content_type', 'object_id')
     job_title = models.CharField(max_length=255, choices=JOB_TITLE_CHOICES)
+    # Copy of the organization's name, kept for search.
+    organization_name = models.CharField(
+        max_length=255, blank=True, default='', editable=False)
+    # Lowercased text searched by the admin, built by get_search_text.
+    search_text = models.TextField(blank=True, default='', editable=False)
+
+    # Fields whose loaded values are remembered to detect organization
+    # and job title changes on save without reading the row again.
+    TRACKED_FIELDS = ('content_type_id', 'object_id', 'job_title')
+    # Fields copied into search_text, along with organization_name.
+    SEARCH_TEXT_FIELDS = ('username', 'first_name', 'last_name', 'email',
+                          'job_title')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'],
+                         name='user_organization_idx'),
+            models.Index(Upper('username'), name='user_username_upper_idx'),
+            models.Index(Upper('first_name'),
+                         name='user_first_name_upper_idx'),
+            models.Index(Upper('last_name'), name='user_last_name_upper_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.track_state()
+        return instance
+
+    def track_state(self):
+        """
+        Remembers the current values of TRACKED_FIELDS as the stored ones.
+        Nothing is remembered while one of them is deferred.
+        """
+        if all(name in self.__dict__ for name in self.TRACKED_FIELDS):
+            self._tracked_state = self.get_tracked_state()
+        else:
+            self._tracked_state = None
+
+    def get_tracked_state(self):
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+    @property
+    def stored_state(self):
+        """
+        Returns the values of TRACKED_FIELDS as last loaded or saved, or
+        None when they are unknown.
+        """
+        return getattr(self, '_tracked_state', None)
+
+    def get_search_text(self):
+        """
+        Returns the lowercased text matched by the admin user search.
+        """
+        values = [getattr(self, name) for name in self.SEARCH_TEXT_FIELDS]
+        values.append(self.organization_name)
+        return ' '.join(value for value in values if value).lower()
+
+    def update_search_text(self):
+        """
+        Rebuilds organization_name and search_text. The organization is
+        only loaded when it differs from the one the user was loaded with.
+        """
+        stored = self.stored_state
+        if stored is None or (
+                stored['content_type_id'], stored['object_id']) != (
+                self.content_type_id, self.object_id):
+            organization = self.organization
+            self.organization_name = organization.name if organization else ''
+        self.search_text = self.get_search_text()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.update_search_text()
+        elif set(update_fields) & {'content_type', 'content_type_id',
+                                   'object_id', *self.SEARCH_TEXT_FIELDS}:
+            self.update_search_text()
+            kwargs['update_fields'] = {
+                *update_fields, 'organization_name', 'search_text'}
+        super().save(*args, **kwargs)
 
 
 class Contract(models.Model):
@@ -94,6 +179,15 @@ class Contract(models.Model):
     organization_po = models.ForeignKey(
         Contractor, on_delete=models.CASCADE, related_name='contracts_po')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'start_date', 'end_date'],
+                         name='contract_status_dates_idx'),
+            models.Index(fields=['start_date', 'end_date'],
+                         name='contract_dates_idx'),
+            models.Index(fields=['end_date'], name='contract_end_date_idx'),
+        ]
+
     def clean(self):
         """
         Validates that the contract has valid title, dates, and logical
@@ -142,23 +236,36 @@ class ContractRole(models.Model):
         User, on_delete=models.CASCADE, related_name="contract_roles")
     role = models.CharField(max_length=2, choices=ROLE_CHOICES)
 
-    def clean(self):
-        if ContractRole.objects.filter(
-            contract=self.contract,
-            user=self.user,
-            role=self.role
-        ).exclude(pk=self.pk).exists():
-            raise ValidationError(
-                _("This user is already assigned this role in this contract.")
-            )
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contract', 'user', 'role'],
+                                    name='unique_contract_role')
+        ]
 
+    def clean(self):
+        # Duplicates are reported by full_clean() through the
+        # unique_contract_role constraint.
         valid_roles = [choice[0] for choice in self.ROLE_CHOICES]
         if self.role not in valid_roles:
             raise ValidationError(_("Invalid role selected."))
 
     def save(self, *args, **kwargs):
+        """
+        Saves the role in one statement. Duplicates are not checked
+        beforehand: the unique_contract_role constraint rejects them with
+        an IntegrityError, which also holds under concurrent requests.
+        Inside a transaction the INSERT runs in a savepoint, so the
+        transaction stays usable when the caller handles the error.
+        The role itself is validated first by clean().
+        """
         self.clean()
-        super(ContractRole, self).save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(
+            ContractRole, instance=self)
+        if transaction.get_connection(using).in_atomic_block:
+            with transaction.atomic(using=using):
+                super(ContractRole, self).save(*args, **kwargs)
+        else:
+            super(ContractRole, self).save(*args, **kwargs)
 
     def __str__(self):
         return _("{full_name} as {role} in {title}").format(
@@ -166,3 +273,71 @@ class ContractRole(models.Model):
             role=self.get_role_display(),
             title=self.contract.title
         )
+
+
+class ContractVisibility(models.Model):
+    """
+    Denormalized index of the contracts a user may see, either through
+    a role in the contract or as General Director of one of its
+    organizations. Kept up to date by the receivers in signals.py.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="visible_contracts")
+    contract = models.ForeignKey(
+        Contract, on_delete=models.CASCADE, related_name="visibility")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'contract'],
+                                    name='unique_contract_visibility')
+        ]
+
+    def __str__(self):
+        return _("{user} sees {contract}").format(
+            user=self.user_id, contract=self.contract_id)
+
+
+class ExportJob(models.Model):
+    """
+    Model tracking a background CSV export of contracts started from the
+    admin. The export is split into shards that are written in parallel
+    and concatenated into a file unique to the job.
+    """
+    STATUS_CHOICES = (
+        ('PN', _('Pending')),
+        ('RN', _('Running')),
+        ('DN', _('Done')),
+        ('FL', _('Failed')),
+    )
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="export_jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(
+        max_length=2, choices=STATUS_CHOICES, default='PN')
+    contract_ids = models.JSONField(null=True, blank=True)
+    filters = models.JSONField(default=dict, blank=True)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    shard_count = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def progress(self):
+        """
+        Returns the share of exported rows as a percentage.
+        """
+        if self.status == 'DN':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, self.processed_rows * 100 // self.total_rows)
+
+    def __str__(self):
+        return _("Export #{pk} ({status})").format(
+            pk=self.pk, status=self.get_status_display())
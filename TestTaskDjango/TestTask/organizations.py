@@ -0,0 +1,227 @@
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .database import read_from_default
+from .models import Contractor, Organization, Subsidiary, User
+from .search import prefix_search
+
+ORGANIZATION_MODELS = (Subsidiary, Contractor)
+
+
+def organization_cache_key(model, pk):
+    """
+    Returns the shared cache key of an organization.
+    """
+    return f'organization:{model._meta.model_name}:{pk}'
+
+
+def get_organization_cache_timeout(model):
+    """
+    Returns the seconds organizations of a model stay cached. A
+    subsidiary's is_system_owner flag grants General Director rights, so
+    subsidiaries are kept no longer than a principal snapshot.
+    """
+    if model is Subsidiary:
+        return min(settings.ORGANIZATION_CACHE_TIMEOUT,
+                   settings.PRINCIPAL_CACHE_TIMEOUT)
+    return settings.ORGANIZATION_CACHE_TIMEOUT
+
+
+def invalidate_organization(pk):
+    """
+    Drops the cached copies of the organization with the given id once
+    the current transaction commits.
+    """
+    transaction.on_commit(lambda: cache.delete_many(
+        [organization_cache_key(model, pk) for model in ORGANIZATION_MODELS]))
+
+
+def organization_users_key(pk):
+    """
+    Returns the shared cache key of the version of an organization's users.
+    """
+    return f'organization-users:{pk}'
+
+
+def get_organization_users_versions(pks):
+    """
+    Returns the time the users of each organization last changed, as
+    recorded by touch_organization_users. Organizations without a
+    recorded time are given the current one.
+
+    Parameters:
+    - pks (iterable): Organization ids.
+
+    Returns:
+    - dict: The version timestamp of each organization id.
+    """
+    keys = {organization_users_key(pk): pk for pk in pks}
+    versions = {keys[key]: version
+                for key, version in cache.get_many(keys).items()}
+    missing = {key: time.time() for key, pk in keys.items()
+               if pk not in versions}
+    if missing:
+        cache.set_many(missing, settings.ORGANIZATION_CACHE_TIMEOUT)
+        versions.update((keys[key], version)
+                        for key, version in missing.items())
+    return versions
+
+
+def touch_organization_users(pks):
+    """
+    Records that the users of the given organizations changed, once the
+    current transaction commits, so responses listing them are revalidated.
+    """
+    pks = {pk for pk in pks if pk is not None}
+    if pks and settings.ORGANIZATION_CACHE_TIMEOUT:
+        transaction.on_commit(lambda: cache.set_many(
+            {organization_users_key(pk): time.time() for pk in pks},
+            settings.ORGANIZATION_CACHE_TIMEOUT))
+
+
+def load_organizations(pairs):
+    """
+    Loads organizations by (content type id, object id) pair. They are
+    looked up in the shared cache first; the rest are loaded from the
+    default database with at most one query per organization type and
+    written back to the cache for get_organization_cache_timeout.
+
+    Parameters:
+    - pairs (iterable): (content type id, object id) pairs.
+
+    Returns:
+    - dict: The organization of each pair that names an existing
+    subsidiary or contractor.
+    """
+    pending = {}
+    for content_type_id, pk in pairs:
+        if content_type_id is None or pk is None:
+            continue
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model in ORGANIZATION_MODELS:
+            pending[(model, pk)] = (content_type_id, pk)
+    if not pending:
+        return {}
+
+    keys = {organization_cache_key(model, pk): (model, pk)
+            for model, pk in pending}
+    found = {keys[key]: organization
+             for key, organization in cache.get_many(keys).items()}
+
+    missing = defaultdict(list)
+    for model, pk in pending.keys() - found.keys():
+        missing[model].append(pk)
+    with read_from_default():
+        for model, pks in missing.items():
+            loaded = {}
+            for pk, organization in model.objects.in_bulk(pks).items():
+                loaded[organization_cache_key(model, pk)] = organization
+                found[(model, pk)] = organization
+            timeout = get_organization_cache_timeout(model)
+            if loaded and timeout:
+                cache.set_many(loaded, timeout)
+
+    return {pending[key]: organization
+            for key, organization in found.items()}
+
+
+def resolve_organizations(users):
+    """
+    Resolves User.organization for many users at once with
+    load_organizations and stores the result on each instance, so later
+    attribute access is free.
+
+    Parameters:
+    - users (iterable): User instances to resolve organizations for.
+
+    Returns:
+    - list: The organization of each user, in the order given.
+    """
+    users = list(users)
+    field = User.organization
+    pending = [user for user in users if not field.is_cached(user)]
+    organizations = load_organizations(
+        (user.content_type_id, user.object_id) for user in pending)
+    for user in pending:
+        field.set_cached_value(user, organizations.get(
+            (user.content_type_id, user.object_id)))
+    return [user.organization for user in users]
+
+
+def get_user_organization(user):
+    """
+    Returns the organization of a single user through the shared cache.
+    """
+    return resolve_organizations([user])[0]
+
+
+async def aget_user_organization(user):
+    """
+    Async variant of get_user_organization. An organization already
+    stored on the user is returned without leaving the event loop.
+    """
+    if User.organization.is_cached(user):
+        return user.organization
+    return await sync_to_async(get_user_organization)(user)
+
+
+async def aload_organizations(pairs):
+    """
+    Async variant of load_organizations, run in the ORM's thread.
+    """
+    return await sync_to_async(load_organizations)(list(pairs))
+
+
+def organization_value(organization):
+    """
+    Returns the '<model name>_<id>' value identifying an organization in
+    the user admin form.
+    """
+    return f'{organization._meta.model_name}_{organization.pk}'
+
+
+def organization_label(organization):
+    """
+    Returns the label of an organization in the user admin form.
+    """
+    return f'{organization._meta.verbose_name.title()}: {organization.name}'
+
+
+def parse_organization_value(value):
+    """
+    Splits a '<model name>_<id>' value into the organization model and id.
+
+    Returns:
+    - tuple: The model and id, or None when the value is malformed.
+    """
+    model_name, _, pk = str(value).partition('_')
+    models = {model._meta.model_name: model for model in ORGANIZATION_MODELS}
+    if model_name not in models or not pk.isdigit():
+        return None
+    return models[model_name], int(pk)
+
+
+def search_organizations(term, offset=0, limit=20):
+    """
+    Finds subsidiaries and contractors whose name starts with the term,
+    ignoring case, in name order with a single query.
+
+    Returns:
+    - list: Up to limit Subsidiary and Contractor instances.
+    """
+    organizations = prefix_search(
+        Organization.objects.filter(
+            Q(subsidiary__isnull=False) | Q(contractor__isnull=False)),
+        ('name',), term
+    ).select_related('subsidiary', 'contractor').order_by('name', 'pk')
+    return [
+        getattr(organization, 'subsidiary', None) or organization.contractor
+        for organization in organizations[offset:offset + limit]
+    ]
@@ -0,0 +1,44 @@
+from asgiref.sync import sync_to_async
+
+from rest_framework.pagination import CursorPagination
+
+from .responses import CustomResponse
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination wrapped in the CustomResponse envelope. The opaque
+    cursor encodes the last seen ordering value, so every page is a single
+    indexed range scan no matter how many rows precede it.
+    apaginate_queryset runs DRF's paginate_queryset in the ORM's thread
+    for the async views.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async variant of paginate_queryset.
+        """
+        return await sync_to_async(self.paginate_queryset)(
+            queryset, request, view)
+
+    def get_pagination(self):
+        """
+        Returns the pagination links added to the response envelope.
+        """
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link()
+        }
+
+    def get_paginated_response(self, data):
+        return CustomResponse(data, pagination=self.get_pagination())
+
+
+class UserKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination over users ordered by their unique username.
+    """
+    ordering = 'username'
@@ -4,17 +4,27 @@ from rest_framework.response import Response
 from rest_framework.views import exception_handler
 
 
+def envelope(data, pagination=None):
+    """
+    Wraps response data in the envelope every API response shares.
+    """
+    data = {
+        'data': data,
+        'app_version': '1.0.0'
+    }
+    if pagination is not None:
+        data.update(pagination)
+    return data
+
+
 class CustomResponse(Response):
     def __init__(self, data=None, status=status.HTTP_200_OK,
                  template_name=None, headers=None,
-                 exception=False, content_type=None):
+                 exception=False, content_type=None, pagination=None):
         super().__init__(data, status=status, template_name=template_name,
                          headers=headers, exception=exception,
                          content_type=content_type)
-        self.data = {
-            'data': self.data,
-            'app_version': '1.0.0'
-        }
+        self.data = envelope(self.data, pagination)
 
 
 def custom_exception_handler(exc, context):
@@ -0,0 +1,82 @@
+from functools import reduce
+from operator import or_
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Upper
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+
+# Fields searched by prefix on the manage-users listing. Each one has an
+# Upper() index on User.
+USER_SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+# SQLite FTS5 table indexing User.search_text by trigrams, created by
+# migration 0009. It reads the text from the user table and is kept in
+# sync by triggers, see restore_user_search_index in signals.py.
+USER_SEARCH_TABLE = 'TestTask_user_search'
+
+# Shortest word the trigram indexes can look up.
+MIN_INDEXED_WORD_LENGTH = 3
+
+
+def prefix_search(queryset, fields, term):
+    """
+    Filters the queryset to rows where any of the fields starts with the
+    term, ignoring case. The prefix is expressed as a range over Upper()
+    of each field, so it is answered from an index on that expression
+    instead of a LIKE scan.
+
+    Parameters:
+    - queryset (QuerySet): The queryset to filter.
+    - fields (iterable): Names of the fields to match.
+    - term (str): The prefix to search for.
+
+    Returns:
+    - QuerySet: The filtered queryset, or the queryset unchanged for an
+    empty term.
+    """
+    prefix = term.strip().upper()
+    if not prefix:
+        return queryset
+    return queryset.filter(reduce(or_, (
+        Q(GreaterThanOrEqual(Upper(field), prefix),
+          LessThan(Upper(field), prefix + '\uffff'))
+        for field in fields
+    )))
+
+
+def search_users(queryset, term):
+    """
+    Filters a User queryset to the users whose search_text contains every
+    word of the term, ignoring case. search_text holds the username,
+    names, email, job title and organization name, so one indexed column
+    replaces a scan of each field and a join to the organizations.
+
+    On SQLite, words of three characters or more are matched through the
+    FTS5 trigram table; shorter words, and all words on other databases,
+    use LIKE on search_text, which PostgreSQL answers from its trigram
+    index.
+
+    Parameters:
+    - queryset (QuerySet): The User queryset to filter.
+    - term (str): The words to search for.
+
+    Returns:
+    - QuerySet: The filtered queryset, without duplicates.
+    """
+    words = term.lower().split()
+    if connections[queryset.db].vendor == 'sqlite':
+        indexed = [word for word in words
+                   if len(word) >= MIN_INDEXED_WORD_LENGTH]
+        if indexed:
+            query = ' '.join(
+                '"{}"'.format(word.replace('"', '""')) for word in indexed)
+            queryset = queryset.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM "{USER_SEARCH_TABLE}" '
+                f'WHERE "{USER_SEARCH_TABLE}" MATCH %s', (query,)))
+        words = [word for word in words
+                 if len(word) < MIN_INDEXED_WORD_LENGTH]
+    for word in words:
+        queryset = queryset.filter(search_text__contains=word)
+    return queryset
@@ -1,5 +1,13 @@
+from django.db.models import Prefetch
+from django.utils.translation import gettext_lazy as _
+
 from rest_framework import serializers
 from .models import Contract, Subsidiary, Contractor, ContractRole, User
+from .organizations import (
+    aload_organizations,
+    load_organizations,
+    resolve_organizations
+)
 
 
 class OrganizationSerializer(serializers.ModelSerializer):
@@ -42,31 +50,96 @@ class ContractRoleSerializer(serializers.ModelSerializer):
         fields = ['full_name', 'role_display', 'user']
 
 
+class ContractListSerializer(serializers.ListSerializer):
+    """
+    List serializer resolving the organizations of every participant of
+    every contract in one batch before serializing them.
+    """
+
+    def to_representation(self, data):
+        contracts = list(data.all() if hasattr(data, 'all') else data)
+        if 'participants' in self.child.fields:
+            resolve_organizations(
+                role.user for contract in contracts
+                for role in contract.roles.all())
+        return super().to_representation(contracts)
+
+
 class ContractSerializer(serializers.ModelSerializer):
     """
     Serializer for Contract model, includes detailed organization and
     participant information.
+    The fields argument restricts the output to a subset of
+    Meta.fields; id is always kept.
     """
     organization_do = SubsidiarySerializer(read_only=True)
     organization_po = ContractorSerializer(read_only=True)
     participants = serializers.SerializerMethodField()
 
+    # Columns read from each participant, with the user's organization.
+    PARTICIPANT_FIELDS = ('contract', 'role', 'user__username',
+                          'user__first_name', 'user__last_name',
+                          'user__content_type', 'user__object_id')
+
     class Meta:
         model = Contract
         fields = ['id', 'title', 'start_date', 'end_date', 'status',
                   'organization_do', 'organization_po', 'participants']
+        list_serializer_class = ContractListSerializer
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - {'id', *fields}:
+                self.fields.pop(name)
+
+    @classmethod
+    def parse_fields(cls, value):
+        """
+        Parses a comma-separated ?fields= value.
+
+        Returns:
+        - list: The requested field names, or None when value is empty.
+
+        Raises:
+        - ValidationError: If a name is not one of Meta.fields.
+        """
+        if not value:
+            return None
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in cls.Meta.fields]
+        if unknown:
+            raise serializers.ValidationError({'fields': _(
+                'Unknown fields: {fields}.').format(
+                    fields=', '.join(unknown))})
+        return fields
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        """
+        Joins the organizations and prefetches the roles with their users
+        in a constant number of queries, limited to what the requested
+        fields render. The users' organizations are resolved in bulk by
+        ContractListSerializer.
+        """
+        fields = cls.Meta.fields if fields is None else fields
+        related = [name for name in ('organization_do', 'organization_po')
+                   if name in fields]
+        if related:
+            queryset = queryset.select_related(*related)
+        if 'participants' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'roles', queryset=ContractRole.objects.select_related(
+                    'user').only(*cls.PARTICIPANT_FIELDS).order_by('pk')))
+        return queryset
 
     def get_participants(self, obj):
         """
         Retrieves a list of participants with their roles in the contract.
         """
-        participants_data = []
-        roles = ContractRole.objects.filter(
-            contract=obj).select_related('user')
-        for role in roles:
-            serializer = UserContractRoleSerializer(role)
-            participants_data.append(serializer.data)
-        return participants_data
+        roles = obj.roles.all()
+        resolve_organizations(role.user for role in roles)
+        return UserContractRoleSerializer(roles, many=True).data
 
 
 class UserContractRoleSerializer(serializers.ModelSerializer):
@@ -88,22 +161,179 @@ class UserContractRoleSerializer(serializers.ModelSerializer):
         Retrieves the organization associated with the user,
         serialized based on the specific type of organization.
         """
-        user = obj.user
-        if user.content_type and user.object_id:
-            OrganizationModel = user.content_type.model_class()
-            organization = OrganizationModel.objects.filter(
-                id=user.object_id).first()
-            if organization:
-                if isinstance(organization, Subsidiary):
-                    return SubsidiarySerializer(organization).data
-                elif isinstance(organization, Contractor):
-                    return ContractorSerializer(organization).data
+        organization = obj.user.organization
+        if isinstance(organization, Subsidiary):
+            return SubsidiarySerializer(organization).data
+        elif isinstance(organization, Contractor):
+            return ContractorSerializer(organization).data
         return None
 
 
+class ContractValuesSerializer:
+    """
+    Read-only fast path producing the ContractSerializer representation
+    of a list of contracts from values() rows. The output is built as
+    plain dicts, without model instances or serializer fields, with one
+    query for the participants of all contracts; their organizations come
+    from load_organizations.
+
+    The fields argument works as on ContractSerializer. Pass the values
+    attribute to values() on the contract queryset. aserialize is the
+    variant for async views.
+    """
+    ORGANIZATION_FIELDS = {
+        'organization_do': ('name', 'is_system_owner'),
+        'organization_po': ('name', 'licensed'),
+    }
+    DATE_FIELDS = ('start_date', 'end_date')
+
+    def __init__(self, fields=None):
+        requested = set(ContractSerializer.Meta.fields if fields is None
+                        else ['id', *fields])
+        self.fields = [name for name in ContractSerializer.Meta.fields
+                       if name in requested]
+
+    @property
+    def values(self):
+        """
+        The columns to read from the contract queryset.
+        """
+        values = ['id']
+        for name in self.fields:
+            if name in self.ORGANIZATION_FIELDS:
+                values.append(f'{name}_id')
+                values += [f'{name}__{field}'
+                           for field in self.ORGANIZATION_FIELDS[name]]
+            elif name not in ('id', 'participants'):
+                values.append(name)
+        return values
+
+    def serialize(self, rows):
+        """
+        Returns the representation of each contract row, in order.
+        """
+        rows = list(rows)
+        participants = {}
+        if 'participants' in self.fields:
+            participants = self.get_participants([row['id'] for row in rows])
+        return [self.to_representation(row, participants.get(row['id'], []))
+                for row in rows]
+
+    async def aserialize(self, rows):
+        """
+        Async variant of serialize.
+        """
+        participants = {}
+        if 'participants' in self.fields:
+            participants = await self.aget_participants(
+                [row['id'] for row in rows])
+        return [self.to_representation(row, participants.get(row['id'], []))
+                for row in rows]
+
+    def to_representation(self, row, participants):
+        data = {}
+        for name in self.fields:
+            if name in self.ORGANIZATION_FIELDS:
+                data[name] = {'id': row[f'{name}_id']}
+                for field in self.ORGANIZATION_FIELDS[name]:
+                    data[name][field] = row[f'{name}__{field}']
+            elif name == 'participants':
+                data[name] = participants
+            elif name in self.DATE_FIELDS:
+                data[name] = row[name].isoformat()
+            else:
+                data[name] = row[name]
+        return data
+
+    def get_roles(self, contract_ids):
+        """
+        Returns the queryset of the participant rows of the contracts.
+        """
+        return ContractRole.objects.filter(
+            contract_id__in=contract_ids
+        ).order_by('pk').values_list(
+            'contract_id', 'role', 'user__username', 'user__first_name',
+            'user__last_name', 'user__content_type_id', 'user__object_id')
+
+    def get_participants(self, contract_ids):
+        """
+        Returns the participants of each contract in role creation order,
+        shaped like UserContractRoleSerializer.
+        """
+        roles = list(self.get_roles(contract_ids))
+        return self.group_participants(roles, load_organizations(
+            (content_type_id, object_id)
+            for *_, content_type_id, object_id in roles))
+
+    async def aget_participants(self, contract_ids):
+        """
+        Async variant of get_participants.
+        """
+        # Not aiterator(): in Django 4.2 it runs values_list() queries
+        # in the event loop's thread.
+        roles = [role async for role in self.get_roles(contract_ids)]
+        return self.group_participants(roles, await aload_organizations(
+            (content_type_id, object_id)
+            for *_, content_type_id, object_id in roles))
+
+    def group_participants(self, roles, organizations):
+        """
+        Groups participant rows by contract, given their organizations.
+        """
+        role_names = dict(ContractRole.ROLE_CHOICES)
+
+        participants = {}
+        for (contract_id, role, username, first_name, last_name,
+             content_type_id, object_id) in roles:
+            participants.setdefault(contract_id, []).append({
+                'username': username,
+                'full_name': f'{first_name} {last_name}'.strip(),
+                'contract_role': str(role_names.get(role, role)),
+                'organization': self.get_organization(
+                    organizations.get((content_type_id, object_id))),
+            })
+        return participants
+
+    @staticmethod
+    def get_organization(organization):
+        if isinstance(organization, Subsidiary):
+            return {'id': organization.pk, 'name': organization.name,
+                    'is_system_owner': organization.is_system_owner}
+        if isinstance(organization, Contractor):
+            return {'id': organization.pk, 'name': organization.name,
+                    'licensed': organization.licensed}
+        return None
+
+
+class UserValuesSerializer(serializers.Serializer):
+    """
+    Serializer producing the UserSerializer representation from
+    values() rows, so listings skip building model instances.
+    """
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    email = serializers.CharField()
+    full_name = serializers.SerializerMethodField()
+
+    VALUES = ('id', 'username', 'email', 'first_name', 'last_name')
+
+    def get_full_name(self, obj):
+        return f"{obj['first_name']} {obj['last_name']}".strip()
+
+
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.CharField(source='get_full_name', read_only=True)
 
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'full_name']
+
+
+class ContractRoleOperationSerializer(serializers.Serializer):
+    """
+    Serializer validating the shape of one operation of a bulk
+    manage-users request.
+    """
+    action = serializers.ChoiceField(choices=['add', 'remove'])
+    username = serializers.CharField(max_length=150)
+    role = serializers.ChoiceField(choices=ContractRole.ROLE_CHOICES)
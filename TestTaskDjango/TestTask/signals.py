@@ -1,73 +1,272 @@
-from django.db import transaction
-from django.db.models import Q
-from django.db.models.signals import pre_save
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import Contract, ContractRole, User
+from .models import (
+    Contract,
+    ContractRole,
+    Contractor,
+    Organization,
+    Subsidiary,
+    User
+)
+from .authentication import invalidate_principal
+from .caching import touch_contracts
+from .organizations import invalidate_organization, touch_organization_users
+from .search import USER_SEARCH_TABLE
+from .visibility import defer_visibility_refresh, refresh_contract_visibility
 
 
-def get_user_contracts(user):
+def remove_foreign_contract_roles(user):
     """
-    Retrieves a set of contract IDs associated with a given
-    user through contract roles.
+    Deletes the contract roles of a user in contracts that do not involve
+    the user's current organization, matching the organization by type as
+    well as id. The ContractRole delete receivers run inside
+    defer_visibility_refresh(), so the index is refreshed once for all
+    the deleted roles.
 
     Parameters:
-    - user (User): The user instance whose contracts are to be retrieved.
-
-    Returns:
-    - set: A set of contract IDs.
-    """
-    return set(ContractRole.objects.filter(user=user)
-               .values_list('contract_id', flat=True))
-
-
-def get_invalid_contract_ids(user_id, valid_contract_ids):
-    """
-    Filters out contract IDs that are no longer valid for a user based
-    on changes in associated organizations.
-
-    Parameters:
-    - user_id (int): The ID of the user's current organization.
-    - valid_contract_ids (set): A set of contract IDs currently
-    linked to the user.
-
-    Returns:
-    - set: A set of contract IDs that are no longer valid.
+    - user (User): The user whose contract roles are to be cleaned up.
     """
-    return set(
-        Contract.objects.filter(
-            ~Q(organization_do_id=user_id) & ~Q(organization_po_id=user_id),
-            id__in=valid_contract_ids
-        ).values_list('id', flat=True)
-    )
+    content_types = ContentType.objects.get_for_models(Subsidiary, Contractor)
+    roles = ContractRole.objects.filter(user=user)
+    if user.content_type_id == content_types[Subsidiary].pk:
+        roles = roles.exclude(contract__organization_do_id=user.object_id)
+    elif user.content_type_id == content_types[Contractor].pk:
+        roles = roles.exclude(contract__organization_po_id=user.object_id)
+    with defer_visibility_refresh():
+        roles.delete()
 
 
 @receiver(pre_save, sender=User)
-def update_user_contract_roles(sender, instance, **kwargs):
+def update_user_contract_roles(sender, instance, update_fields=None,
+                               **kwargs):
     """
     Signal to update the contract roles for a user before saving,
     if there are changes in the user's associated organization.
     This ensures that the user is only linked to contracts that involve
     the organization they are currently part of.
+    Changes are detected against the values the user was loaded with,
+    so saves leaving the organization and job title alone, such as
+    last_login updates, run no queries.
 
     Parameters:
     - sender (Model class): The model class that sent the signal.
     - instance (User): The instance of the model that's about to be saved.
+    - update_fields (frozenset): The fields being saved, if restricted.
     - kwargs (dict): Additional keyword arguments.
     """
-    if instance.pk:
-        try:
-            old_user = User.objects.only(
-                'object_id', 'content_type').get(pk=instance.pk)
-            if (old_user.object_id != instance.object_id or
-                    old_user.content_type != instance.content_type):
-                with transaction.atomic():
-                    current_contracts_ids = get_user_contracts(instance)
-                    non_valid_contracts_ids = get_invalid_contract_ids(
-                        instance.object_id, current_contracts_ids
-                    )
-                    ContractRole.objects.filter(
-                        user=instance, contract_id__in=non_valid_contracts_ids
-                    ).delete()
-        except User.DoesNotExist:
-            pass
+    instance._previous_object_id = instance.object_id
+    if update_fields is not None and not set(update_fields) & {
+            'content_type', 'object_id', 'job_title', *User.TRACKED_FIELDS}:
+        instance._visibility_changed = False
+        return
+
+    stored = instance.stored_state
+    if stored is None and instance.pk:
+        stored = User.objects.filter(pk=instance.pk).values(
+            *User.TRACKED_FIELDS).first()
+    if stored is None:
+        instance._visibility_changed = True
+        return
+
+    instance._previous_object_id = stored['object_id']
+
+    current = instance.get_tracked_state()
+    instance._visibility_changed = stored != current
+    if (stored['content_type_id'], stored['object_id']) != (
+            current['content_type_id'], current['object_id']):
+        remove_foreign_contract_roles(instance)
+
+
+@receiver([post_save, post_delete], sender=Organization)
+@receiver([post_save, post_delete], sender=Subsidiary)
+@receiver([post_save, post_delete], sender=Contractor)
+def invalidate_cached_organization(sender, instance, **kwargs):
+    """
+    Signal to drop an organization from the shared cache used to resolve
+    User.organization whenever it is saved or deleted.
+    """
+    invalidate_organization(instance.pk)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_save, sender=Subsidiary)
+@receiver(post_save, sender=Contractor)
+def update_organization_search_text(sender, instance, created=False,
+                                    **kwargs):
+    """
+    Signal to copy a renamed organization's name into the search text of
+    its users. Only users holding another name are loaded, so saves that
+    keep the name only run the lookup.
+    """
+    if created:
+        return
+    content_types = ContentType.objects.get_for_models(Subsidiary, Contractor)
+    users = User.objects.filter(
+        content_type__in=content_types.values(), object_id=instance.pk
+    ).exclude(organization_name=instance.name).only(
+        'content_type', 'object_id', 'organization_name',
+        *User.SEARCH_TEXT_FIELDS)
+    updated = []
+    for user in users.iterator(chunk_size=1000):
+        user.organization_name = instance.name
+        user.search_text = user.get_search_text()
+        updated.append(user)
+    User.objects.bulk_update(
+        updated, ['organization_name', 'search_text'], batch_size=1000)
+
+
+# Triggers keeping the SQLite user search table in sync with
+# User.search_text, as created by migration 0009.
+USER_SEARCH_TRIGGERS = {
+    'TestTask_user_search_insert': (
+        'CREATE TRIGGER IF NOT EXISTS "TestTask_user_search_insert" '
+        'AFTER INSERT ON "TestTask_user" BEGIN '
+        'INSERT INTO "TestTask_user_search" (rowid, search_text) '
+        'VALUES (new.id, new.search_text); END'),
+    'TestTask_user_search_delete': (
+        'CREATE TRIGGER IF NOT EXISTS "TestTask_user_search_delete" '
+        'AFTER DELETE ON "TestTask_user" BEGIN '
+        'INSERT INTO "TestTask_user_search" '
+        '("TestTask_user_search", rowid, search_text) '
+        "VALUES ('delete', old.id, old.search_text); END"),
+    'TestTask_user_search_update': (
+        'CREATE TRIGGER IF NOT EXISTS "TestTask_user_search_update" '
+        'AFTER UPDATE OF search_text ON "TestTask_user" BEGIN '
+        'INSERT INTO "TestTask_user_search" '
+        '("TestTask_user_search", rowid, search_text) '
+        "VALUES ('delete', old.id, old.search_text); "
+        'INSERT INTO "TestTask_user_search" (rowid, search_text) '
+        'VALUES (new.id, new.search_text); END'),
+}
+
+
+def restore_user_search_index(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate handler restoring the SQLite user search triggers, which
+    are dropped whenever a migration rebuilds the user table. The search
+    table is rebuilt when a trigger had to be restored, since it missed
+    the changes made meanwhile.
+    """
+    connection = connections[using]
+    if (connection.vendor != 'sqlite' or USER_SEARCH_TABLE not in
+            connection.introspection.table_names()):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'TestTask_user'")
+        if {row[0] for row in cursor.fetchall()} >= (
+                USER_SEARCH_TRIGGERS.keys()):
+            return
+        for sql in USER_SEARCH_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(
+            f'INSERT INTO "{USER_SEARCH_TABLE}" ("{USER_SEARCH_TABLE}") '
+            "VALUES ('rebuild')")
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_principal(sender, instance, update_fields=None,
+                                **kwargs):
+    """
+    Signal to drop the cached JWT principal of a user whenever the user
+    is saved or deleted. Saves touching only last_login are ignored.
+    """
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        invalidate_principal(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Contract)
+@receiver([post_save, post_delete], sender=ContractRole)
+@receiver([post_save, post_delete], sender=Organization)
+@receiver([post_save, post_delete], sender=Subsidiary)
+@receiver([post_save, post_delete], sender=Contractor)
+def invalidate_contract_responses(sender, instance, update_fields=None,
+                                  **kwargs):
+    """
+    Signal to move the contract data to a new version whenever a model
+    rendered by or deciding access to the contract endpoints changes.
+    User saves touching only last_login are ignored.
+    """
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        touch_contracts()
+
+
+@receiver(post_save, sender=User)
+def touch_user_organizations(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal to revalidate the user lists of the organizations a user joined
+    or left, or whose username changed. Saves leaving the username and
+    organization alone are ignored.
+    """
+    if update_fields is None or set(update_fields) & {
+            'username', 'content_type', 'object_id', 'content_type_id'}:
+        touch_organization_users([
+            getattr(instance, '_previous_object_id', None),
+            instance.object_id])
+
+
+@receiver(post_delete, sender=User)
+def touch_deleted_user_organization(sender, instance, **kwargs):
+    """
+    Signal to revalidate the user list of a deleted user's organization.
+    """
+    touch_organization_users([instance.object_id])
+
+
+@receiver(post_save, sender=User)
+def update_user_contract_visibility(sender, instance, update_fields=None,
+                                    **kwargs):
+    """
+    Signal to refresh the contract visibility index of a user after
+    update_user_contract_roles detected a new user or a change of
+    organization or job title, and to remember the saved values.
+    """
+    if getattr(instance, '_visibility_changed', True):
+        refresh_contract_visibility(user_ids=[instance.pk])
+    instance._visibility_changed = False
+    if update_fields is None:
+        instance.track_state()
+    elif instance.stored_state is not None:
+        for name in User.TRACKED_FIELDS:
+            if (name in update_fields or
+                    name.removesuffix('_id') in update_fields):
+                instance.stored_state[name] = getattr(instance, name)
+
+
+@receiver(post_save, sender=Contract)
+def update_contract_visibility(sender, instance, **kwargs):
+    """
+    Signal to refresh the visibility index of a contract after it is
+    created or its organizations are changed.
+    """
+    refresh_contract_visibility(contract_ids=[instance.pk])
+
+
+@receiver(post_save, sender=ContractRole)
+def add_contract_role_visibility(sender, instance, **kwargs):
+    """
+    Signal to make a contract visible to a user assigned a role in it.
+    """
+    refresh_contract_visibility(user_ids=[instance.user_id],
+                                contract_ids=[instance.contract_id])
+
+
+@receiver(post_delete, sender=ContractRole)
+def remove_contract_role_visibility(sender, instance, origin=None,
+                                    **kwargs):
+    """
+    Signal to refresh the visibility of a contract for a user who lost a
+    role in it. Deletions cascading from a user, contract or organization
+    are skipped, as the cascade removes their index rows itself.
+    """
+    origin_model = (origin.model if isinstance(origin, QuerySet)
+                    else type(origin))
+    if origin is None or origin_model is ContractRole:
+        refresh_contract_visibility(user_ids=[instance.user_id],
+                                    contract_ids=[instance.contract_id])
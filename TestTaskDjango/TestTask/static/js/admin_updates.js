@@ -29,19 +29,21 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     async function fetchAndUpdateUsers() {
-        const orgDoId = orgDoSelect.value;
-        const orgPoId = orgPoSelect.value;
+        const params = new URLSearchParams();
+        if (orgDoSelect.value) params.append('org', `subsidiary_${orgDoSelect.value}`);
+        if (orgPoSelect.value) params.append('org', `contractor_${orgPoSelect.value}`);
+        if (!params.has('org')) return;
 
         try {
-            const response = await fetch(`/fetch_users/?org_do_id=${orgDoId}&org_po_id=${orgPoId}`, {
+            // The browser revalidates with the ETag and reuses its copy
+            // when the server answers 304 Not Modified.
+            const response = await fetch(`/fetch_users/?${params}`, {
                 method: 'GET',
                 headers: {
-                    'X-CSRFToken': csrftoken,
-                    'Content-Type': 'application/json'
+                    'X-CSRFToken': csrftoken
                 }
             })
             const users = await response.json();
-            console.log(users, orgDoId, orgPoId);
             const allSelects = document.querySelectorAll('[id^="id_roles-"][id$="-user"]');
 
             for (const select of allSelects) {
@@ -53,9 +55,16 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    // Changing both organizations in a row sends a single request.
+    let pendingUpdate = null;
+    function scheduleUpdate() {
+        clearTimeout(pendingUpdate);
+        pendingUpdate = setTimeout(fetchAndUpdateUsers, 150);
+    }
+
     if (orgDoSelect && orgPoSelect) {
-        orgDoSelect.addEventListener('change', fetchAndUpdateUsers);
-        orgPoSelect.addEventListener('change', fetchAndUpdateUsers);
+        orgDoSelect.addEventListener('change', scheduleUpdate);
+        orgPoSelect.addEventListener('change', scheduleUpdate);
         fetchAndUpdateUsers();
     }
 });
@@ -0,0 +1,27 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const POLL_INTERVAL = 2000;
+
+    async function poll(element) {
+        try {
+            const response = await fetch(element.dataset.statusUrl, {
+                method: 'GET',
+                headers: {'Accept': 'application/json'}
+            });
+            if (!response.ok) throw new Error('Network response was not ok.');
+            const job = await response.json();
+            element.textContent = `${job.progress}% (${job.processed_rows} / ${job.total_rows})`;
+            if (job.status === 'DN' || job.status === 'FL') {
+                window.location.reload();
+                return;
+            }
+        } catch (error) {
+            console.error('Error fetching export status:', error);
+        }
+        setTimeout(() => poll(element), POLL_INTERVAL);
+    }
+
+    document.querySelectorAll('.export-job-progress').forEach(function (element) {
+        if (element.dataset.status !== 'PN' && element.dataset.status !== 'RN') return;
+        setTimeout(() => poll(element), POLL_INTERVAL);
+    });
+});
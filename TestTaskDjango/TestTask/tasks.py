@@ -1,22 +1,247 @@
 import csv
-from celery import shared_task
-from django.http import HttpResponse
-from django.core.files.base import ContentFile
+import io
+import tempfile
+
+from celery import chord, shared_task
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import SEARCH_VAR
+from django.core.files import File
 from django.core.files.storage import default_storage
-from .models import Contract
+from django.db.models import F, Prefetch
+from django.utils import timezone
+
+from .models import Contract, ContractRole, ExportJob
+
+# Changelist lookups an export may be filtered by, besides the search
+# term stored under SEARCH_VAR.
+EXPORT_FILTERS = {
+    'status__exact', 'start_date__gte', 'start_date__lt',
+    'end_date__gte', 'end_date__lt', 'title__icontains'
+}
+
+EXPORT_HEADER = ('ID', 'Title', 'Status', 'Start date', 'End date',
+                 'Organization DO', 'Organization PO', 'Participants')
+
+
+def build_export_queryset(queryset_ids=None, filters=None):
+    """
+    Builds the contract queryset to export from an explicit id list or a
+    filter spec of changelist lookups. The search term of the spec is
+    matched by ContractAdmin.get_search_results, as on the changelist.
+
+    Raises:
+    - ValueError: If the spec holds a lookup outside EXPORT_FILTERS.
+    """
+    queryset = Contract.objects.all()
+    if queryset_ids is not None:
+        queryset = queryset.filter(id__in=queryset_ids)
+    if filters:
+        lookups = dict(filters)
+        search_term = lookups.pop(SEARCH_VAR, '')
+        unknown = set(lookups) - EXPORT_FILTERS
+        if unknown:
+            raise ValueError(
+                f"Unsupported export filters: {', '.join(sorted(unknown))}")
+        queryset = queryset.filter(**lookups)
+        if search_term:
+            # Imported here, as the admin imports this module.
+            from .admin import ContractAdmin
+            queryset, may_have_duplicates = ContractAdmin(
+                Contract, admin.site).get_search_results(
+                    None, queryset, search_term)
+            if may_have_duplicates:
+                queryset = queryset.distinct()
+    return queryset
+
+
+def iter_row_chunks(queryset, chunk_size):
+    """
+    Yields lists of CSV rows for the contracts of the queryset in primary
+    key order, fetching one keyset chunk at a time so only chunk_size
+    contracts and their participants are held in memory.
+    """
+    queryset = queryset.select_related(
+        'organization_do', 'organization_po').prefetch_related(
+        Prefetch('roles', queryset=ContractRole.objects.select_related(
+            'user').order_by('pk')))
+    last_pk = 0
+    while True:
+        contracts = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not contracts:
+            return
+        yield [
+            (
+                contract.pk, contract.title, contract.get_status_display(),
+                contract.start_date, contract.end_date,
+                contract.organization_do.name, contract.organization_po.name,
+                '; '.join(f'{role.user.username} ({role.role})'
+                          for role in contract.roles.all())
+            )
+            for contract in contracts
+        ]
+        last_pk = contracts[-1].pk
+
+
+def get_shard_bounds(queryset, shard_size):
+    """
+    Splits the queryset into half-open primary key ranges (lower, upper]
+    of at most shard_size contracts each. The last range has no upper
+    bound.
+    """
+    bounds = []
+    lower = 0
+    while True:
+        upper = list(queryset.filter(pk__gt=lower).order_by('pk')
+                     .values_list('pk', flat=True)[shard_size - 1:shard_size])
+        if not upper:
+            bounds.append((lower, None))
+            return bounds
+        bounds.append((lower, upper[0]))
+        lower = upper[0]
+
+
+def get_parts_directory(job_id):
+    """
+    Returns the storage directory of the part files of an export job.
+    """
+    return f'exports/parts/{job_id}'
+
+
+def delete_export_parts(job_id):
+    """
+    Deletes the part files the shards of the export job have written.
+    """
+    directory = get_parts_directory(job_id)
+    try:
+        _, file_names = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file_name in file_names:
+        default_storage.delete(f'{directory}/{file_name}')
+
+
+def fail_export_job(job_id, exc):
+    """
+    Marks the export job as failed with the message of the exception and
+    deletes its part files, since the chord body that would concatenate
+    them no longer runs.
+    """
+    ExportJob.objects.filter(pk=job_id).update(
+        status='FL', error=str(exc), finished_at=timezone.now())
+    delete_export_parts(job_id)
+
+
+def write_csv(rows, file_name):
+    """
+    Writes the rows to a temporary file on disk and streams it into the
+    default storage under the given name.
+
+    Returns:
+    - str: The name the file was actually saved under.
+    """
+    with tempfile.TemporaryFile() as buffer:
+        stream = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+        csv.writer(stream).writerows(rows)
+        stream.flush()
+        stream.detach()
+        buffer.seek(0)
+        return default_storage.save(file_name, File(buffer, file_name))
+
+
+@shared_task
+def start_export_job(job_id):
+    """
+    Splits the export job into shards and runs them as a chord whose body
+    concatenates the parts into the job file.
+    """
+    job = ExportJob.objects.get(pk=job_id)
+    try:
+        queryset = build_export_queryset(job.contract_ids, job.filters)
+        bounds = get_shard_bounds(queryset, settings.EXPORT_SHARD_SIZE)
+        job.total_rows = queryset.count()
+        job.shard_count = len(bounds)
+        job.status = 'RN'
+        job.save(update_fields=['total_rows', 'shard_count', 'status'])
+    except Exception as exc:
+        fail_export_job(job_id, exc)
+        raise
+
+    chord(
+        export_contract_shard.s(job_id, index, lower, upper)
+        for index, (lower, upper) in enumerate(bounds)
+    )(finish_export_job.s(job_id))
+
+
+@shared_task
+def export_contract_shard(job_id, index, lower, upper):
+    """
+    Writes the contracts of one primary key range of the export job to a
+    part file and records the exported rows on the job. A part finished
+    after another shard failed the job is deleted again, as
+    fail_export_job may have cleaned up before it was written.
+
+    Returns:
+    - str: The storage name of the part file.
+    """
+    job = ExportJob.objects.get(pk=job_id)
+    try:
+        queryset = build_export_queryset(
+            job.contract_ids, job.filters).filter(pk__gt=lower)
+        if upper is not None:
+            queryset = queryset.filter(pk__lte=upper)
+
+        def rows():
+            for chunk in iter_row_chunks(queryset,
+                                         settings.EXPORT_CHUNK_SIZE):
+                yield from chunk
+                ExportJob.objects.filter(pk=job_id).update(
+                    processed_rows=F('processed_rows') + len(chunk))
+
+        part_name = write_csv(
+            rows(), f'{get_parts_directory(job_id)}/{index:05d}.csv')
+    except Exception as exc:
+        fail_export_job(job_id, exc)
+        raise
+
+    if ExportJob.objects.filter(pk=job_id, status='FL').exists():
+        default_storage.delete(part_name)
+    return part_name
 
 
 @shared_task
-def export_to_csv_task(queryset_ids):
-    queryset = Contract.objects.filter(id__in=queryset_ids)
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="contracts.csv"'
-    writer = csv.writer(response)
-    for obj in queryset:
-        writer.writerow([obj.title, obj.status])
-    csv_content = response.content.decode('utf-8')
-
-    file_name = 'exports/contracts.csv'
-    default_storage.save(file_name, ContentFile(csv_content))
-
-    return file_name
+def finish_export_job(part_names, job_id):
+    """
+    Concatenates the part files of the export job, in shard order, under
+    a header row into a file unique to the job and marks it done.
+    """
+    try:
+        with tempfile.TemporaryFile() as buffer:
+            stream = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+            csv.writer(stream).writerow(EXPORT_HEADER)
+            stream.flush()
+            stream.detach()
+            for part_name in part_names:
+                with default_storage.open(part_name) as part:
+                    for block in iter(lambda: part.read(64 * 1024), b''):
+                        buffer.write(block)
+            buffer.seek(0)
+
+            job = ExportJob.objects.get(pk=job_id)
+            file_name = 'contracts-{}-{}.csv'.format(
+                job_id, timezone.now().strftime('%Y%m%d%H%M%S'))
+            job.file.save(file_name, File(buffer), save=False)
+    except Exception as exc:
+        fail_export_job(job_id, exc)
+        raise
+    finally:
+        for part_name in part_names:
+            default_storage.delete(part_name)
+
+    job.status = 'DN'
+    job.finished_at = timezone.now()
+    job.processed_rows = job.total_rows
+    job.save(update_fields=['file', 'status', 'finished_at',
+                            'processed_rows'])
+    return job.file.name
@@ -0,0 +1,41 @@
+from django.core.cache import cache
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from TestTask.models import Contract, Contractor, Subsidiary, User
+
+
+class ContractFixtureMixin:
+    """
+    Creates a contract between the system owner subsidiary and a
+    contractor, a general director of the subsidiary and a member of the
+    contractor. No roles are assigned, the test cases staff the contract
+    themselves.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.subsidiary = Subsidiary.objects.create(
+            name='Owner Subsidiary', is_system_owner=True)
+        cls.contractor = Contractor.objects.create(name='Fixture Contractor')
+        cls.contract = Contract.objects.create(
+            title='Fixture Contract', organization_do=cls.subsidiary,
+            organization_po=cls.contractor)
+        cls.director = User.objects.create(
+            username='director', first_name='Contract', last_name='Director',
+            email='director@example.com', job_title='GD',
+            organization=cls.subsidiary)
+        cls.member = User.objects.create(
+            username='member', first_name='Contract', last_name='Member',
+            job_title='SP', organization=cls.contractor)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def authorization(self, user):
+        return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+    def authenticate_client(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization(user))
@@ -0,0 +1,168 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from TestTask.models import (
+    Contract,
+    ContractRole,
+    Contractor,
+    Subsidiary,
+    User
+)
+
+
+class ChangelistQueryCountTestCase(TestCase):
+    """
+    Renders each changelist with a few rows and with more rows, and
+    checks that both pages run the same number of queries.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', password='password', job_title='GD')
+        self.client.force_login(self.admin)
+        self.batch = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.batch += 1
+            subsidiary = Subsidiary.objects.create(
+                name=f'Changelist Subsidiary {self.batch}')
+            contractor = Contractor.objects.create(
+                name=f'Changelist Contractor {self.batch}')
+            contract = Contract.objects.create(
+                title=f'Changelist Contract {self.batch}',
+                organization_do=subsidiary, organization_po=contractor)
+            for organization in (subsidiary, contractor):
+                user = User.objects.create(
+                    username=f'{organization._meta.model_name}{self.batch}',
+                    first_name='Listed', last_name='User', job_title='SP',
+                    organization=organization)
+                ContractRole.objects.create(
+                    contract=contract, user=user, role='SP')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url_name):
+        url = reverse(url_name)
+        self.add_rows(2)
+        few = self.count_queries(url)
+        self.add_rows(8)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_user_changelist(self):
+        self.assertConstantQueries('admin:TestTask_user_changelist')
+
+    def test_user_changelist_shows_organizations(self):
+        self.add_rows(1)
+        response = self.client.get(reverse('admin:TestTask_user_changelist'))
+        self.assertContains(response, 'Subsidiary: Changelist Subsidiary 1')
+        self.assertContains(response, 'Contractor: Changelist Contractor 1')
+
+    def test_user_changelist_filtered_by_organization_type(self):
+        self.add_rows(2)
+        url = reverse('admin:TestTask_user_changelist')
+        response = self.client.get(url, {'organization_type': 'contractor'})
+        self.assertEqual(
+            [user.username for user in response.context['cl'].result_list],
+            ['contractor1', 'contractor2'])
+
+    def test_contract_changelist(self):
+        self.assertConstantQueries('admin:TestTask_contract_changelist')
+
+    def test_contract_role_changelist(self):
+        self.assertConstantQueries('admin:TestTask_contractrole_changelist')
+
+
+class ContractAdminRolesTestCase(TestCase):
+    """
+    Edits the roles of a contract through the admin inline and checks
+    that the visibility index is refreshed once for the whole change.
+    """
+
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            username='admin', password='password', job_title='GD')
+        self.client.force_login(admin)
+        self.subsidiary = Subsidiary.objects.create(name='Admin Subsidiary')
+        self.contractor = Contractor.objects.create(name='Admin Contractor')
+        self.contract = Contract.objects.create(
+            title='Admin Roles Contract', organization_do=self.subsidiary,
+            organization_po=self.contractor, status='UP',
+            start_date=date(2030, 1, 1), end_date=date(2030, 12, 31))
+        self.users = [
+            User.objects.create(
+                username=f'member{index}', first_name='Admin',
+                last_name='Member', job_title='SP',
+                organization=self.subsidiary)
+            for index in range(3)]
+        self.removed = ContractRole.objects.create(
+            contract=self.contract, user=self.users[0], role='SP')
+
+    def post(self, organization_po, roles):
+        contract = self.contract
+        data = {
+            'title': contract.title,
+            'status': contract.status,
+            'start_date': contract.start_date.isoformat(),
+            'end_date': contract.end_date.isoformat(),
+            'organization_do': self.subsidiary.pk,
+            'organization_po': organization_po.pk,
+            'roles-TOTAL_FORMS': len(roles) + 1,
+            'roles-INITIAL_FORMS': 1,
+            'roles-MIN_NUM_FORMS': 0,
+            'roles-MAX_NUM_FORMS': 1000,
+            'roles-0-id': self.removed.pk,
+            'roles-0-contract': contract.pk,
+            'roles-0-user': self.removed.user_id,
+            'roles-0-role': self.removed.role,
+            'roles-0-DELETE': 'on',
+        }
+        for index, (user, role) in enumerate(roles, 1):
+            data.update({f'roles-{index}-contract': contract.pk,
+                         f'roles-{index}-user': user.pk,
+                         f'roles-{index}-role': role})
+        url = reverse('admin:TestTask_contract_change', args=[contract.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        return [query['sql'] for query in queries
+                if query['sql'].startswith('SELECT') and
+                'FROM "TestTask_contractvisibility"' in query['sql']]
+
+    def test_role_edits_refresh_visibility_once(self):
+        refreshes = self.post(self.contractor, [
+            (self.users[1], 'SP'), (self.users[2], 'MN'),
+            (self.users[2], 'AS')])
+
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(
+            set(self.contract.visibility.values_list('user_id', flat=True)),
+            {self.users[1].pk, self.users[2].pk})
+
+    def test_organization_change_removes_foreign_roles(self):
+        contractor = Contractor.objects.create(name='Other Contractor')
+        outsider = User.objects.create(
+            username='outsider', first_name='Admin', last_name='Outsider',
+            job_title='SP', organization=self.contractor)
+        ContractRole.objects.create(
+            contract=self.contract, user=outsider, role='SP')
+
+        refreshes = self.post(contractor, [(self.users[1], 'SP')])
+
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(
+            list(self.contract.roles.values_list('user_id', flat=True)),
+            [self.users[1].pk])
+        self.assertEqual(
+            list(self.contract.visibility.values_list('user_id', flat=True)),
+            [self.users[1].pk])
@@ -0,0 +1,118 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from TestTask.models import Contract, ContractRole
+from TestTask.tests.mixins import ContractFixtureMixin
+
+
+@override_settings(CONTRACT_RESPONSE_CACHE_TIMEOUT=300,
+                   ORGANIZATION_CACHE_TIMEOUT=3600,
+                   PRINCIPAL_CACHE_TIMEOUT=300)
+class AsyncContractViewTests(ContractFixtureMixin, TestCase):
+    """
+    The async contract endpoints must answer exactly like the APIView
+    ones they mirror.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.contracts = [cls.contract] + [
+            Contract.objects.create(
+                title=f'Async Contract {index}',
+                organization_do=cls.subsidiary,
+                organization_po=cls.contractor)
+            for index in range(2)
+        ]
+        ContractRole.objects.create(
+            contract=cls.contract, user=cls.member, role='SP')
+
+    def setUp(self):
+        super().setUp()
+        self.director_auth = self.authorization(self.director)
+        self.member_auth = self.authorization(self.member)
+
+    def assertSameResponse(self, name, auth, kwargs=None, data=None):
+        expected = self.client.get(reverse(name, kwargs=kwargs), data,
+                                   HTTP_AUTHORIZATION=auth)
+        response = self.client.get(reverse(f'async-{name}', kwargs=kwargs),
+                                   data, HTTP_AUTHORIZATION=auth)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        return response
+
+    def test_list_matches_sync_view(self):
+        for auth in (self.director_auth, self.member_auth):
+            for data in (None, {'fields': 'title,participants'}):
+                with self.subTest(auth=auth, data=data):
+                    self.assertSameResponse('contract-list', auth, data=data)
+
+    def test_detail_matches_sync_view(self):
+        for pk in (self.contracts[0].pk, self.contracts[1].pk, 0):
+            for auth in (self.director_auth, self.member_auth):
+                with self.subTest(pk=pk, auth=auth):
+                    self.assertSameResponse(
+                        'contract-detail', auth, kwargs={'pk': pk})
+
+    def test_errors_match_sync_view(self):
+        response = self.assertSameResponse('contract-list', None)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        self.assertEqual(
+            self.assertSameResponse('contract-list', 'Bearer invalid')
+            .status_code, 401)
+        self.assertEqual(self.assertSameResponse(
+            'contract-list', self.member_auth, data={'fields': 'secret'}
+        ).status_code, 400)
+        self.assertEqual(self.assertSameResponse(
+            'contract-detail', self.member_auth,
+            kwargs={'pk': self.contracts[1].pk}).status_code, 403)
+
+    def test_list_follows_cursor_links(self):
+        url = reverse('async-contract-list') + '?page_size=2'
+        seen_ids = []
+        while url:
+            body = self.client.get(
+                url, HTTP_AUTHORIZATION=self.director_auth).json()
+            seen_ids += [contract['id'] for contract in body['data']]
+            url = body['next']
+        self.assertEqual(seen_ids,
+                         [contract.pk for contract in self.contracts])
+
+    async def test_async_client(self):
+        url = reverse('async-contract-detail',
+                      kwargs={'pk': self.contracts[0].pk})
+        response = await self.async_client.get(
+            url, AUTHORIZATION=self.member_auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['participants'][0][
+            'username'], 'member')
+
+        response = await self.async_client.get(
+            url, AUTHORIZATION=self.member_auth,
+            IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_responses_are_cached(self):
+        url = reverse('async-contract-list')
+        first = self.client.get(url, HTTP_AUTHORIZATION=self.director_auth)
+        with self.assertNumQueries(0):
+            second = self.client.get(
+                url, HTTP_AUTHORIZATION=self.director_auth)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    @override_settings(CONTRACT_RESPONSE_CACHE_TIMEOUT=0)
+    def test_query_count_does_not_grow_with_contracts(self):
+        url = reverse('async-contract-list')
+        self.client.get(url, HTTP_AUTHORIZATION=self.director_auth)
+        with self.assertNumQueries(2):
+            self.client.get(url, HTTP_AUTHORIZATION=self.director_auth)
+
+        for contract in self.contracts:
+            ContractRole.objects.create(
+                contract=contract, user=self.director, role='GD')
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                url, HTTP_AUTHORIZATION=self.director_auth)
+        self.assertEqual(len(response.json()['data']), 3)
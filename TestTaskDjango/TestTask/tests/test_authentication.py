@@ -0,0 +1,75 @@
+from django.test import TestCase, override_settings
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from TestTask.authentication import CachedJWTAuthentication
+from TestTask.models import User
+from TestTask.tests.mixins import ContractFixtureMixin
+
+
+@override_settings(ORGANIZATION_CACHE_TIMEOUT=3600,
+                   PRINCIPAL_CACHE_TIMEOUT=300)
+class CachedJWTAuthenticationTestCase(ContractFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.director
+        self.request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=self.authorization(self.user))
+        self.authentication = CachedJWTAuthentication()
+
+    def authenticate(self):
+        user, _ = self.authentication.authenticate(self.request)
+        return user
+
+    def test_warm_principal_authenticates_without_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.job_title, 'GD')
+            self.assertTrue(user.organization.is_system_owner)
+
+    def test_user_save_refreshes_principal(self):
+        self.authenticate()
+        self.user.job_title = 'MN'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.authenticate().job_title, 'MN')
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_principal_is_dropped_on_commit(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.job_title = 'MN'
+            self.user.save()
+            self.assertEqual(self.authenticate().job_title, 'GD')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.authenticate().job_title, 'MN')
+
+    def test_organization_save_refreshes_principal(self):
+        self.authenticate()
+        self.subsidiary.is_system_owner = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subsidiary.save()
+        self.assertFalse(self.authenticate().organization.is_system_owner)
+
+    def test_last_login_update_keeps_principal(self):
+        self.authenticate()
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    @override_settings(PRINCIPAL_CACHE_TIMEOUT=0)
+    def test_disabled_cache_loads_user_on_every_request(self):
+        self.authenticate()
+        # A queryset update sends no signal to invalidate a snapshot.
+        User.objects.filter(pk=self.user.pk).update(job_title='SP')
+        self.assertEqual(self.authenticate().job_title, 'SP')
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from TestTask.api_urls import urlpatterns
+from TestTask.benchmarks import (
+    generate_data,
+    get_endpoint_cases,
+    get_letters
+)
+from TestTask.models import (
+    Contract,
+    ContractRole,
+    ContractVisibility,
+    Organization,
+    User
+)
+
+
+class GenerateDataTestCase(TestCase):
+
+    def test_letters(self):
+        self.assertEqual([get_letters(index) for index in (0, 25, 26, 27)],
+                         ['A', 'Z', 'BA', 'BB'])
+
+    def test_creates_the_requested_data(self):
+        data = generate_data(organizations=4, users=12, contracts=10, roles=3)
+
+        self.assertEqual(Organization.objects.count(), 4)
+        self.assertEqual(User.objects.count(), 12)
+        self.assertEqual(Contract.objects.count(), 10)
+        self.assertEqual(data.director.job_title, 'GD')
+        self.assertTrue(data.director.organization.is_system_owner)
+        for contract in data.contracts:
+            members = {contract.organization_do_id,
+                       contract.organization_po_id}
+            roles = ContractRole.objects.filter(contract=contract)
+            self.assertEqual(roles.count(), 3)
+            self.assertTrue(all(role.user.object_id in members
+                                for role in roles))
+        self.assertLessEqual(
+            set(ContractRole.objects.values_list('user_id', 'contract_id')),
+            set(ContractVisibility.objects.values_list(
+                'user_id', 'contract_id')))
+
+    def test_same_seed_gives_same_data(self):
+        def snapshot(seed):
+            data = generate_data(organizations=4, users=8, contracts=5,
+                                 roles=2, seed=seed)
+            result = [
+                (contract.organization_do.name,
+                 contract.organization_po.name,
+                 sorted(ContractRole.objects.filter(
+                     contract=contract).values_list(
+                         'user__username', 'role')))
+                for contract in data.contracts]
+            Organization.objects.all().delete()
+            User.objects.all().delete()
+            return result
+
+        self.assertEqual(snapshot(1), snapshot(1))
+        self.assertNotEqual(snapshot(1), snapshot(2))
+
+
+class BenchmarkCommandTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_every_api_url_has_a_case(self):
+        data = generate_data(organizations=2, users=4, contracts=2, roles=2)
+        self.assertEqual(
+            {case.name for case in get_endpoint_cases(data)},
+            {pattern.name for pattern in urlpatterns})
+
+    def test_runs_every_benchmark_and_rolls_back(self):
+        path = os.path.join(self.directory, 'results.json')
+        stdout = StringIO()
+        call_command('benchmark_api', '--organizations', '2', '--users', '4',
+                     '--contracts', '3', '--roles', '2', '--rounds', '2',
+                     '--requests', '2', '--json', path, stdout=stdout)
+
+        with open(path, encoding='utf-8') as output:
+            results = json.load(output)['results']
+        self.assertIn('update_user_contract_roles (organization changed)',
+                      results['micro'])
+        self.assertEqual(
+            results['micro']['IsGeneralDirectorOrRelatedUser '
+                             '(general director)']['queries'], 0)
+        self.assertIn('GET contract-list', results['endpoints'])
+        self.assertIn('DELETE contract-manage-users', results['endpoints'])
+        for result in results['endpoints'].values():
+            self.assertLessEqual(result['p50'], result['p99'])
+        self.assertIn('POST token_obtain_pair', stdout.getvalue())
+        self.assertFalse(Contract.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_endpoint_filter(self):
+        stdout = StringIO()
+        call_command('benchmark_api', '--organizations', '2', '--users', '2',
+                     '--contracts', '2', '--suite', 'endpoints',
+                     '--requests', '2', '--endpoint', 'contract-detail',
+                     stdout=stdout)
+        self.assertIn('GET contract-detail', stdout.getvalue())
+        self.assertNotIn('contract-list', stdout.getvalue())
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from TestTask import database
+from TestTask.caching import CONTRACTS_VERSION_KEY
+from TestTask.database import (
+    ReplicaRouter,
+    read_from_default,
+    read_from_replica
+)
+from TestTask.models import Contract, Contractor, Subsidiary, User
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_replicas_only_when_requested(self):
+        self.assertIsNone(self.router.db_for_read(Contract))
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Contract), 'replica1')
+            self.assertEqual(self.router.db_for_write(Contract), 'default')
+        self.assertIsNone(self.router.db_for_read(Contract))
+
+    def test_default_reads_inside_replica_reads(self):
+        with read_from_replica(), read_from_default():
+            self.assertIsNone(self.router.db_for_read(Contract))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_reads_use_default(self):
+        with read_from_replica():
+            self.assertIsNone(self.router.db_for_read(Contract))
+
+    def test_migrations_run_on_default_only(self):
+        self.assertTrue(self.router.allow_migrate('default', 'TestTask'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'TestTask'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaReadViewTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = Subsidiary.objects.create(
+            name='Replica Subsidiary', is_system_owner=True)
+        director = User.objects.create(
+            username='director', first_name='Replica', last_name='Director',
+            job_title='GD', organization=self.owner)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=(
+            f'Bearer {RefreshToken.for_user(director).access_token}'))
+
+        # The replica is the test database itself; reads routed to it
+        # are recorded by model.
+        self.routed = []
+
+        def db_for_read(router, model, **hints):
+            self.routed.append((model, database._use_replica.get()))
+
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read',
+                                    db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_contract_reads_are_routed_to_replicas(self):
+        Contract.objects.create(
+            title='Routed', organization_do=self.owner,
+            organization_po=Contractor.objects.create(name='Contractor'))
+        for name in ('contract-list', 'async-contract-list'):
+            with self.subTest(name=name):
+                cache.clear()
+                self.routed.clear()
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                routed = {model for model, replica in self.routed if replica}
+                self.assertIn(Contract, routed)
+                self.assertFalse(routed & {User, Subsidiary, Contractor})
+
+    @override_settings(CONTRACT_RESPONSE_CACHE_TIMEOUT=300)
+    def test_lagging_replica_responses_are_not_cached(self):
+        contractor = Contractor.objects.create(name='Contractor')
+        for name in ('contract-list', 'async-contract-list'):
+            with self.subTest(name=name):
+                # A write has moved the contract data to a new version,
+                # but the replica has not received it yet.
+                cache.set(CONTRACTS_VERSION_KEY, f'{name}-write', None)
+                stale = self.client.get(reverse(name))
+                self.assertNotIn('ETag', stale)
+                contract = Contract.objects.create(
+                    title=name, organization_do=self.owner,
+                    organization_po=contractor)
+
+                response = self.client.get(reverse(name))
+                self.assertIn(contract.pk, [
+                    row['id'] for row in response.json()['data']])
+                self.assertNotIn('ETag', response)
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class SqlitePragmaTestCase(SimpleTestCase):
+
+    def open_connection(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory, 'pragmas.sqlite3'),
+        }, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def get_pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL',
+                                       'temp_store': 'MEMORY'})
+    def test_pragmas_are_applied_to_new_connections(self):
+        wrapper = self.open_connection()
+        self.assertEqual(self.get_pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.get_pragma(wrapper, 'temp_store'), 2)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_no_pragmas_by_default(self):
+        wrapper = self.open_connection()
+        self.assertEqual(self.get_pragma(wrapper, 'journal_mode'), 'delete')
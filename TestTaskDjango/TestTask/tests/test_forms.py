@@ -0,0 +1,77 @@
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.urls import reverse
+
+from TestTask.forms import OrganizationChoiceField
+from TestTask.models import Contractor, Subsidiary, User
+
+
+class OrganizationChoiceFieldTestCase(TestCase):
+
+    def setUp(self):
+        self.subsidiary = Subsidiary.objects.create(name='Field Subsidiary')
+        self.field = OrganizationChoiceField()
+
+    def test_valid_value_is_checked_with_one_lookup(self):
+        value = f'subsidiary_{self.subsidiary.pk}'
+        with self.assertNumQueries(1):
+            self.assertEqual(self.field.clean(value), value)
+        self.assertIn((value, 'Subsidiary: Field Subsidiary'),
+                      self.field.widget.choices)
+
+    def test_invalid_values_are_rejected(self):
+        for value in ('subsidiary', 'partner_1', 'subsidiary_x',
+                      f'contractor_{self.subsidiary.pk}'):
+            with self.assertRaises(ValidationError) as error:
+                self.field.clean(value)
+            self.assertEqual(error.exception.code, 'invalid_choice')
+
+
+class OrganizationAutocompleteTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', password='password', job_title='GD')
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:TestTask_user_organization_autocomplete')
+        for index in range(25):
+            Subsidiary.objects.create(
+                name=f'Alpha Subsidiary {chr(65 + index)}')
+        self.contractor = Contractor.objects.create(name='Alpha Contractor')
+        Contractor.objects.create(name='Beta Contractor')
+
+    def test_prefix_search_over_both_types(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'term': 'alpha c'})
+        self.assertEqual(response.json(), {
+            'results': [{'id': f'contractor_{self.contractor.pk}',
+                         'text': 'Contractor: Alpha Contractor'}],
+            'pagination': {'more': False},
+        })
+
+    def test_results_are_limited_and_paginated(self):
+        first = self.client.get(self.url, {'term': 'Alpha'}).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertTrue(first['pagination']['more'])
+        self.assertEqual(first['results'][0]['text'],
+                         'Contractor: Alpha Contractor')
+
+        second = self.client.get(
+            self.url, {'term': 'Alpha', 'page': 2}).json()
+        self.assertEqual(len(second['results']), 6)
+        self.assertFalse(second['pagination']['more'])
+
+    def test_requires_admin_user(self):
+        self.client.logout()
+        response = self.client.get(self.url, {'term': 'Alpha'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_user_form_does_not_list_organizations(self):
+        user = User.objects.create(
+            username='member', first_name='Form', last_name='Member',
+            job_title='SP', organization=self.contractor)
+        response = self.client.get(
+            reverse('admin:TestTask_user_change', args=[user.pk]))
+        self.assertContains(response, 'Contractor: Alpha Contractor')
+        self.assertContains(response, 'data-ajax--url="{}"'.format(self.url))
+        self.assertNotContains(response, 'Alpha Subsidiary A')
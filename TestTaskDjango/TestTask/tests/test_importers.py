@@ -0,0 +1,171 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from TestTask.models import (
+    Contract,
+    ContractRole,
+    ContractVisibility,
+    Contractor,
+    Organization,
+    Subsidiary,
+    User
+)
+from TestTask.search import search_users
+
+
+class ImportDataCommandTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def write_jsonl(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record) + '\n' for record in records))
+
+    def run_import(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_data', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_organizations_from_csv(self):
+        Contractor.objects.create(name='Existing Contractor')
+        path = self.write('organizations.csv', (
+            'type,name,is_system_owner,licensed\n'
+            'subsidiary,Imported Subsidiary,true,\n'
+            'contractor,Imported Contractor,,1\n'
+            'contractor,Existing Contractor,,\n'
+            'partner,Unknown Type,,\n'
+            'subsidiary,Bad Name 42,,\n'
+        ))
+        stdout, stderr = self.run_import('organizations', path)
+
+        self.assertIn('Imported 2 organizations, rejected 3', stdout)
+        self.assertTrue(Subsidiary.objects.get(
+            name='Imported Subsidiary').is_system_owner)
+        self.assertTrue(Contractor.objects.get(
+            name='Imported Contractor').licensed)
+        self.assertIn('Line 4: Organization already exists.', stderr)
+        self.assertIn('Line 5: Unknown organization type.', stderr)
+        self.assertIn('Line 6:', stderr)
+
+    def test_import_organizations_in_bulk(self):
+        def import_organizations(names):
+            path = self.write('organizations.csv', 'type,name,licensed\n' +
+                              ''.join(f'{kind},{name},1\n'
+                                      for kind in ('subsidiary', 'contractor')
+                                      for name in names))
+            with CaptureQueriesContext(connection) as queries:
+                stdout, _ = self.run_import('organizations', path)
+            self.assertIn(f'Imported {len(names) * 2} organizations', stdout)
+            return len(queries)
+
+        few = import_organizations(['Bulk A'])
+        self.assertEqual(
+            import_organizations([f'Bulk {name}' for name in 'BCDEF']), few)
+        self.assertEqual(Organization.objects.count(), 12)
+        self.assertEqual(Subsidiary.objects.count(), 6)
+        self.assertEqual(Contractor.objects.count(), 6)
+        self.assertTrue(all(Contractor.objects.values_list(
+            'licensed', flat=True)))
+        self.assertFalse(any(Subsidiary.objects.values_list(
+            'is_system_owner', flat=True)))
+
+    def test_import_users_in_batches(self):
+        subsidiary = Subsidiary.objects.create(name='Import Subsidiary')
+        contract = Contract.objects.create(
+            title='Imported Users Contract', organization_do=subsidiary,
+            organization_po=Contractor.objects.create(name='Any Contractor'))
+        User.objects.create(username='taken', job_title='SP')
+        password = make_password('secret')
+        path = self.write_jsonl('users.jsonl', [
+            {'username': 'director', 'first_name': 'Imported',
+             'last_name': 'Director', 'job_title': 'GD',
+             'organization_type': 'subsidiary',
+             'organization': 'Import Subsidiary', 'password': password},
+            {'username': 'plain', 'first_name': 'Plain',
+             'last_name': 'User', 'job_title': 'sp'},
+            {'username': 'taken', 'first_name': 'Taken',
+             'last_name': 'User', 'job_title': 'SP'},
+            {'username': 'nameless', 'first_name': 'B4d',
+             'last_name': 'User', 'job_title': 'SP'},
+            {'username': 'lost', 'first_name': 'Lost', 'last_name': 'User',
+             'job_title': 'SP', 'organization_type': 'contractor',
+             'organization': 'Missing Contractor'},
+            {'username': 'cleartext', 'first_name': 'Clear',
+             'last_name': 'Text', 'job_title': 'SP', 'password': 'secret'},
+        ])
+        rejects = os.path.join(self.directory, 'rejects.csv')
+        stdout, stderr = self.run_import(
+            'users', path, '--batch-size', '2', '--rejects', rejects)
+
+        self.assertIn('Imported 2 users, rejected 4', stdout)
+        director = User.objects.get(username='director')
+        self.assertEqual(director.organization, subsidiary)
+        self.assertEqual(
+            list(search_users(User.objects.all(), 'import director')),
+            [director])
+        self.assertTrue(director.check_password('secret'))
+        self.assertFalse(
+            User.objects.get(username='plain').has_usable_password())
+        self.assertTrue(ContractVisibility.objects.filter(
+            user=director, contract=contract).exists())
+        with open(rejects, encoding='utf-8') as output:
+            self.assertEqual(
+                [line.split(',')[0] for line in output.read().splitlines()],
+                ['line', '3', '4', '5', '6'])
+
+    def test_import_roles(self):
+        subsidiary = Subsidiary.objects.create(name='Role Subsidiary')
+        contract = Contract.objects.create(
+            title='Imported Roles Contract', organization_do=subsidiary,
+            organization_po=Contractor.objects.create(name='Role Contractor'))
+        user = User.objects.create(
+            username='member', first_name='Role', last_name='Member',
+            job_title='SP', organization=subsidiary)
+        User.objects.create(
+            username='outsider', first_name='Role', last_name='Outsider',
+            job_title='SP',
+            organization=Subsidiary.objects.create(name='Other Subsidiary'))
+        ContractRole.objects.create(contract=contract, user=user, role='MN')
+        path = self.write('roles.csv', (
+            'contract,username,role\n'
+            f'{contract.pk},member,SP\n'
+            f'{contract.pk},member,SP\n'
+            f'{contract.pk},ghost,SP\n'
+            f'{contract.pk},member,XX\n'
+            f'{contract.pk},outsider,SP\n'
+            f'{contract.pk},member,MN\n'
+        ))
+        stdout, stderr = self.run_import('roles', path)
+
+        self.assertIn('Imported 1 roles, rejected 5', stdout)
+        self.assertIn('Line 3: Role already assigned.', stderr)
+        self.assertIn('Line 6: User is not a member of the contract '
+                      'organizations.', stderr)
+        self.assertIn('Line 7: Role already assigned.', stderr)
+        self.assertEqual(
+            set(ContractRole.objects.values_list('user_id', 'role')),
+            {(user.pk, 'SP'), (user.pk, 'MN')})
+        self.assertTrue(ContractVisibility.objects.filter(
+            user=user, contract=contract).exists())
+
+    def test_import_requires_known_format(self):
+        path = self.write('users.txt', '')
+        with self.assertRaises(CommandError):
+            self.run_import('users', path)
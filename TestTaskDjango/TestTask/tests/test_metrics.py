@@ -0,0 +1,95 @@
+import re
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from TestTask.metrics import registry
+from TestTask.models import ContractRole, User
+from TestTask.tests.mixins import ContractFixtureMixin
+
+SERVER_TIMING = re.compile(
+    r'^db;dur=[\d.]+;desc="(\d+) queries", serializer;dur=[\d.]+, '
+    r'total;dur=[\d.]+$')
+
+
+@override_settings(CONTRACT_RESPONSE_CACHE_TIMEOUT=0,
+                   ORGANIZATION_CACHE_TIMEOUT=3600,
+                   PRINCIPAL_CACHE_TIMEOUT=300, SERVER_TIMING=True)
+class RequestMetricsTestCase(ContractFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ContractRole.objects.create(
+            contract=cls.contract, user=cls.member, role='SP')
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.auth = self.authorization(self.member)
+
+    def get(self, name, **kwargs):
+        return self.client.get(reverse(name, kwargs=kwargs or None),
+                               HTTP_AUTHORIZATION=self.auth)
+
+    def test_server_timing_counts_queries(self):
+        for name, kwargs in (('contract-list', {}),
+                             ('async-contract-detail',
+                              {'pk': self.contract.pk})):
+            with self.subTest(name=name):
+                self.get(name, **kwargs)
+                with self.assertNumQueries(2):
+                    response = self.get(name, **kwargs)
+                match = SERVER_TIMING.match(response['Server-Timing'])
+                self.assertIsNotNone(match, response['Server-Timing'])
+                self.assertEqual(match.group(1), '2')
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.get('contract-list'))
+
+    def test_prometheus_endpoint(self):
+        self.get('contract-list')
+        size = len(self.get('contract-list').content)
+        admin = User.objects.create_superuser(
+            username='admin', password='password', job_title='GD')
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        labels = '{view="contract-list",method="GET"}'
+        self.assertIn('http_requests_total{view="contract-list",'
+                      'method="GET",status="200"} 2', body)
+        self.assertIn(f'http_request_duration_seconds_count{labels} 2', body)
+        self.assertIn(f'http_response_size_bytes_total{labels} {size * 2}',
+                      body)
+        self.assertRegex(
+            body, re.escape(f'http_request_db_queries_total{labels} ') +
+            r'(\d+)')
+        self.assertRegex(
+            body, re.escape(f'http_request_serializer_seconds_total{labels} ')
+            + r'0\.\d+')
+
+    def test_prometheus_endpoint_access(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'contract-list': 1})
+    def test_query_budget_warning(self):
+        with self.assertLogs('TestTask.metrics', 'WARNING') as logs:
+            self.get('contract-list')
+        self.assertIn('over its budget of 1', logs.output[0])
+        self.assertIn(
+            'http_request_query_budget_exceeded_total'
+            '{view="contract-list",method="GET"} 1', registry.render())
+
+        with self.assertNoLogs('TestTask.metrics', 'WARNING'):
+            self.get('contract-detail', pk=self.contract.pk)
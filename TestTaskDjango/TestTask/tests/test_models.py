@@ -2,6 +2,7 @@ from datetime import timedelta
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 from django.utils import timezone
 from django.test import TestCase
 
@@ -57,7 +58,7 @@ class ModelsTestCase(TestCase):
             role='GD'
         )
         with self.assertRaises(ValidationError):
-            duplicate_role.clean()
+            duplicate_role.full_clean()
 
         contract_role.role = 'XX'
         with self.assertRaises(ValidationError):
@@ -76,3 +77,16 @@ class ModelsTestCase(TestCase):
             contract_role.save()
         except ValidationError:
             self.fail("save() raised ValidationError unexpectedly!")
+
+    def test_contract_role_save_rejects_duplicate(self):
+        contract = Contract.objects.get(pk=1)
+        user = User.objects.get(pk=1)
+        ContractRole.objects.create(contract=contract, user=user, role='MN')
+
+        with self.assertRaises(IntegrityError):
+            ContractRole.objects.create(
+                contract=contract, user=user, role='MN')
+        self.assertEqual(ContractRole.objects.filter(
+            contract=contract, user=user, role='MN').count(), 1)
+
+        ContractRole.objects.create(contract=contract, user=user, role='SP')
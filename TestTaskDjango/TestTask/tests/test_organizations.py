@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from TestTask.models import Contractor, Subsidiary, User
+from TestTask.organizations import (
+    get_user_organization,
+    resolve_organizations
+)
+
+
+@override_settings(ORGANIZATION_CACHE_TIMEOUT=3600,
+                   PRINCIPAL_CACHE_TIMEOUT=300)
+class OrganizationResolverTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        subsidiaries = [Subsidiary.objects.create(name=f'Subsidiary {name}')
+                        for name in 'ABC']
+        contractors = [Contractor.objects.create(name=f'Contractor {name}')
+                       for name in 'ABC']
+        for index, organization in enumerate(subsidiaries + contractors):
+            User.objects.create(
+                username=f'user{index}', first_name='Org', last_name='User',
+                job_title='SP', organization=organization)
+        User.objects.create(username='orphan', first_name='No',
+                            last_name='Organization', job_title='SP')
+        self.subsidiary = subsidiaries[0]
+
+    def fresh_users(self):
+        return list(User.objects.order_by('username'))
+
+    def test_resolving_many_users_costs_two_queries_then_none(self):
+        users = self.fresh_users()
+        with self.assertNumQueries(2):
+            organizations = resolve_organizations(users)
+        self.assertEqual(
+            [getattr(org, 'name', None) for org in organizations],
+            [None] + [f'{kind} {name}' for kind in ('Subsidiary', 'Contractor')
+                      for name in 'ABC'])
+        with self.assertNumQueries(0):
+            for user in users:
+                user.organization
+
+        users = self.fresh_users()
+        with self.assertNumQueries(0):
+            resolve_organizations(users)
+
+    def test_saving_organization_invalidates_cache(self):
+        user = User.objects.get(username='user0')
+        self.assertEqual(get_user_organization(user).name, 'Subsidiary A')
+
+        self.subsidiary.name = 'Subsidiary Renamed'
+        self.subsidiary.is_system_owner = True
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.subsidiary.save()
+        self.assertEqual(get_user_organization(
+            User.objects.get(username='user0')).name, 'Subsidiary A')
+        for callback in callbacks:
+            callback()
+
+        organization = get_user_organization(
+            User.objects.get(username='user0'))
+        self.assertEqual(organization.name, 'Subsidiary Renamed')
+        self.assertTrue(organization.is_system_owner)
+
+    @override_settings(PRINCIPAL_CACHE_TIMEOUT=0)
+    def test_subsidiaries_are_not_cached_longer_than_principals(self):
+        resolve_organizations(self.fresh_users())
+        # A queryset update sends no signal to invalidate the cache.
+        Subsidiary.objects.update(is_system_owner=True)
+        users = self.fresh_users()
+        with self.assertNumQueries(1):
+            organizations = resolve_organizations(users)
+        self.assertTrue(organizations[1].is_system_owner)
+
+    @override_settings(ORGANIZATION_CACHE_TIMEOUT=0,
+                       PRINCIPAL_CACHE_TIMEOUT=0)
+    def test_disabled_cache_loads_organizations_every_time(self):
+        resolve_organizations(self.fresh_users())
+        users = self.fresh_users()
+        with self.assertNumQueries(2):
+            resolve_organizations(users)
+
+    def test_changed_user_organization_is_resolved_again(self):
+        user = User.objects.get(username='user0')
+        get_user_organization(user)
+        contractor = Contractor.objects.get(name='Contractor B')
+        user.organization = contractor
+        self.assertEqual(get_user_organization(user), contractor)
@@ -0,0 +1,123 @@
+import re
+import unittest
+from datetime import date
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+
+from TestTask.models import (
+    Contract,
+    ContractRole,
+    ContractVisibility,
+    Contractor,
+    Subsidiary,
+    User
+)
+from TestTask.search import USER_SEARCH_FIELDS, prefix_search, search_users
+
+# A plan step reading a whole table: "SCAN <table>" without an index,
+# or a virtual table scan without a full-text MATCH constraint.
+FULL_SCAN = re.compile(
+    r'\bSCAN (?!CONSTANT ROW)(\S+)'
+    r'(?! USING| VIRTUAL TABLE INDEX \d+:M)( |$)')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite',
+                     'Query plans are pinned for SQLite')
+class QueryPlanTestCase(TestCase):
+    """
+    Captures the query plan of each hot query and fails when one of them
+    falls back to a full table scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subsidiary = Subsidiary.objects.create(name='Plan Subsidiary')
+        cls.contractor = Contractor.objects.create(name='Plan Contractor')
+        cls.contract = Contract.objects.create(
+            title='Query Plan Contract', organization_do=cls.subsidiary,
+            organization_po=cls.contractor)
+        cls.user = User.objects.create(
+            username='planner', first_name='Query', last_name='Planner',
+            job_title='GD', organization=cls.subsidiary)
+        cls.content_types = ContentType.objects.get_for_models(
+            Subsidiary, Contractor)
+
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        scans = [line for line in plan.splitlines()
+                 if FULL_SCAN.search(line.split(' ', 3)[-1])]
+        self.assertEqual(scans, [], f'Full table scan in plan:\n{plan}')
+        return plan
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = self.assertNoFullScan(queryset)
+        self.assertIn(f'INDEX {index_name}', plan)
+
+    def test_users_of_organization_pair(self):
+        self.assertUsesIndex(User.objects.filter(
+            content_type=self.content_types[Subsidiary],
+            object_id=self.subsidiary.pk), 'user_organization_idx')
+
+    def test_users_of_contract_organizations(self):
+        self.assertNoFullScan(User.objects.filter(
+            Q(content_type=self.content_types[Subsidiary],
+              object_id=self.contract.organization_do_id) |
+            Q(content_type=self.content_types[Contractor],
+              object_id=self.contract.organization_po_id)))
+
+    def test_users_of_organization_ids(self):
+        self.assertNoFullScan(User.objects.filter(
+            content_type__in=self.content_types.values(),
+            object_id__in=[self.subsidiary.pk, self.contractor.pk]))
+
+    def test_user_prefix_search(self):
+        self.assertNoFullScan(prefix_search(
+            User.objects.all(), USER_SEARCH_FIELDS, 'plan'))
+
+    def test_user_admin_search(self):
+        plan = self.assertNoFullScan(search_users(
+            User.objects.all(), 'plan subsidiary'))
+        self.assertIn('TestTask_user_search VIRTUAL TABLE', plan)
+
+    def test_contract_role_lookup(self):
+        plan = self.assertNoFullScan(ContractRole.objects.filter(
+            contract=self.contract, user=self.user, role='GD'))
+        # Served by the index backing unique_contract_role.
+        self.assertIn('(contract_id=? AND user_id=? AND role=?)', plan)
+
+    def test_contract_director_check(self):
+        self.assertNoFullScan(ContractRole.objects.filter(
+            contract=self.contract, user=self.user, role='GD').values('pk'))
+
+    def test_contract_admin_filters(self):
+        self.assertUsesIndex(Contract.objects.filter(status='PD'),
+                             'contract_status_dates_idx')
+        self.assertUsesIndex(Contract.objects.filter(
+            status='PD', start_date__gte=date(2030, 1, 1),
+            start_date__lt=date(2031, 1, 1)), 'contract_status_dates_idx')
+
+    def test_contract_admin_date_filters(self):
+        # The changelist date filters, without a status and in the
+        # changelist's -pk order.
+        for field, index_name in (('start_date', 'contract_dates_idx'),
+                                  ('end_date', 'contract_end_date_idx')):
+            with self.subTest(field=field):
+                self.assertUsesIndex(Contract.objects.filter(**{
+                    f'{field}__gte': date(2030, 1, 1),
+                    f'{field}__lt': date(2031, 1, 1),
+                }).order_by('-pk'), index_name)
+
+    def test_visible_contracts(self):
+        self.assertNoFullScan(Contract.objects.filter(
+            visibility__user=self.user).order_by('pk'))
+
+    def test_contract_visibility_check(self):
+        self.assertNoFullScan(ContractVisibility.objects.filter(
+            contract=self.contract, user=self.user))
+
+    def test_contract_keyset_chunk(self):
+        self.assertNoFullScan(
+            Contract.objects.filter(pk__gt=0).order_by('pk')[:100])
@@ -0,0 +1,93 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from TestTask.models import Contractor, Subsidiary, User
+from TestTask.search import search_users
+from TestTask.signals import restore_user_search_index
+
+
+class SearchUsersTestCase(TestCase):
+
+    def setUp(self):
+        self.subsidiary = Subsidiary.objects.create(name='Northern Subsidiary')
+        self.contractor = Contractor.objects.create(name='Southern Contractor')
+        self.anna = User.objects.create(
+            username='anna', first_name='Anna', last_name='Karenina',
+            email='anna@example.com', job_title='MN',
+            organization=self.subsidiary)
+        self.boris = User.objects.create(
+            username='boris', first_name='Boris', last_name='Godunov',
+            job_title='SP', organization=self.contractor)
+
+    def search(self, term):
+        return list(search_users(User.objects.order_by('username'), term)
+                    .values_list('username', flat=True))
+
+    def test_matches_substrings_of_every_field(self):
+        self.assertEqual(self.search('KAREN'), ['anna'])
+        self.assertEqual(self.search('example.com'), ['anna'])
+        self.assertEqual(self.search('odun'), ['boris'])
+        self.assertEqual(self.search('sp'), ['boris'])
+        self.assertEqual(self.search('ern'), ['anna', 'boris'])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search('anna northern'), ['anna'])
+        self.assertEqual(self.search('anna southern'), [])
+        self.assertEqual(self.search('bo go'), ['boris'])
+
+    def test_matches_organization_name(self):
+        self.assertEqual(self.search('southern'), ['boris'])
+
+    def test_follows_user_changes(self):
+        self.anna.last_name = 'Arkadyevna'
+        self.anna.save(update_fields=['last_name'])
+        self.assertEqual(self.search('karenina'), [])
+        self.assertEqual(self.search('arkadyevna'), ['anna'])
+
+        self.boris.organization = self.subsidiary
+        self.boris.save()
+        self.assertEqual(self.search('southern'), [])
+        self.assertEqual(self.search('northern'), ['anna', 'boris'])
+
+        self.boris.delete()
+        self.assertEqual(self.search('boris'), [])
+
+    def test_follows_organization_renames(self):
+        self.contractor.name = 'Eastern Contractor'
+        self.contractor.save()
+        self.assertEqual(self.search('southern'), [])
+        self.assertEqual(self.search('eastern'), ['boris'])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite',
+                         'The search triggers exist on SQLite only')
+    def test_restores_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER "TestTask_user_search_insert"')
+        User.objects.create(username='unindexed', first_name='Late',
+                            last_name='Arrival', job_title='AS')
+        self.assertEqual(self.search('arrival'), [])
+
+        restore_user_search_index(sender=None)
+        self.assertEqual(self.search('arrival'), ['unindexed'])
+
+
+class UserAdminSearchTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', password='password', job_title='GD')
+        self.client.force_login(self.admin)
+        contractor = Contractor.objects.create(name='Searchable Contractor')
+        User.objects.create(
+            username='member', first_name='Found', last_name='Member',
+            job_title='SP', organization=contractor)
+
+    def test_changelist_searches_organization_names(self):
+        response = self.client.get(
+            reverse('admin:TestTask_user_changelist'), {'q': 'searchable'})
+        self.assertEqual(
+            [user.username for user in response.context['cl'].result_list],
+            ['member'])
@@ -1,13 +1,21 @@
+import json
+
+from django.core.cache import cache
 from django.test import TestCase
 
+from rest_framework.renderers import JSONRenderer
+
 from TestTask.models import (
     Contract,
     ContractRole,
+    Contractor,
+    Subsidiary,
     User
 )
 from TestTask.serializers import (
     ContractSerializer,
     ContractRoleSerializer,
+    ContractValuesSerializer,
     UserSerializer,
     UserContractRoleSerializer
 )
@@ -60,3 +68,62 @@ class SerializerTestCase(TestCase):
         data = serializer.data
 
         self.assertEqual(data['full_name'], self.user.get_full_name())
+
+
+class ContractValuesSerializerTestCase(TestCase):
+    """
+    The values() fast path must render exactly what ContractSerializer
+    renders.
+    """
+    fixtures = ['users.json', 'organizations.json',
+                'contracts.json', 'contract_roles.json']
+
+    def setUp(self):
+        cache.clear()
+        subsidiary = Subsidiary.objects.create(
+            name='Parity Subsidiary', is_system_owner=True)
+        contractor = Contractor.objects.create(
+            name='Parity Contractor', licensed=True)
+        for index in range(3):
+            contract = Contract.objects.create(
+                title=f'Parity Contract {index}', organization_do=subsidiary,
+                organization_po=contractor, status='PD')
+            for role, organization in (('GD', subsidiary),
+                                       ('SP', contractor), ('AS', None)):
+                user = User.objects.create(
+                    username=f'parity{index}{role}', first_name='Parity',
+                    last_name='' if organization is None else 'User',
+                    job_title=role, organization=organization)
+                ContractRole.objects.create(
+                    contract=contract, user=user, role=role)
+        Contract.objects.create(
+            title='Parity Empty Contract', organization_do=subsidiary,
+            organization_po=contractor)
+
+    def render(self, data):
+        return json.loads(JSONRenderer().render(data))
+
+    def assertParity(self, fields=None):
+        contracts = Contract.objects.order_by('pk')
+        expected = ContractSerializer(
+            ContractSerializer.setup_eager_loading(contracts, fields),
+            many=True, fields=fields).data
+        serializer = ContractValuesSerializer(fields)
+        actual = serializer.serialize(contracts.values(*serializer.values))
+        self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_full_representation(self):
+        self.assertParity()
+
+    def test_selected_fields(self):
+        for fields in (['title', 'status'], ['organization_po'],
+                       ['participants', 'end_date']):
+            with self.subTest(fields=fields):
+                self.assertParity(fields)
+
+    def test_query_count_is_constant(self):
+        contracts = Contract.objects.order_by('pk')
+        serializer = ContractValuesSerializer()
+        # Contracts, participants, then one query per organization type.
+        with self.assertNumQueries(4):
+            serializer.serialize(contracts.values(*serializer.values))
@@ -0,0 +1,110 @@
+from django.db import connection
+from django.utils import timezone
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from TestTask.models import (
+    Contract,
+    ContractRole,
+    ContractVisibility,
+    Contractor,
+    Subsidiary,
+    User
+)
+
+
+class UpdateUserContractRolesTestCase(TestCase):
+
+    def setUp(self):
+        self.subsidiary = Subsidiary.objects.create(name='Signal Subsidiary')
+        self.contractor = Contractor.objects.create(name='Signal Contractor')
+        self.other_contractor = Contractor.objects.create(
+            name='Other Contractor')
+        self.shared = Contract.objects.create(
+            title='Shared Signal Contract', organization_do=self.subsidiary,
+            organization_po=self.contractor)
+        self.foreign = Contract.objects.create(
+            title='Foreign Signal Contract', organization_do=self.subsidiary,
+            organization_po=self.other_contractor)
+        user = User.objects.create(
+            username='mover', first_name='Moving', last_name='User',
+            job_title='MN', organization=self.subsidiary)
+        for contract in (self.shared, self.foreign):
+            ContractRole.objects.create(
+                contract=contract, user=user, role='MN')
+        self.user = User.objects.get(pk=user.pk)
+
+    def test_last_login_update_runs_only_the_update(self):
+        self.user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
+
+    def test_unchanged_organization_does_not_read_the_user(self):
+        self.user.first_name = 'Renamed'
+        with self.assertNumQueries(1):
+            self.user.save()
+
+    def test_organization_change_removes_foreign_roles(self):
+        self.user.organization = self.contractor
+        self.user.save()
+
+        self.assertEqual(
+            list(ContractRole.objects.filter(user=self.user)
+                 .values_list('contract_id', flat=True)),
+            [self.shared.pk])
+        self.assertEqual(
+            list(ContractVisibility.objects.filter(user=self.user)
+                 .values_list('contract_id', flat=True)),
+            [self.shared.pk])
+
+    def test_organization_change_matches_organization_type(self):
+        # A subsidiary user keeps roles only where the subsidiary is the
+        # contract's organization_do. Subsidiaries and contractors share
+        # the Organization primary keys, so the type picks the column.
+        other_subsidiary = Subsidiary.objects.create(name='Other Subsidiary')
+        contract = Contract.objects.create(
+            title='Other Subsidiary Contract',
+            organization_do=other_subsidiary,
+            organization_po=self.contractor)
+        ContractRole.objects.create(
+            contract=contract, user=self.user, role='SP')
+
+        self.user.organization = other_subsidiary
+        self.user.save()
+        self.assertEqual(
+            list(ContractRole.objects.filter(user=self.user)
+                 .values_list('contract_id', flat=True)),
+            [contract.pk])
+
+    def test_removed_roles_refresh_visibility_once(self):
+        def move(user, organization):
+            user.organization = organization
+            with CaptureQueriesContext(connection) as queries:
+                user.save()
+            return len(queries)
+
+        few = move(self.user, self.contractor)
+        user = User.objects.create(
+            username='mover2', first_name='Moving', last_name='User',
+            job_title='MN', organization=self.subsidiary)
+        for index in range(4):
+            contract = Contract.objects.create(
+                title=f'Foreign Signal Contract {index}',
+                organization_do=self.subsidiary,
+                organization_po=self.other_contractor)
+            ContractRole.objects.create(
+                contract=contract, user=user, role='MN')
+        user = User.objects.get(pk=user.pk)
+        self.assertEqual(move(user, self.contractor), few)
+        self.assertFalse(ContractVisibility.objects.filter(user=user).exists())
+
+    def test_second_save_after_change_is_clean(self):
+        self.user.organization = self.contractor
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.user.save()
+
+    def test_removing_organization_removes_all_roles(self):
+        self.user.organization = None
+        self.user.save()
+        self.assertFalse(ContractRole.objects.filter(user=self.user).exists())
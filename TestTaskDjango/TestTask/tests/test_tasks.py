@@ -0,0 +1,202 @@
+import csv
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import default_storage
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from TestTaskDjango.celery import app as celery_app
+from TestTask import tasks
+from TestTask.models import (
+    Contract,
+    ContractRole,
+    Contractor,
+    ExportJob,
+    Subsidiary,
+    User
+)
+from TestTask.tasks import start_export_job
+from TestTask.utils import get_export_filters
+
+
+class ExportFixtureMixin:
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, EXPORT_SHARD_SIZE=2,
+            EXPORT_CHUNK_SIZE=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+
+        subsidiary = Subsidiary.objects.create(name='Export Subsidiary')
+        contractor = Contractor.objects.create(name='Export Contractor')
+        self.contracts = [
+            Contract.objects.create(
+                title=f'Exported Contract {index}',
+                status='PD' if index % 2 else 'UP',
+                start_date='2030-01-01', end_date='2030-12-31',
+                organization_do=subsidiary, organization_po=contractor)
+            for index in range(5)
+        ]
+        self.manager = User.objects.create_user(
+            username='export_manager', password='password', job_title='MN',
+            content_type=ContentType.objects.get_for_model(Subsidiary),
+            object_id=subsidiary.pk)
+        ContractRole.objects.create(
+            contract=self.contracts[1], user=self.manager, role='MN')
+
+    def read_export(self, job):
+        with job.file.open('rb') as export:
+            return list(csv.reader(
+                export.read().decode('utf-8').splitlines()))
+
+
+class ExportJobTestCase(ExportFixtureMixin, TestCase):
+
+    def test_export_job_concatenates_shards(self):
+        job = ExportJob.objects.create()
+        start_export_job(job.pk)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'DN')
+        self.assertEqual(job.shard_count, 3)
+        self.assertEqual(job.total_rows, 5)
+        self.assertEqual(job.processed_rows, 5)
+        self.assertEqual(job.progress, 100)
+        self.assertIsNotNone(job.finished_at)
+        rows = self.read_export(job)
+        self.assertEqual(rows[0][:3], ['ID', 'Title', 'Status'])
+        self.assertEqual([row[1] for row in rows[1:]],
+                         [contract.title for contract in self.contracts])
+        self.assertEqual(rows[2], [
+            str(self.contracts[1].pk), 'Exported Contract 1', 'Paid',
+            '2030-01-01', '2030-12-31', 'Export Subsidiary',
+            'Export Contractor', 'export_manager (MN)'])
+        self.assertEqual(
+            default_storage.listdir(f'exports/parts/{job.pk}'), ([], []))
+
+    def test_export_jobs_get_unique_files(self):
+        first = ExportJob.objects.create(
+            contract_ids=[self.contracts[0].pk])
+        second = ExportJob.objects.create(filters={'status__exact': 'PD'})
+        start_export_job(first.pk)
+        start_export_job(second.pk)
+        first.refresh_from_db()
+        second.refresh_from_db()
+
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertEqual([row[1] for row in self.read_export(first)[1:]],
+                         ['Exported Contract 0'])
+        self.assertEqual([row[1] for row in self.read_export(second)[1:]],
+                         ['Exported Contract 1', 'Exported Contract 3'])
+
+    def test_failed_shard_deletes_the_written_parts(self):
+        job = ExportJob.objects.create()
+
+        def write_csv(rows, file_name):
+            if file_name.endswith('00001.csv'):
+                raise OSError('Storage is full.')
+            return original(rows, file_name)
+
+        original = tasks.write_csv
+        with mock.patch.object(tasks, 'write_csv', write_csv):
+            with self.assertRaises(OSError):
+                start_export_job(job.pk)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'FL')
+        self.assertEqual(job.error, 'Storage is full.')
+        self.assertEqual(
+            default_storage.listdir(f'exports/parts/{job.pk}'), ([], []))
+
+        # A shard still running when the job failed removes its own part.
+        tasks.export_contract_shard(job.pk, 2, self.contracts[3].pk, None)
+        self.assertEqual(
+            default_storage.listdir(f'exports/parts/{job.pk}'), ([], []))
+
+    def test_export_job_fails_on_unknown_filters(self):
+        job = ExportJob.objects.create(
+            filters={'organization_do__name': 'x'})
+        with self.assertRaises(ValueError):
+            start_export_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FL')
+        self.assertIn('organization_do__name', job.error)
+
+    def test_export_search_matches_the_changelist(self):
+        job = ExportJob.objects.create(filters={'q': 'Export Contract 1'})
+        start_export_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual([row[1] for row in self.read_export(job)[1:]],
+                         ['Exported Contract 1'])
+
+    def test_export_filters_from_changelist_query(self):
+        request = RequestFactory().post(
+            '/admin/TestTask/contract/?status__exact=PD&q=Export+Contract'
+            '&o=1&p=2&organization_do__id__exact=3')
+        self.assertEqual(get_export_filters(request), {
+            'status__exact': 'PD',
+            'q': 'Export Contract',
+            'organization_do__id__exact': '3',
+        })
+
+
+class ExportJobAdminTestCase(ExportFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            username='export_admin', password='password', job_title='GD')
+        self.client.force_login(self.admin)
+
+    def test_export_action_creates_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:TestTask_contract_changelist'), {
+                    'action': 'export_to_csv',
+                    '_selected_action': [self.contracts[0].pk,
+                                         self.contracts[2].pk],
+                })
+        self.assertEqual(response.status_code, 302)
+        job = ExportJob.objects.get()
+        self.assertEqual(job.created_by, self.admin)
+        self.assertEqual(sorted(job.contract_ids),
+                         [self.contracts[0].pk, self.contracts[2].pk])
+        self.assertEqual(job.status, 'DN')
+
+    def test_export_all_matching_rows_of_a_search(self):
+        url = reverse('admin:TestTask_contract_changelist')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'{url}?q=Export+Contract&status__exact=PD', {
+                    'action': 'export_to_csv',
+                    'select_across': '1',
+                    '_selected_action': [self.contracts[1].pk],
+                })
+        self.assertEqual(response.status_code, 302)
+        job = ExportJob.objects.get()
+        self.assertEqual(job.status, 'DN')
+        self.assertEqual([row[1] for row in self.read_export(job)[1:]],
+                         ['Exported Contract 1', 'Exported Contract 3'])
+
+    def test_status_and_download_views(self):
+        job = ExportJob.objects.create()
+        status_url = reverse('admin:TestTask_exportjob_status',
+                             args=[job.pk])
+        self.assertEqual(self.client.get(status_url).json()['status'], 'PN')
+
+        start_export_job(job.pk)
+        status = self.client.get(status_url).json()
+        self.assertEqual(status['progress'], 100)
+        self.assertEqual(status['total_rows'], 5)
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content)
+                        .startswith(b'ID,Title,Status'))
@@ -1,13 +1,50 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
 
 from rest_framework.test import APITestCase, APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from TestTask.models import Contract
+from TestTask.checks import check_shared_caches
+from TestTask.models import Contract, ContractRole, Contractor, Subsidiary
+from TestTask.tests.mixins import ContractFixtureMixin
 
 User = get_user_model()
 
+# Moves the contract data to a new version from another process sharing
+# the file based cache in sys.argv[1], as a write committed there would.
+TOUCH_CONTRACTS = '''
+import sys
+
+import django
+from django.conf import settings
+
+settings.configure(
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': sys.argv[1]}},
+    DATABASES={'default': {
+        'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}})
+django.setup()
+
+from django.db import transaction
+
+from TestTask.caching import touch_contracts
+
+with transaction.atomic():
+    touch_contracts()
+'''
+
 
 class ContractViewTests(APITestCase):
     fixtures = [
@@ -16,6 +53,7 @@ class ContractViewTests(APITestCase):
     ]
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
 
         self.general_director = User.objects.get(username='testuser')
@@ -38,14 +76,14 @@ class ContractViewTests(APITestCase):
             f'Bearer {self.general_director_token}'))
         response = self.client.get(reverse('contract-list'))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 2)
+        self.assertEqual(len(response.json()['data']), 1)
 
     def test_contract_list_view_as_non_general_director(self):
         self.client.credentials(HTTP_AUTHORIZATION=(
             f'Bearer {self.non_general_director_token}'))
         response = self.client.get(reverse('contract-list'))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 2)
+        self.assertEqual(len(response.json()['data']), 1)
 
     def test_contract_detail_view(self):
         self.client.credentials(HTTP_AUTHORIZATION=(
@@ -76,3 +114,647 @@ class ContractViewTests(APITestCase):
                                    'org_do_id': 1, 'org_po_id': 2})
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json(), list)
+
+
+class ContractListQueryCountTests(ContractFixtureMixin, APITestCase):
+    """
+    The number of queries issued by the contract endpoints must not depend
+    on the number of contracts, participants or their organizations.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ContractRole.objects.create(
+            contract=cls.contract, user=cls.director, role='GD')
+        ContractRole.objects.create(
+            contract=cls.contract, user=cls.member, role='MN')
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_client(self.director)
+        self.counter = 0
+
+    def create_contracts(self, count):
+        for _ in range(count):
+            self.counter += 1
+            subsidiary = Subsidiary.objects.create(
+                name=f'Subsidiary {chr(65 + self.counter)}')
+            contractor = Contractor.objects.create(
+                name=f'Contractor {chr(65 + self.counter)}')
+            contract = Contract.objects.create(
+                title=f'Query Count Contract {self.counter}',
+                organization_do=subsidiary, organization_po=contractor)
+            for index, organization in enumerate((subsidiary, contractor)):
+                user = User.objects.create(
+                    username=f'participant{self.counter}_{index}',
+                    first_name='Part', last_name='Icipant',
+                    job_title='MN', organization=organization)
+                ContractRole.objects.create(
+                    contract=contract, user=user, role='MN')
+        return contract
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_contract_list_query_count_is_constant(self):
+        self.create_contracts(2)
+        self.client.get(reverse('contract-list'))
+        queries_small, _ = self.count_queries(reverse('contract-list'))
+
+        self.create_contracts(5)
+        queries_large, response = self.count_queries(
+            reverse('contract-list'))
+
+        self.assertEqual(queries_small, queries_large)
+        contracts = response.json()['data']
+        self.assertEqual(len(contracts), 8)
+        for contract in contracts:
+            self.assertEqual(len(contract['participants']), 2)
+            self.assertIsNotNone(contract['participants'][0]['organization'])
+
+    def test_contract_detail_query_count_is_constant(self):
+        contract = self.create_contracts(1)
+        url = reverse('contract-detail', kwargs={'pk': contract.pk})
+        self.client.get(url)
+        queries_small, _ = self.count_queries(url)
+
+        for index in range(10):
+            user = User.objects.create(
+                username=f'extra{index}', first_name='Extra',
+                last_name='User', job_title='SP',
+                organization=contract.organization_po)
+            ContractRole.objects.create(
+                contract=contract, user=user, role='SP')
+        queries_large, response = self.count_queries(url)
+
+        self.assertEqual(queries_small, queries_large)
+        self.assertEqual(len(response.json()['data']['participants']), 12)
+
+
+class ContractListPaginationTests(ContractFixtureMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_client(self.director)
+        self.contract_ids = [self.contract.pk] + [
+            Contract.objects.create(
+                title=f'Paginated Contract {index}',
+                organization_do=self.subsidiary,
+                organization_po=self.contractor).pk
+            for index in range(4)
+        ]
+
+    def test_contract_list_follows_cursor_links(self):
+        url = reverse('contract-list') + '?page_size=2'
+        seen_ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertEqual(body['app_version'], '1.0.0')
+            self.assertLessEqual(len(body['data']), 2)
+            seen_ids += [contract['id'] for contract in body['data']]
+            url = body['next']
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen_ids, self.contract_ids)
+
+    def test_contract_list_rejects_invalid_cursor(self):
+        response = self.client.get(
+            reverse('contract-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CONTRACT_RESPONSE_CACHE_TIMEOUT=0,
+                   ORGANIZATION_CACHE_TIMEOUT=3600,
+                   PRINCIPAL_CACHE_TIMEOUT=300)
+class ContractRequestQueryCountTests(ContractFixtureMixin, APITestCase):
+    """
+    Pins the number of queries per HTTP method on the detail and
+    manage-users endpoints, where the contract is loaded once per request.
+    The contract response cache is disabled to measure uncached requests.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ContractRole.objects.create(
+            contract=cls.contract, user=cls.director, role='GD')
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_client(self.director)
+        self.detail_url = reverse(
+            'contract-detail', kwargs={'pk': self.contract.pk})
+        self.manage_url = reverse(
+            'contract-manage-users', kwargs={'pk': self.contract.pk})
+        self.client.get(self.detail_url)
+
+    def test_detail_get_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_manage_users_get_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.manage_url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_manage_users_post_query_count(self):
+        # The unique_contract_role constraint replaces the exists() probe
+        # ContractRole.save used to run before its INSERT. Savepoints are
+        # only taken inside a transaction, like the one wrapping this
+        # test, and are left out of the count.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.manage_url, {'username': 'member', 'role': 'SP'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len([
+            query for query in queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]), 7)
+
+    def test_manage_users_post_rejects_duplicate_and_invalid_roles(self):
+        for data, detail in (
+                ({'username': 'director', 'role': 'GD'},
+                 'This user is already assigned this role in this contract.'),
+                ({'username': 'member'}, 'Invalid data passed.')):
+            with self.subTest(data=data):
+                response = self.client.post(self.manage_url, data)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['data']['detail'], detail)
+        self.assertEqual(ContractRole.objects.count(), 1)
+
+    def test_manage_users_delete_query_count(self):
+        ContractRole.objects.create(
+            contract=self.contract, user=self.member, role='SP')
+        with self.assertNumQueries(9):
+            response = self.client.delete(
+                self.manage_url, {'username': 'member', 'role': 'SP'})
+        self.assertEqual(response.status_code, 204)
+
+
+class ContractManageUsersBulkTests(ContractFixtureMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.outsider_org = Contractor.objects.create(name='Other Contractor')
+        # Only the contract's own director, not a system owner's, is
+        # limited to the members of the contract's organizations.
+        cls.subsidiary.is_system_owner = False
+        cls.subsidiary.save()
+        ContractRole.objects.create(
+            contract=cls.contract, user=cls.director, role='GD')
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_client(self.director)
+        self.url = reverse(
+            'contract-manage-users-bulk', kwargs={'pk': self.contract.pk})
+
+    def create_members(self, count, organization=None):
+        return [
+            User.objects.create(
+                username=f'member{index}', first_name='Bulk',
+                last_name='Member', job_title='SP',
+                organization=organization or self.contractor)
+            for index in range(count)
+        ]
+
+    def test_bulk_operations_report_per_item_results(self):
+        member, removed = self.create_members(2)
+        outsider = User.objects.create(
+            username='outsider', first_name='Bulk', last_name='Outsider',
+            job_title='SP', organization=self.outsider_org)
+        ContractRole.objects.create(
+            contract=self.contract, user=removed, role='SP')
+
+        response = self.client.post(self.url, {'operations': [
+            {'action': 'add', 'username': member.username, 'role': 'MN'},
+            {'action': 'add', 'username': member.username, 'role': 'MN'},
+            {'action': 'add', 'username': outsider.username, 'role': 'SP'},
+            {'action': 'add', 'username': 'nobody', 'role': 'SP'},
+            {'action': 'add', 'username': member.username, 'role': 'XX'},
+            {'action': 'remove', 'username': removed.username, 'role': 'SP'},
+            {'action': 'remove', 'username': member.username, 'role': 'SP'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual((data['added'], data['removed']), (1, 1))
+        self.assertEqual(
+            [result['status'] for result in data['results']],
+            ['added', 'exists', 'forbidden', 'not_found', 'invalid',
+             'removed', 'not_found'])
+        self.assertEqual(data['results'][0]['username'], member.username)
+        self.assertEqual(
+            set(ContractRole.objects.filter(contract=self.contract)
+                .values_list('user__username', 'role')),
+            {('director', 'GD'), (member.username, 'MN')})
+        self.assertTrue(self.contract.visibility.filter(user=member).exists())
+        self.assertFalse(
+            self.contract.visibility.filter(user=removed).exists())
+
+    def test_operations_apply_in_order(self):
+        kept, dropped = self.create_members(2)
+        ContractRole.objects.create(
+            contract=self.contract, user=kept, role='SP')
+
+        response = self.client.post(self.url, {'operations': [
+            {'action': 'remove', 'username': kept.username, 'role': 'SP'},
+            {'action': 'add', 'username': kept.username, 'role': 'SP'},
+            {'action': 'add', 'username': dropped.username, 'role': 'SP'},
+            {'action': 'remove', 'username': dropped.username, 'role': 'SP'},
+        ]}, format='json')
+
+        data = response.json()['data']
+        self.assertEqual(
+            [result['status'] for result in data['results']],
+            ['removed', 'added', 'added', 'removed'])
+        self.assertEqual((data['added'], data['removed']), (0, 0))
+        self.assertEqual(
+            set(ContractRole.objects.filter(contract=self.contract)
+                .values_list('user__username', 'role')),
+            {('director', 'GD'), (kept.username, 'SP')})
+
+    def test_bulk_query_count_does_not_grow_with_operations(self):
+        def staff(members, action):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, {'operations': [
+                    {'action': action, 'username': member.username,
+                     'role': 'SP'} for member in members
+                ]}, format='json')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        members = self.create_members(30)
+        staff(members[:1], 'remove')
+        self.assertEqual(staff(members[:3], 'add'),
+                         staff(members[3:], 'add'))
+        self.assertEqual(
+            ContractRole.objects.filter(
+                contract=self.contract, role='SP').count(), 30)
+        self.assertEqual(staff(members[:3], 'remove'),
+                         staff(members[3:], 'remove'))
+
+    def test_bulk_requires_operations(self):
+        for payload in ({}, {'operations': []},
+                        {'operations': [{}] * 501}):
+            response = self.client.post(self.url, payload, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_bulk_requires_contract_director(self):
+        member = self.create_members(1)[0]
+        self.authenticate_client(member)
+        response = self.client.post(self.url, {'operations': [
+            {'action': 'add', 'username': member.username, 'role': 'SP'}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ContractManageUsersListingTests(ContractFixtureMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ('Anna', 'Andrew', 'Boris', 'Anton'):
+            User.objects.create(
+                username=f'{name.lower()}_user', first_name=name,
+                last_name='Smith', job_title='SP',
+                organization=cls.contractor)
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_client(self.director)
+        self.url = reverse(
+            'contract-manage-users', kwargs={'pk': self.contract.pk})
+
+    def test_listing_is_paginated_by_username(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        body = response.json()
+        self.assertEqual([user['username'] for user in body['data']],
+                         ['andrew_user', 'anna_user'])
+        self.assertEqual(body['data'][0], {
+            'id': User.objects.get(username='andrew_user').pk,
+            'username': 'andrew_user', 'email': '',
+            'full_name': 'Andrew Smith'})
+
+        usernames = [user['username'] for user in body['data']]
+        while body['next']:
+            body = self.client.get(body['next']).json()
+            usernames.extend(user['username'] for user in body['data'])
+        self.assertEqual(usernames, sorted(
+            User.objects.values_list('username', flat=True)))
+
+    def test_listing_searches_by_prefix(self):
+        response = self.client.get(self.url, {'search': 'an'})
+        self.assertEqual(
+            [user['username'] for user in response.json()['data']],
+            ['andrew_user', 'anna_user', 'anton_user'])
+
+        response = self.client.get(self.url, {'search': 'DIRE'})
+        self.assertEqual(
+            [user['username'] for user in response.json()['data']],
+            ['director'])
+
+        response = self.client.get(self.url, {'search': 'mith'})
+        self.assertEqual(response.json()['data'], [])
+
+
+@override_settings(ORGANIZATION_CACHE_TIMEOUT=3600)
+class FetchUsersTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.subsidiary = Subsidiary.objects.create(name='Fetch Subsidiary')
+        self.contractor = Contractor.objects.create(name='Fetch Contractor')
+        self.admin = User.objects.create_superuser(
+            username='admin', password='password', job_title='GD')
+        self.client.force_login(self.admin)
+        self.url = reverse('fetch_users')
+        for username, organization in (('zoe', self.subsidiary),
+                                       ('adam', self.contractor)):
+            User.objects.create(
+                username=username, first_name='Fetched', last_name='User',
+                job_title='SP', organization=organization)
+        self.query = {'org': [f'subsidiary_{self.subsidiary.pk}',
+                              f'contractor_{self.contractor.pk}']}
+
+    def test_users_of_several_organizations(self):
+        response = self.client.get(self.url, self.query)
+        self.assertEqual([user['text'] for user in response.json()],
+                         ['adam', 'zoe'])
+
+    def test_organization_type_must_match(self):
+        response = self.client.get(
+            self.url, {'org': f'subsidiary_{self.contractor.pk}'})
+        self.assertEqual(response.json(), [])
+
+    def test_legacy_parameters(self):
+        response = self.client.get(self.url, {
+            'org_do_id': self.subsidiary.pk, 'org_po_id': self.contractor.pk})
+        self.assertEqual([user['text'] for user in response.json()],
+                         ['adam', 'zoe'])
+
+    def test_invalid_organizations(self):
+        for query in ({}, {'org': 'partner_1'}, {'org_do_id': 'x'}):
+            response = self.client.get(self.url, query)
+            self.assertEqual(response.status_code, 400)
+
+    def test_revalidation_skips_the_user_query(self):
+        response = self.client.get(self.url, self.query)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # Only the session and the requesting user are loaded.
+        with self.assertNumQueries(2):
+            revalidated = self.client.get(
+                self.url, self.query, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    @override_settings(ORGANIZATION_CACHE_TIMEOUT=0)
+    def test_disabled_organization_cache_sends_no_validators(self):
+        response = self.client.get(self.url, self.query)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # A queryset update sends no signal to record a new version.
+        User.objects.filter(username='zoe').update(username='yvonne')
+        response = self.client.get(
+            self.url, self.query, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['text'] for user in response.json()],
+                         ['adam', 'yvonne'])
+
+    def test_user_changes_invalidate_the_etag(self):
+        etag = self.client.get(self.url, self.query)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create(
+                username='newcomer', first_name='New', last_name='Comer',
+                job_title='SP', organization=self.contractor)
+
+        response = self.client.get(
+            self.url, self.query, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('newcomer',
+                      [user['text'] for user in response.json()])
+
+    def test_leaving_an_organization_invalidates_its_etag(self):
+        query = {'org': f'subsidiary_{self.subsidiary.pk}'}
+        etag = self.client.get(self.url, query)['ETag']
+        user = User.objects.get(username='zoe')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.organization = self.contractor
+            user.save()
+
+        response = self.client.get(self.url, query, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+
+@override_settings(ORGANIZATION_CACHE_TIMEOUT=3600,
+                   PRINCIPAL_CACHE_TIMEOUT=300)
+class ContractFieldSelectionTests(ContractFixtureMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ContractRole.objects.create(
+            contract=cls.contract, user=cls.director, role='GD')
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_client(self.director)
+        self.detail_url = reverse(
+            'contract-detail', kwargs={'pk': self.contract.pk})
+        self.client.get(reverse('contract-list'))
+
+    def get_with_queries(self, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data'], [
+            query['sql'] for query in context.captured_queries]
+
+    def test_list_without_nested_fields_skips_joins(self):
+        contracts, queries = self.get_with_queries(
+            reverse('contract-list'), {'fields': 'title,status,start_date'})
+        self.assertEqual(list(contracts[0]),
+                         ['id', 'title', 'start_date', 'status'])
+        contract_queries = [sql for sql in queries
+                            if 'FROM "TestTask_contract"' in sql]
+        self.assertEqual(len(contract_queries), 1)
+        self.assertNotIn('JOIN', contract_queries[0])
+        self.assertFalse(any('TestTask_contractrole' in sql
+                             for sql in queries))
+
+    def test_list_with_participants_loads_lean_users(self):
+        contracts, queries = self.get_with_queries(
+            reverse('contract-list'), {'fields': 'participants'})
+        self.assertEqual(list(contracts[0]), ['id', 'participants'])
+        self.assertEqual(contracts[0]['participants'][0]['organization'],
+                         {'id': self.contract.organization_do_id,
+                          'name': 'Owner Subsidiary',
+                          'is_system_owner': True})
+        role_query = next(sql for sql in queries
+                          if 'FROM "TestTask_contractrole"' in sql)
+        self.assertNotIn('password', role_query)
+        self.assertNotIn('search_text', role_query)
+
+    def test_full_list_is_unchanged(self):
+        contracts, _ = self.get_with_queries(reverse('contract-list'))
+        self.assertEqual(list(contracts[0]), [
+            'id', 'title', 'start_date', 'end_date', 'status',
+            'organization_do', 'organization_po', 'participants'])
+
+    def test_detail_fields(self):
+        contract, queries = self.get_with_queries(
+            self.detail_url, {'fields': 'organization_po'})
+        self.assertEqual(contract['organization_po']['name'],
+                         'Fixture Contractor')
+        self.assertEqual(list(contract), ['id', 'organization_po'])
+        self.assertEqual(len(queries), 1)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(
+            reverse('contract-list'), {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', str(response.json()['data']['fields']))
+
+
+@override_settings(CONTRACT_RESPONSE_CACHE_TIMEOUT=300,
+                   ORGANIZATION_CACHE_TIMEOUT=3600,
+                   PRINCIPAL_CACHE_TIMEOUT=300)
+class ContractResponseCacheTests(ContractFixtureMixin, APITestCase):
+    """
+    The tests run in one process, where the local memory cache is shared
+    like the cache of a deployment with several workers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ContractRole.objects.create(
+            contract=cls.contract, user=cls.member, role='SP')
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_client(self.member)
+        self.list_url = reverse('contract-list')
+        self.detail_url = reverse(
+            'contract-detail', kwargs={'pk': self.contract.pk})
+
+    def test_repeated_reads_are_served_from_the_cache(self):
+        for url in (self.list_url, self.detail_url):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second.json(), first.json())
+                self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_returns_not_modified(self):
+        for url in (self.list_url, self.detail_url):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+
+    def test_writes_invalidate_cached_responses(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contractor.name = 'Renamed Contractor'
+            self.contractor.save()
+
+        response = self.client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['data']['organization_po']['name'],
+            'Renamed Contractor')
+
+    def test_losing_access_invalidates_cached_responses(self):
+        self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            ContractRole.objects.filter(user=self.member).delete()
+
+        self.assertEqual(self.client.get(self.detail_url).status_code, 403)
+        self.assertEqual(self.client.get(self.list_url).json()['data'], [])
+
+    def test_responses_are_cached_per_user(self):
+        self.client.get(self.list_url)
+        other = User.objects.create(
+            username='other', first_name='Other', last_name='User',
+            job_title='SP', organization=self.subsidiary)
+        self.authenticate_client(other)
+        self.assertEqual(self.client.get(self.list_url).json()['data'], [])
+
+    def test_write_in_another_process_invalidates_cached_responses(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': directory}}):
+            etag = self.client.get(self.detail_url)['ETag']
+            # The write of another worker: the database is shared, and
+            # update() skips the receivers of this process.
+            Contract.objects.filter(pk=self.contract.pk).update(
+                title='Renamed Elsewhere Contract')
+            self.assertEqual(
+                self.client.get(self.detail_url).json()['data']['title'],
+                'Fixture Contract')
+
+            subprocess.run([sys.executable, '-c', TOUCH_CONTRACTS, directory],
+                           cwd=settings.BASE_DIR, check=True)
+
+            response = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['data']['title'],
+                             'Renamed Elsewhere Contract')
+
+    @override_settings(CONTRACT_RESPONSE_CACHE_TIMEOUT=0)
+    def test_disabled_cache_sends_no_etags(self):
+        response = self.client.get(self.detail_url)
+        self.assertNotIn('ETag', response)
+        Contract.objects.filter(pk=self.contract.pk).update(
+            title='Renamed Uncached Contract')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['title'],
+                         'Renamed Uncached Contract')
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    def test_per_process_cache_is_rejected(self):
+        self.assertEqual(check_shared_caches(None), [])
+        for name in ('CONTRACT_RESPONSE_CACHE_TIMEOUT',
+                     'ORGANIZATION_CACHE_TIMEOUT',
+                     'PRINCIPAL_CACHE_TIMEOUT'):
+            with self.subTest(name=name):
+                with override_settings(**{name: 300}):
+                    errors = check_shared_caches(None)
+                self.assertEqual([error.id for error in errors],
+                                 ['TestTask.E001'])
+                self.assertIn(name, errors[0].msg)
+                with override_settings(**{name: 300}, CACHES={
+                        'default': {'BACKEND': 'django.core.cache.backends.'
+                                               'redis.RedisCache',
+                                    'LOCATION': 'redis://localhost:6379/1'}}):
+                    self.assertEqual(check_shared_caches(None), [])
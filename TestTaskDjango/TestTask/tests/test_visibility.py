@@ -0,0 +1,91 @@
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from TestTask.models import (
+    Contract,
+    ContractRole,
+    ContractVisibility,
+    Contractor,
+    Subsidiary,
+    User
+)
+
+
+class ContractVisibilityTestCase(TestCase):
+
+    def setUp(self):
+        self.subsidiary = Subsidiary.objects.create(name='Visible Subsidiary')
+        self.other_subsidiary = Subsidiary.objects.create(
+            name='Other Subsidiary')
+        self.contractor = Contractor.objects.create(name='Visible Contractor')
+        self.contract = Contract.objects.create(
+            title='Visibility Contract', organization_do=self.subsidiary,
+            organization_po=self.contractor)
+        self.director = User.objects.create(
+            username='director', first_name='Sub', last_name='Director',
+            job_title='GD', organization=self.subsidiary)
+        self.manager = User.objects.create(
+            username='manager', first_name='Con', last_name='Manager',
+            job_title='MN', organization=self.contractor)
+
+    def visible_contract_ids(self, user):
+        return set(ContractVisibility.objects.filter(user=user)
+                   .values_list('contract_id', flat=True))
+
+    def test_general_director_sees_organization_contracts(self):
+        self.assertEqual(self.visible_contract_ids(self.director),
+                         {self.contract.pk})
+        contract = Contract.objects.create(
+            title='Second Visibility Contract',
+            organization_do=self.subsidiary, organization_po=self.contractor)
+        self.assertEqual(self.visible_contract_ids(self.director),
+                         {self.contract.pk, contract.pk})
+
+    def test_role_changes_update_index(self):
+        self.assertEqual(self.visible_contract_ids(self.manager), set())
+        role = ContractRole.objects.create(
+            contract=self.contract, user=self.manager, role='MN')
+        self.assertEqual(self.visible_contract_ids(self.manager),
+                         {self.contract.pk})
+        role.delete()
+        self.assertEqual(self.visible_contract_ids(self.manager), set())
+
+    def test_user_organization_change_updates_index(self):
+        self.director.organization = self.other_subsidiary
+        self.director.save()
+        self.assertEqual(self.visible_contract_ids(self.director), set())
+
+        self.director.organization = self.subsidiary
+        self.director.save()
+        self.assertEqual(self.visible_contract_ids(self.director),
+                         {self.contract.pk})
+
+        self.director.job_title = 'VD'
+        self.director.save()
+        self.assertEqual(self.visible_contract_ids(self.director), set())
+
+    def test_contract_organization_change_updates_index(self):
+        self.contract.organization_do = self.other_subsidiary
+        self.contract.save()
+        self.assertEqual(self.visible_contract_ids(self.director), set())
+
+    def test_cascading_deletes_keep_index_consistent(self):
+        ContractRole.objects.create(
+            contract=self.contract, user=self.manager, role='MN')
+        self.manager.delete()
+        self.subsidiary.delete()
+        self.assertFalse(ContractVisibility.objects.exists())
+
+    def test_rebuild_command_repairs_index(self):
+        ContractRole.objects.create(
+            contract=self.contract, user=self.manager, role='MN')
+        call_command('rebuild_contract_visibility', '--verify')
+
+        ContractVisibility.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_contract_visibility', '--verify')
+
+        call_command('rebuild_contract_visibility', '--batch-size', '1')
+        call_command('rebuild_contract_visibility', '--verify')
+        self.assertEqual(self.visible_contract_ids(self.manager),
+                         {self.contract.pk})
@@ -1,9 +1,11 @@
 from django.urls import path
 
 from .views import (
-    fetch_users
+    fetch_users,
+    metrics
 )
 
 urlpatterns = [
     path('fetch_users/', fetch_users, name='fetch_users'),
+    path('metrics/', metrics, name='metrics'),
 ]
@@ -1,39 +1,65 @@
+from django.contrib.admin.views.main import (
+    ALL_VAR,
+    ERROR_FLAG,
+    IS_POPUP_VAR,
+    ORDER_VAR,
+    PAGE_VAR,
+    TO_FIELD_VAR
+)
+from django.db import transaction
+from django.urls import reverse
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
-from .tasks import export_to_csv_task
+from .models import ExportJob
+from .tasks import start_export_job
+
+# Changelist parameters that do not narrow down the listed rows.
+CHANGELIST_PARAMS = {
+    ALL_VAR, ERROR_FLAG, IS_POPUP_VAR, ORDER_VAR, PAGE_VAR, TO_FIELD_VAR
+}
+
+
+def get_export_filters(request):
+    """
+    Translates the changelist query string of the request into the filter
+    spec stored on an ExportJob. Every parameter that narrows down the
+    changelist is kept, so build_export_queryset fails the job on one it
+    cannot apply instead of exporting more rows than were selected.
+    """
+    return {key: value for key, value in request.GET.items()
+            if key not in CHANGELIST_PARAMS and value}
 
 
 def export_to_csv(modeladmin, request, queryset):
     """
-    Exports a given queryset to a CSV file,
-    providing an HTTP response with a download attachment.
+    Exports a given queryset to a CSV file in the background.
 
     This method is intended to be used as an action within
-    Django's admin interface. It writes
-    specific fields of each object in the queryset to a CSV file,
-    which is then offered as a
-    downloadable file to the user.
+    Django's admin interface. It records an ExportJob holding the
+    selected ids, or the changelist filters when all matching objects
+    are selected, and starts the Celery tasks that write the job's CSV
+    file. Progress is shown on the export job in the admin.
 
     Parameters:
     - modeladmin: The ModelAdmin instance defining the action.
     - request: The HttpRequest object.
     - queryset: The QuerySet of the model instances to be exported.
-
-    Returns:
-    - HttpResponse: An HTTP response object configured to prompt the user
-    to download the CSV file.
     """
-    # response = HttpResponse(content_type='text/csv')
-    # response['Content-Disposition'] = 'attachment; filename="contracts.csv"'
-    # writer = csv.writer(response)
-    # for obj in queryset:
-    #     writer.writerow([obj.title, obj.status])
-    # return response
-
-    queryset_ids = list(queryset.values_list('id', flat=True))
-    export_to_csv_task.apply_async(args=[queryset_ids])
-    modeladmin.message_user(request, _(
-        "The export process has started. When ready selected data will be placed in exports/contracts.csv on server."
+    if request.POST.get('select_across') == '1':
+        # All matching rows were selected: store the changelist filters
+        # instead of every id.
+        job = ExportJob.objects.create(
+            created_by=request.user, filters=get_export_filters(request))
+    else:
+        job = ExportJob.objects.create(
+            created_by=request.user,
+            contract_ids=list(queryset.values_list('id', flat=True)))
+    transaction.on_commit(lambda: start_export_job.delay(job.pk))
+    modeladmin.message_user(request, format_html(
+        _('The export process has started. Follow its progress on '
+          '<a href="{}">{}</a>.'),
+        reverse('admin:TestTask_exportjob_change', args=[job.pk]), job
     ))
 
 
@@ -1,70 +1,120 @@
+import hashlib
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
 from django.contrib.auth.decorators import login_required
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.db.models import Q
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, quote_etag
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import permissions, status, views
 
-from .mixins import ContractPermissionMixin
+from .mixins import (
+    ContractPermissionMixin,
+    ContractResponseCacheMixin,
+    ReplicaReadMixin
+)
+from .pagination import KeysetPagination, UserKeysetPagination
+from .metrics import registry, timed_serialization
 from .models import Contract, ContractRole, Contractor, Subsidiary, User
+from .organizations import (
+    get_organization_users_versions,
+    parse_organization_value
+)
 from .permissions import (
     IsContractGeneralDirectorOrGeneralDirector,
     IsGeneralDirectorOrRelatedUser
 )
-from .serializers import ContractSerializer, UserSerializer
+from .search import USER_SEARCH_FIELDS, prefix_search
+from .serializers import (
+    ContractRoleOperationSerializer,
+    ContractSerializer,
+    ContractValuesSerializer,
+    UserValuesSerializer
+)
 from .responses import CustomResponse, CustomNotFound
+from .visibility import defer_visibility_refresh, refresh_contract_visibility
 
 
-class ContractListView(views.APIView):
+class ContractListView(ReplicaReadMixin, ContractResponseCacheMixin,
+                       views.APIView, ContractPermissionMixin):
     """
     API view to list all contracts for an authenticated user based
     on their role and associated organization.
-    General Directors can view all contracts, while other users can only see
-    contracts linked to their organization.
+    General Directors of the system owner can view all contracts, while
+    other users see the contracts recorded for them in the visibility index.
+    Results are paginated with an opaque keyset cursor. ?fields= limits
+    the output, and the joins behind it, to the listed fields. Pages are
+    serialized from values() rows by ContractValuesSerializer. Responses
+    are cached per user and revalidated with an ETag, see
+    ContractResponseCacheMixin, unless the page is read from the replicas,
+    see ReplicaReadMixin.
     """
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get(self, request):
+        cached = self.get_cached_response()
+        if cached is not None:
+            return cached
         user = request.user
-        user_is_general_director = user.job_title == 'GD'
 
-        if user_is_general_director:
-            if (hasattr(user.organization, 'is_system_owner') and
-                    user.organization.is_system_owner):
-                contracts = Contract.objects.all()
-            else:
-                contracts = Contract.objects.filter(roles__user=user)
-                if isinstance(user.organization, Subsidiary):
-                    contracts |= Contract.objects.filter(
-                        organization_do=user.organization)
-                elif isinstance(user.organization, Contractor):
-                    contracts |= Contract.objects.filter(
-                        organization_po=user.organization)
+        if self.check_general_director_permissions(user):
+            contracts = Contract.objects.all()
         else:
-            contracts = Contract.objects.filter(roles__user=user)
+            contracts = Contract.objects.filter(visibility__user=user)
 
-        contracts = contracts.distinct()
-        serializer = ContractSerializer(contracts, many=True)
-        return CustomResponse(serializer.data)
+        serializer = ContractValuesSerializer(ContractSerializer.parse_fields(
+            request.query_params.get('fields')))
+        paginator = self.pagination_class()
+        with self.replica_reads():
+            page = paginator.paginate_queryset(
+                contracts.values(*serializer.values), request, view=self)
+            with timed_serialization():
+                data = serializer.serialize(page)
+        return paginator.get_paginated_response(data)
 
 
-class ContractDetailView(views.APIView, ContractPermissionMixin):
+class ContractDetailView(ReplicaReadMixin, ContractResponseCacheMixin,
+                         views.APIView, ContractPermissionMixin):
     """
     API view to retrieve a detailed view of a single contract.
-    Access is controlled by user permissions.
+    Access is controlled by user permissions. ?fields=, the response
+    cache and the replica reads work as on the contract list.
     Users need to be a General Director or related to
     the contract through their organization.
     """
     permission_classes = [permissions.IsAuthenticated,
                           IsGeneralDirectorOrRelatedUser]
 
+    def get_fields(self):
+        return ContractSerializer.parse_fields(
+            self.request.query_params.get('fields'))
+
+    def get_contract_queryset(self):
+        return ContractSerializer.setup_eager_loading(
+            super().get_contract_queryset(), self.get_fields())
+
     def get(self, request, pk):
-        contract = self.get_contract(pk)
-        if not contract:
-            raise CustomNotFound()
-        serializer = ContractSerializer(contract)
-        return CustomResponse(serializer.data)
+        cached = self.get_cached_response()
+        if cached is not None:
+            return cached
+        with self.replica_reads():
+            contract = self.get_contract(pk)
+            if not contract:
+                raise CustomNotFound()
+            serializer = ContractSerializer(contract, fields=self.get_fields())
+            with timed_serialization():
+                data = serializer.data
+        return CustomResponse(data)
 
 
 class ContractManageUsersView(views.APIView, ContractPermissionMixin):
@@ -77,29 +127,38 @@ class ContractManageUsersView(views.APIView, ContractPermissionMixin):
                           IsContractGeneralDirectorOrGeneralDirector]
 
     def get(self, request, pk):
+        """
+        Lists the users eligible for the contract, ordered by username
+        and paginated with a keyset cursor. ?search= narrows the list to
+        users whose username, first or last name starts with the term.
+        """
         contract = self.get_contract(pk)
         if not contract:
             raise CustomNotFound()
         user = request.user
 
         if self.check_general_director_permissions(user):
-            return CustomResponse(
-                UserSerializer(User.objects.all(), many=True).data
-            )
-        if not contract.roles.filter(user=user, role='GD').exists():
+            eligible_users = User.objects.all()
+        elif not contract.user_is_contract_director:
             return CustomResponse({'detail': _(
                 'You do not have permission to manage this contract.')
             }, status=status.HTTP_403_FORBIDDEN)
+        else:
+            eligible_users = User.objects.filter(
+                Q(content_type=ContentType.objects.get_for_model(Subsidiary),
+                  object_id=contract.organization_do_id) |
+                Q(content_type=ContentType.objects.get_for_model(
+                    Contractor), object_id=contract.organization_po_id)
+            )
 
-        eligible_users = User.objects.filter(
-            Q(content_type=ContentType.objects.get_for_model(Subsidiary),
-              object_id=contract.organization_do_id) |
-            Q(content_type=ContentType.objects.get_for_model(
-                Contractor), object_id=contract.organization_po_id)
-        ).distinct()
-
-        serializer = UserSerializer(eligible_users, many=True)
-        return CustomResponse(serializer.data)
+        eligible_users = prefix_search(
+            eligible_users, USER_SEARCH_FIELDS,
+            request.query_params.get('search', '')
+        ).values(*UserValuesSerializer.VALUES)
+        paginator = UserKeysetPagination()
+        page = paginator.paginate_queryset(eligible_users, request, view=self)
+        serializer = UserValuesSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request, pk):
         contract = self.get_contract(pk)
@@ -107,7 +166,7 @@ class ContractManageUsersView(views.APIView, ContractPermissionMixin):
             raise CustomNotFound()
         user = request.user
         if (not self.check_general_director_permissions(user) and
-                not contract.roles.filter(user=user, role='GD').exists()):
+                not contract.user_is_contract_director):
             return CustomResponse({'detail': _(
                 'You do not have permission to manage this contract.')},
                 status=status.HTTP_403_FORBIDDEN)
@@ -117,8 +176,7 @@ class ContractManageUsersView(views.APIView, ContractPermissionMixin):
         except User.DoesNotExist:
             raise CustomNotFound()
 
-        if (not (new_user.organization == contract.organization_do or
-                 new_user.organization == contract.organization_po) and
+        if (not self.is_contract_member(new_user, contract) and
                 not self.check_general_director_permissions(user)):
             return CustomResponse({'detail': _(
                 'User must be a member of an organization '
@@ -134,10 +192,14 @@ class ContractManageUsersView(views.APIView, ContractPermissionMixin):
         try:
             ContractRole.objects.create(
                 contract=contract, user=new_user, role=contract_role)
-        except:
+        except ValidationError:
             return CustomResponse({'detail': _(
                 'Invalid data passed.')},
                 status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            return CustomResponse({'detail': _(
+                'This user is already assigned this role in this contract.')},
+                status=status.HTTP_400_BAD_REQUEST)
         return CustomResponse({'detail': _(
             'User added successfully.')},
             status=status.HTTP_201_CREATED)
@@ -148,7 +210,7 @@ class ContractManageUsersView(views.APIView, ContractPermissionMixin):
         if not contract:
             raise CustomNotFound()
         if (not self.check_general_director_permissions(user) and
-                not contract.roles.filter(user=user, role='GD').exists()):
+                not contract.user_is_contract_director):
             return CustomResponse({'detail': _(
                 'You do not have permission to manage this contract.')},
                 status=status.HTTP_403_FORBIDDEN)
@@ -160,16 +222,10 @@ class ContractManageUsersView(views.APIView, ContractPermissionMixin):
                 'Invalid data passed.')},
                 status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user_to_delete = User.objects.get(
-                username=request.data.get('username'))
-        except User.DoesNotExist:
-            raise CustomNotFound()
-
         try:
             role_to_delete = ContractRole.objects.get(
                 contract=contract,
-                user=user_to_delete,
+                user__username=request.data.get('username'),
                 role=contract_role
             )
         except ContractRole.DoesNotExist:
@@ -181,30 +237,191 @@ class ContractManageUsersView(views.APIView, ContractPermissionMixin):
             status=status.HTTP_204_NO_CONTENT)
 
 
+class ContractManageUsersBulkView(views.APIView, ContractPermissionMixin):
+    """
+    API view to add and remove many contract participants in one request.
+    Accepts a list of {action, username, role} operations, validates them
+    with a constant number of queries and applies the valid ones in one
+    transaction. Operations are applied in order to the contract's roles,
+    so a result accounts for the operations before it, and the added and
+    removed totals are the net changes written. Every operation gets its
+    own result in the response.
+    """
+    permission_classes = [permissions.IsAuthenticated,
+                          IsContractGeneralDirectorOrGeneralDirector]
+    max_operations = 500
+
+    def post(self, request, pk):
+        contract = self.get_contract(pk)
+        if not contract:
+            raise CustomNotFound()
+        user = request.user
+        is_general_director = self.check_general_director_permissions(user)
+        if not is_general_director and not contract.user_is_contract_director:
+            return CustomResponse({'detail': _(
+                'You do not have permission to manage this contract.')},
+                status=status.HTTP_403_FORBIDDEN)
+
+        operations = request.data.get('operations')
+        if (not isinstance(operations, list) or not operations or
+                len(operations) > self.max_operations):
+            return CustomResponse({'detail': _(
+                'Provide between 1 and {limit} operations.').format(
+                    limit=self.max_operations)},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(operations)
+        valid = []
+        for index, operation in enumerate(operations):
+            serializer = ContractRoleOperationSerializer(
+                data=operation if isinstance(operation, dict) else {})
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'status': 'invalid',
+                                  'errors': serializer.errors}
+
+        users = User.objects.only(
+            'id', 'username', 'content_type_id', 'object_id'
+        ).in_bulk({data['username'] for index, data in valid},
+                  field_name='username')
+        assigned = {
+            (user_id, role): role_id for role_id, user_id, role in
+            ContractRole.objects.filter(
+                contract=contract,
+                user__in=[member.pk for member in users.values()]
+            ).values_list('pk', 'user_id', 'role')
+        }
+
+        # The roles as of the operations applied so far, with None for
+        # the ones still to be created.
+        current = dict(assigned)
+        to_create, to_delete = {}, {}
+        for index, data in valid:
+            member = users.get(data['username'])
+            key = (member.pk, data['role']) if member else None
+            if member is None:
+                result = {'status': 'not_found'}
+            elif data['action'] == 'add':
+                if key in current:
+                    result = {'status': 'exists'}
+                elif (not is_general_director and
+                        not self.is_contract_member(member, contract)):
+                    result = {'status': 'forbidden'}
+                else:
+                    if key in to_delete:
+                        current[key] = to_delete.pop(key)
+                    else:
+                        current[key] = None
+                        to_create[key] = ContractRole(
+                            contract=contract, user=member,
+                            role=data['role'])
+                    result = {'status': 'added'}
+            elif key in current:
+                if current.pop(key) is None:
+                    del to_create[key]
+                else:
+                    to_delete[key] = assigned[key]
+                result = {'status': 'removed'}
+            else:
+                result = {'status': 'not_found'}
+            results[index] = result
+
+        with transaction.atomic(), defer_visibility_refresh():
+            if to_delete:
+                ContractRole.objects.filter(
+                    pk__in=to_delete.values()).delete()
+            ContractRole.objects.bulk_create(to_create.values(),
+                                            ignore_conflicts=True)
+            # bulk_create skips the ContractRole receivers.
+            refresh_contract_visibility(
+                user_ids={user_id for user_id, role in
+                          to_create.keys() | to_delete.keys()},
+                contract_ids=[contract.pk])
+
+        for operation, result in zip(operations, results):
+            if isinstance(operation, dict):
+                result.update({key: operation.get(key) for key in
+                               ('action', 'username', 'role')})
+        return CustomResponse({
+            'added': len(to_create),
+            'removed': len(to_delete),
+            'results': results
+        })
+
+
 @login_required
 def fetch_users(request):
     """
-    Function-based view to fetch users based on organization IDs.
-    Validates that the IDs provided are integers and
-    responds with user details if valid.
+    Function-based view to fetch the users of one or more organizations
+    for the contract admin form. Organizations are given as repeated
+    org=<subsidiary|contractor>_<id> parameters, or as the org_do_id
+    (subsidiary) and org_po_id (contractor) ids, and matched by exact
+    (content type, id) pair.
+    The response carries an ETag and Last-Modified built from the version
+    of each organization's users, so a revalidation that finds nothing
+    changed is answered with 304 Not Modified without querying the users.
+    The versions live in the organization cache, so while
+    ORGANIZATION_CACHE_TIMEOUT is 0, its default without CACHE_URL, the
+    users are loaded on every request and no validators are sent.
     """
-    org_do_id = request.GET.get('org_do_id')
-    org_po_id = request.GET.get('org_po_id')
-    if not org_do_id or not org_po_id:
-        return JsonResponse(
-            {'error': 'Both org_do_id and org_po_id must be provided and not empty.'},
-            status=status.HTTP_400_BAD_REQUEST)
-    try:
-        org_do_id = int(org_do_id)
-        org_po_id = int(org_po_id)
-    except ValueError:
+    values = request.GET.getlist('org')
+    for parameter, model in (('org_do_id', Subsidiary),
+                             ('org_po_id', Contractor)):
+        if request.GET.get(parameter):
+            values.append(
+                f'{model._meta.model_name}_{request.GET[parameter]}')
+    if not values:
         return JsonResponse(
-            {'error': 'org_do_id and org_po_id must be valid integers.'},
+            {'error': 'At least one organization must be provided.'},
             status=status.HTTP_400_BAD_REQUEST)
-    users = User.objects.filter(
-        content_type__in=[ContentType.objects.get_for_model(
-            Subsidiary), ContentType.objects.get_for_model(Contractor)],
-        object_id__in=[org_do_id, org_po_id]
-    ).distinct()
-    user_data = [{'id': user.id, 'text': user.username} for user in users]
-    return JsonResponse(user_data, safe=False)
+    organizations = defaultdict(set)
+    for value in values:
+        parsed = parse_organization_value(value)
+        if parsed is None:
+            return JsonResponse(
+                {'error': 'Organizations must be given as '
+                          '<subsidiary|contractor>_<id>.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        model, pk = parsed
+        organizations[model].add(pk)
+
+    response = None
+    if settings.ORGANIZATION_CACHE_TIMEOUT:
+        versions = get_organization_users_versions(
+            set().union(*organizations.values()))
+        etag = quote_etag(hashlib.md5(repr(sorted(
+            (model._meta.model_name, pk, versions[pk])
+            for model, pks in organizations.items() for pk in pks
+        )).encode()).hexdigest())
+        last_modified = int(max(versions.values()))
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_types = ContentType.objects.get_for_models(*organizations)
+        users = User.objects.filter(reduce(or_, (
+            Q(content_type=content_types[model], object_id__in=pks)
+            for model, pks in organizations.items()
+        ))).order_by('username').values_list('id', 'username')
+        response = JsonResponse([{'id': pk, 'text': username}
+                                 for pk, username in users], safe=False)
+    if settings.ORGANIZATION_CACHE_TIMEOUT:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def metrics(request):
+    """
+    Function-based view serving the request metrics of this process in
+    the Prometheus text format. Staff users can read it, and so can
+    requests carrying METRICS_TOKEN as a bearer token.
+    """
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (
+            settings.METRICS_TOKEN and constant_time_compare(
+                authorization, f'Bearer {settings.METRICS_TOKEN}'))):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
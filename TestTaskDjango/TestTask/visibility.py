@@ -0,0 +1,187 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .caching import touch_contracts
+from .models import (
+    Contract,
+    ContractRole,
+    ContractVisibility,
+    Contractor,
+    Subsidiary,
+    User
+)
+
+_state = threading.local()
+
+
+def get_visibility_pairs(user_ids=None, contract_ids=None):
+    """
+    Computes the (user_id, contract_id) pairs that should be present in
+    the visibility index, optionally restricted to some users and/or
+    contracts.
+
+    Parameters:
+    - user_ids (iterable): Restrict the result to these users.
+    - contract_ids (iterable): Restrict the result to these contracts.
+
+    Returns:
+    - set: A set of (user_id, contract_id) tuples.
+    """
+    roles = ContractRole.objects.all()
+    contracts = Contract.objects.all()
+    directors = User.objects.filter(job_title='GD', object_id__isnull=False)
+    if user_ids is not None:
+        roles = roles.filter(user_id__in=user_ids)
+        directors = directors.filter(pk__in=user_ids)
+    if contract_ids is not None:
+        roles = roles.filter(contract_id__in=contract_ids)
+        contracts = contracts.filter(pk__in=contract_ids)
+
+    pairs = set(roles.values_list('user_id', 'contract_id'))
+    content_types = ContentType.objects.get_for_models(Subsidiary, Contractor)
+    directors = directors.filter(content_type__in=content_types.values())
+    directors_by_org = defaultdict(lambda: defaultdict(list))
+    for user_id, content_type_id, org_id in directors.values_list(
+            'pk', 'content_type_id', 'object_id'):
+        directors_by_org[content_type_id][org_id].append(user_id)
+
+    for model, field in ((Subsidiary, 'organization_do_id'),
+                         (Contractor, 'organization_po_id')):
+        content_type = content_types[model]
+        if content_type.pk not in directors_by_org:
+            continue
+        org_directors = directors_by_org[content_type.pk]
+        org_contracts = contracts.filter(**{
+            f'{field}__in': directors.filter(
+                content_type=content_type).values('object_id')})
+        for contract_id, org_id in org_contracts.values_list('pk', field):
+            pairs.update((user_id, contract_id)
+                         for user_id in org_directors[org_id])
+    return pairs
+
+
+def _index_rows(user_ids=None, contract_ids=None):
+    rows = ContractVisibility.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    if contract_ids is not None:
+        rows = rows.filter(contract_id__in=contract_ids)
+    return {(user_id, contract_id): pk for pk, user_id, contract_id
+            in rows.values_list('pk', 'user_id', 'contract_id')}
+
+
+def refresh_contract_visibility(user_ids=None, contract_ids=None):
+    """
+    Brings the visibility index in line with the current roles and
+    organizations for the given users and/or contracts, and moves the
+    contract data to a new version, as the bulk writes calling it skip
+    the model signals. Inside defer_visibility_refresh() the refresh is
+    postponed until the block exits.
+
+    Parameters:
+    - user_ids (iterable): Users whose rows should be refreshed.
+    - contract_ids (iterable): Contracts whose rows should be refreshed.
+    """
+    user_ids = None if user_ids is None else set(user_ids)
+    contract_ids = None if contract_ids is None else set(contract_ids)
+    if not user_ids and user_ids is not None:
+        return
+    if not contract_ids and contract_ids is not None:
+        return
+
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending.append((user_ids, contract_ids))
+        return
+
+    touch_contracts()
+    with transaction.atomic():
+        expected = get_visibility_pairs(user_ids, contract_ids)
+        existing = _index_rows(user_ids, contract_ids)
+        stale_ids = [pk for pair, pk in existing.items()
+                     if pair not in expected]
+        if stale_ids:
+            ContractVisibility.objects.filter(pk__in=stale_ids).delete()
+        ContractVisibility.objects.bulk_create(
+            [ContractVisibility(user_id=user_id, contract_id=contract_id)
+             for user_id, contract_id in expected - existing.keys()],
+            batch_size=1000
+        )
+
+
+@contextmanager
+def defer_visibility_refresh():
+    """
+    Collects the refreshes requested inside the block, e.g. by the
+    ContractRole delete receivers during a bulk delete, and applies them
+    with one refresh when the block exits successfully.
+    """
+    if getattr(_state, 'pending', None) is not None:
+        yield
+        return
+    _state.pending = pending = []
+    try:
+        yield
+    finally:
+        _state.pending = None
+
+    user_ids, contract_ids = set(), set()
+    for users, contracts in pending:
+        if users is None:
+            user_ids = None
+        elif user_ids is not None:
+            user_ids |= users
+        if contracts is None:
+            contract_ids = None
+        elif contract_ids is not None:
+            contract_ids |= contracts
+    if pending:
+        refresh_contract_visibility(user_ids, contract_ids)
+
+
+def iter_contract_batches(batch_size=1000):
+    """
+    Yields lists of contract ids in primary key order.
+    """
+    last_pk = 0
+    while True:
+        batch = list(Contract.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]
+
+
+def rebuild_contract_visibility(batch_size=1000):
+    """
+    Rebuilds the whole visibility index, one batch of contracts at a time.
+
+    Returns:
+    - int: The number of contracts processed.
+    """
+    processed = 0
+    for batch in iter_contract_batches(batch_size):
+        refresh_contract_visibility(contract_ids=batch)
+        processed += len(batch)
+    return processed
+
+
+def verify_contract_visibility(batch_size=1000):
+    """
+    Compares the visibility index against the rules without modifying it.
+
+    Returns:
+    - tuple: The number of missing and stale rows.
+    """
+    missing = stale = 0
+    for batch in iter_contract_batches(batch_size):
+        expected = get_visibility_pairs(contract_ids=batch)
+        existing = _index_rows(contract_ids=batch).keys()
+        missing += len(expected - existing)
+        stale += len(existing - expected)
+    return missing, stale
@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'TestTask.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,20 +85,137 @@ WSGI_APPLICATION = 'TestTaskDjango.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DATABASE_ENGINE = config('DATABASE_ENGINE', default='sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DATABASE_NAME', default='testtask'),
+            'USER': config('DATABASE_USER', default='postgres'),
+            'PASSWORD': config('DATABASE_PASSWORD', default=''),
+            'HOST': config('DATABASE_HOST', default='localhost'),
+            'PORT': config('DATABASE_PORT', default='5432'),
+            # Persistent connections, checked before reuse.
+            'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=60,
+                                   cast=int),
+            'CONN_HEALTH_CHECKS': config('DATABASE_CONN_HEALTH_CHECKS',
+                                         default=True, cast=bool),
+            # Required behind a transaction-pooling PgBouncer.
+            'DISABLE_SERVER_SIDE_CURSORS': config(
+                'DATABASE_POOLER', default=False, cast=bool),
+            'OPTIONS': {
+                'connect_timeout': config('DATABASE_CONNECT_TIMEOUT',
+                                          default=5, cast=int),
+            },
+        }
     }
-}
+    for index, host in enumerate(
+            config('DATABASE_REPLICA_HOSTS', default='', cast=Csv()),
+            start=1):
+        DATABASES[f'replica{index}'] = {
+            **DATABASES['default'], 'HOST': host,
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DATABASE_NAME', default=str(BASE_DIR /
+                                                        'db.sqlite3')),
+            'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=0,
+                                   cast=int),
+            'OPTIONS': {
+                # Seconds a write waits for the database lock.
+                'timeout': config('SQLITE_BUSY_TIMEOUT', default=20,
+                                  cast=int),
+            },
+        }
+    }
+
+# Aliases the contract read endpoints spread their queries over.
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['TestTask.database.ReplicaRouter']
+
+# PRAGMAs run on every new SQLite connection. The WAL profile lets reads
+# proceed during writes on a single-node deployment.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+} if config('SQLITE_WAL', default=False, cast=bool) else {}
 
 AUTH_USER_MODEL = 'TestTask.User'
 
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHE_URL = config('CACHE_URL', default='')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# 0 disables the caches of organizations and of the authenticated API
+# user. Their invalidation only reaches other workers through a shared
+# cache, so they are off by default without CACHE_URL. Subsidiaries stay
+# cached no longer than PRINCIPAL_CACHE_TIMEOUT.
+ORGANIZATION_CACHE_TIMEOUT = config('ORGANIZATION_CACHE_TIMEOUT',
+                                    default=3600 if CACHE_URL else 0,
+                                    cast=int)
+PRINCIPAL_CACHE_TIMEOUT = config('PRINCIPAL_CACHE_TIMEOUT',
+                                 default=300 if CACHE_URL else 0, cast=int)
+# 0 disables the per-user cache of contract API responses and their
+# ETags. Both need the contract data version to be shared by all workers,
+# so they are off by default without CACHE_URL.
+CONTRACT_RESPONSE_CACHE_TIMEOUT = config('CONTRACT_RESPONSE_CACHE_TIMEOUT',
+                                         default=300 if CACHE_URL else 0,
+                                         cast=int)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'TestTask.authentication.CachedJWTAuthentication',
     ),
     'EXCEPTION_HANDLER': 'TestTask.responses.custom_exception_handler',
+    'DEFAULT_PAGINATION_CLASS': 'TestTask.pagination.KeysetPagination',
+    'PAGE_SIZE': config('API_PAGE_SIZE', default=50, cast=int),
+    'DEFAULT_RENDERER_CLASSES': (
+        'TestTask.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# Request metrics, see TestTask.metrics.
+# Send the database, serializer and total time of each response in a
+# Server-Timing header. Off unless DEBUG, as it shows every client how
+# long the database took.
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
+# Bearer token Prometheus reads /metrics/ with. Staff users can always
+# read it; with no token nobody else can.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Queries a request may run before a warning is logged, by URL name.
+# DEFAULT_QUERY_BUDGET applies to the other URLs; 0 disables the check.
+DEFAULT_QUERY_BUDGET = config('DEFAULT_QUERY_BUDGET', default=50, cast=int)
+QUERY_BUDGETS = {
+    'contract-list': 8,
+    'contract-detail': 8,
+    'async-contract-list': 8,
+    'async-contract-detail': 8,
+    'contract-manage-users': 16,
+    'contract-manage-users-bulk': 20,
 }
 
 # Password validation
@@ -149,3 +267,6 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+EXPORT_SHARD_SIZE = config('EXPORT_SHARD_SIZE', default=20000, cast=int)
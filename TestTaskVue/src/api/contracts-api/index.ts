@@ -43,19 +43,25 @@ export interface ManageUserResponse {
 
 export const ContractsAPI = {
   /**
-   * Retrieves a list of all contracts.
+   * Retrieves a list of all contracts, following the pagination cursor.
    * @param userAccessToken - The user's access token for authentication.
    * @returns A Promise resolving to an array of Contract objects.
    * @throws Will throw an error if the request fails or if the response is not as expected.
    */
   async get_contracts(userAccessToken: string): Promise<Contract[]> {
     try {
-      const response = await DefaultAPIInstance.get('/contracts/', {
-        headers: {
-          Authorization: `Bearer ${userAccessToken}`
-        }
-      })
-      return response.data.data;
+      const contracts: Contract[] = []
+      let url: string | null = '/contracts/'
+      while (url) {
+        const response = await DefaultAPIInstance.get(url, {
+          headers: {
+            Authorization: `Bearer ${userAccessToken}`
+          }
+        })
+        contracts.push(...response.data.data)
+        url = response.data.next
+      }
+      return contracts;
     } catch (error) {
       console.error('Error fetching contracts:', error)
       throw new Error('Failed to fetch contracts')